@@ -0,0 +1,30 @@
+"""add (published_at, id) keyset index for the product feed
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "015"
+down_revision: str | None = "014"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_products_feed_published_at_id",
+        "products",
+        ["published_at", "id"],
+        postgresql_where=sa.text("deleted_at IS NULL AND published_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_feed_published_at_id", table_name="products")
@@ -0,0 +1,68 @@
+"""add n-gram full-text search vector to products
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18
+
+Korean has no word stemmer in stock PostgreSQL, so titles and descriptions
+are tokenized into character bigrams (plus unigrams on the document side) by
+``product_search_ngrams`` and indexed as a 'simple' tsvector. A query is
+tokenized by the same function, so any substring of two or more characters
+matches through the GIN index, and single-syllable queries match unigrams.
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "016"
+down_revision: str | None = "015"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+NGRAMS_FUNCTION = """
+CREATE OR REPLACE FUNCTION product_search_ngrams(doc text, include_unigrams boolean DEFAULT true)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT coalesce(string_agg(g.gram, ' '), '')
+    FROM regexp_split_to_table(lower(coalesce(doc, '')), '[[:space:][:punct:]]+') AS w(word)
+    CROSS JOIN LATERAL generate_series(1, length(w.word)) AS i(pos)
+    CROSS JOIN LATERAL (
+        VALUES
+            (substr(w.word, i.pos, 2)),
+            (CASE WHEN i.pos < length(w.word) THEN substr(w.word, i.pos, 1) END)
+    ) AS g(gram)
+    WHERE w.word <> ''
+      AND g.gram IS NOT NULL
+      AND (length(g.gram) = 2 OR include_unigrams OR length(w.word) = 1)
+$$
+"""
+
+SEARCH_VECTOR_EXPR = (
+    "setweight(to_tsvector('simple'::regconfig, product_search_ngrams(title)), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, "
+    "product_search_ngrams(coalesce(description, ''))), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.execute(NGRAMS_FUNCTION)
+    # A stored generated column is computed for every existing row by this
+    # ALTER, which doubles as the backfill, and stays in sync on later writes.
+    op.execute(
+        "ALTER TABLE products ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPR}) STORED"
+    )
+    op.create_index(
+        "ix_products_search_vector",
+        "products",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_search_vector", table_name="products")
+    op.drop_column("products", "search_vector")
+    op.execute("DROP FUNCTION IF EXISTS product_search_ngrams(text, boolean)")
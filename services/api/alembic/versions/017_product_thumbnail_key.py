@@ -0,0 +1,47 @@
+"""denormalize thumbnail storage key and dimensions onto products
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18
+
+Existing products are backfilled with their asset's first THUMBNAIL image
+(lowest sort_order). Dimensions are read from the image file at publish time,
+so backfilled rows keep NULL width/height.
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "017"
+down_revision: str | None = "016"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("thumbnail_key", sa.String(500), nullable=True))
+    op.add_column("products", sa.Column("thumbnail_width", sa.Integer(), nullable=True))
+    op.add_column("products", sa.Column("thumbnail_height", sa.Integer(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE products p
+        SET thumbnail_key = t.storage_key
+        FROM (
+            SELECT DISTINCT ON (asset_id) asset_id, storage_key
+            FROM asset_images
+            WHERE image_type = 'THUMBNAIL'
+            ORDER BY asset_id, sort_order, created_at
+        ) t
+        WHERE p.asset_id = t.asset_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("products", "thumbnail_height")
+    op.drop_column("products", "thumbnail_width")
+    op.drop_column("products", "thumbnail_key")
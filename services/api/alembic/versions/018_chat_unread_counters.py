@@ -0,0 +1,75 @@
+"""maintained unread counters on chat_rooms and users
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18
+
+chat_rooms gets one counter per participant and users a total across rooms,
+both backfilled from the messages newer than each side's read mark.
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "018"
+down_revision: str | None = "017"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "chat_rooms",
+        sa.Column("buyer_unread_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "chat_rooms",
+        sa.Column("seller_unread_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "users",
+        sa.Column("unread_messages_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.execute(
+        """
+        UPDATE chat_rooms r
+        SET buyer_unread_count = (
+                SELECT count(*) FROM chat_messages m
+                WHERE m.room_id = r.id
+                  AND m.sender_id <> r.buyer_id
+                  AND (r.buyer_last_read_at IS NULL OR m.created_at > r.buyer_last_read_at)
+            ),
+            seller_unread_count = (
+                SELECT count(*) FROM chat_messages m
+                WHERE m.room_id = r.id
+                  AND m.sender_id <> r.seller_id
+                  AND (r.seller_last_read_at IS NULL OR m.created_at > r.seller_last_read_at)
+            )
+        """
+    )
+    op.execute(
+        """
+        UPDATE users u
+        SET unread_messages_count = t.total
+        FROM (
+            SELECT user_id, sum(n) AS total
+            FROM (
+                SELECT buyer_id AS user_id, buyer_unread_count AS n FROM chat_rooms
+                UNION ALL
+                SELECT seller_id, seller_unread_count FROM chat_rooms
+            ) per_side
+            GROUP BY user_id
+        ) t
+        WHERE u.id = t.user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "unread_messages_count")
+    op.drop_column("chat_rooms", "seller_unread_count")
+    op.drop_column("chat_rooms", "buyer_unread_count")
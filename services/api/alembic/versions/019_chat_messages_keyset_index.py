@@ -0,0 +1,32 @@
+"""replace the chat_messages room_id index with (room_id, created_at, id)
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-18
+
+Serves history pages in both directions as index range scans; room_id
+lookups use its leading column, so the old single-column index is dropped.
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "019"
+down_revision: str | None = "018"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_chat_messages_room_created_id",
+        "chat_messages",
+        ["room_id", "created_at", "id"],
+    )
+    op.drop_index("ix_chat_messages_room_id", table_name="chat_messages")
+
+
+def downgrade() -> None:
+    op.create_index("ix_chat_messages_room_id", "chat_messages", ["room_id"])
+    op.drop_index("ix_chat_messages_room_created_id", table_name="chat_messages")
@@ -0,0 +1,124 @@
+"""per-room message sequence numbers
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-18
+
+chat_messages.seq numbers each room's messages 1, 2, 3, ... and chat_rooms
+keeps the last allocated seq plus each participant's last read seq, so a
+participant's unread count is a subtraction. The per-room unread counters from
+018 are derived from those and dropped; users.unread_messages_count stays.
+
+Existing messages are numbered in (created_at, id) order. A read mark becomes
+the highest seq at or before that side's last_read_at, or of their own latest
+message if that is later (sending has always implied reading).
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "020"
+down_revision: str | None = "019"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _recompute_user_totals() -> None:
+    op.execute(
+        """
+        UPDATE users u
+        SET unread_messages_count = coalesce(t.total, 0)
+        FROM (
+            SELECT u2.id AS user_id, sum(per_side.n) AS total
+            FROM users u2
+            LEFT JOIN (
+                SELECT buyer_id AS user_id, last_seq - buyer_last_read_seq AS n
+                FROM chat_rooms
+                UNION ALL
+                SELECT seller_id, last_seq - seller_last_read_seq
+                FROM chat_rooms
+                WHERE seller_id <> buyer_id
+            ) per_side ON per_side.user_id = u2.id
+            GROUP BY u2.id
+        ) t
+        WHERE u.id = t.user_id
+        """
+    )
+
+
+def upgrade() -> None:
+    op.add_column("chat_messages", sa.Column("seq", sa.Integer(), nullable=True))
+    for column in ("last_seq", "buyer_last_read_seq", "seller_last_read_seq"):
+        op.add_column(
+            "chat_rooms",
+            sa.Column(column, sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    op.execute(
+        """
+        UPDATE chat_messages m
+        SET seq = numbered.seq
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY room_id ORDER BY created_at, id) AS seq
+            FROM chat_messages
+        ) numbered
+        WHERE m.id = numbered.id
+        """
+    )
+    op.alter_column("chat_messages", "seq", nullable=False)
+    op.create_unique_constraint("uq_chat_messages_room_seq", "chat_messages", ["room_id", "seq"])
+
+    op.execute(
+        """
+        UPDATE chat_rooms r
+        SET last_seq = coalesce(
+                (SELECT max(m.seq) FROM chat_messages m WHERE m.room_id = r.id), 0
+            ),
+            buyer_last_read_seq = coalesce(
+                (
+                    SELECT max(m.seq) FROM chat_messages m
+                    WHERE m.room_id = r.id
+                      AND (m.sender_id = r.buyer_id OR m.created_at <= r.buyer_last_read_at)
+                ),
+                0
+            ),
+            seller_last_read_seq = coalesce(
+                (
+                    SELECT max(m.seq) FROM chat_messages m
+                    WHERE m.room_id = r.id
+                      AND (m.sender_id = r.seller_id OR m.created_at <= r.seller_last_read_at)
+                ),
+                0
+            )
+        """
+    )
+    _recompute_user_totals()
+
+    op.drop_column("chat_rooms", "seller_unread_count")
+    op.drop_column("chat_rooms", "buyer_unread_count")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "chat_rooms",
+        sa.Column("buyer_unread_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "chat_rooms",
+        sa.Column("seller_unread_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        UPDATE chat_rooms
+        SET buyer_unread_count = last_seq - buyer_last_read_seq,
+            seller_unread_count = last_seq - seller_last_read_seq
+        """
+    )
+
+    op.drop_constraint("uq_chat_messages_room_seq", "chat_messages", type_="unique")
+    op.drop_column("chat_messages", "seq")
+    for column in ("seller_last_read_seq", "buyer_last_read_seq", "last_seq"):
+        op.drop_column("chat_rooms", column)
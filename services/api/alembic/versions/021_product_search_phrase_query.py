@@ -0,0 +1,95 @@
+"""match product search queries as contiguous substrings
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-18
+
+016 turned a query into its bigrams and ANDed them, so "가나다" matched any
+title containing "가나" and "나다" anywhere. ``product_search_tsquery`` keeps
+each query word's bigrams in order, two positions apart (the document side
+interleaves a unigram between consecutive bigrams), and ANDs the words.
+
+``product_search_ngrams`` is redefined with explicit ordering so the token
+positions this relies on are guaranteed rather than incidental. Its output is
+unchanged, so the stored search_vector column does not need rebuilding.
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "021"
+down_revision: str | None = "020"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+NGRAMS_FUNCTION = """
+CREATE OR REPLACE FUNCTION product_search_ngrams(doc text, include_unigrams boolean DEFAULT true)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT coalesce(string_agg(g.gram, ' ' ORDER BY w.n, i.pos, g.k), '')
+    FROM regexp_split_to_table(lower(coalesce(doc, '')), '[[:space:][:punct:]]+')
+        WITH ORDINALITY AS w(word, n)
+    CROSS JOIN LATERAL generate_series(1, length(w.word)) AS i(pos)
+    CROSS JOIN LATERAL (
+        VALUES
+            (1, substr(w.word, i.pos, 2)),
+            (2, CASE WHEN i.pos < length(w.word) THEN substr(w.word, i.pos, 1) END)
+    ) AS g(k, gram)
+    WHERE w.word <> ''
+      AND g.gram IS NOT NULL
+      AND (length(g.gram) = 2 OR include_unigrams OR length(w.word) = 1)
+$$
+"""
+
+# Grams contain no whitespace or punctuation, so quote_literal yields plain
+# tsquery lexemes. A word of one character matches its unigram.
+TSQUERY_FUNCTION = """
+CREATE OR REPLACE FUNCTION product_search_tsquery(query text)
+RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT to_tsquery('simple'::regconfig, coalesce(string_agg(p.phrase, ' & ' ORDER BY p.n), ''))
+    FROM (
+        SELECT w.n, string_agg(quote_literal(g.gram), ' <2> ' ORDER BY g.pos) AS phrase
+        FROM regexp_split_to_table(lower(coalesce(query, '')), '[[:space:][:punct:]]+')
+            WITH ORDINALITY AS w(word, n)
+        CROSS JOIN LATERAL (
+            SELECT i.pos, substr(w.word, i.pos, 2) AS gram
+            FROM generate_series(1, greatest(length(w.word) - 1, 1)) AS i(pos)
+        ) AS g
+        WHERE w.word <> ''
+        GROUP BY w.n
+    ) AS p
+$$
+"""
+
+PREVIOUS_NGRAMS_FUNCTION = """
+CREATE OR REPLACE FUNCTION product_search_ngrams(doc text, include_unigrams boolean DEFAULT true)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT coalesce(string_agg(g.gram, ' '), '')
+    FROM regexp_split_to_table(lower(coalesce(doc, '')), '[[:space:][:punct:]]+') AS w(word)
+    CROSS JOIN LATERAL generate_series(1, length(w.word)) AS i(pos)
+    CROSS JOIN LATERAL (
+        VALUES
+            (substr(w.word, i.pos, 2)),
+            (CASE WHEN i.pos < length(w.word) THEN substr(w.word, i.pos, 1) END)
+    ) AS g(gram)
+    WHERE w.word <> ''
+      AND g.gram IS NOT NULL
+      AND (length(g.gram) = 2 OR include_unigrams OR length(w.word) = 1)
+$$
+"""
+
+
+def upgrade() -> None:
+    op.execute(NGRAMS_FUNCTION)
+    op.execute(TSQUERY_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS product_search_tsquery(text)")
+    op.execute(PREVIOUS_NGRAMS_FUNCTION)
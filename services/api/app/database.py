@@ -1,17 +1,59 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import settings
+from app.db_pool import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    PoolMetrics,
+    instrument_engine,
+    pool_options,
+)
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+engine = create_engine(
+    settings.database_url, poolclass=InstrumentedQueuePool, **pool_options()
+)
+instrument_engine(engine, sync_pool_metrics)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
+def _async_database_url(database_url: str) -> URL:
+    """Same database as ``database_url``, on the asyncpg driver."""
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    # asyncpg takes ``ssl`` where libpq takes ``sslmode``
+    if "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+
+# Used by read-heavy async routes so they don't occupy a threadpool worker
+# while waiting on the database
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url),
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options(),
+)
+instrument_engine(async_engine.sync_engine, async_pool_metrics)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,235 @@
+"""Connection pool configuration and telemetry for the sync and async engines.
+
+Both engines use a QueuePool subclass that times how long each checkout
+waits for a connection, so pool exhaustion shows up as a wait histogram,
+overflow and timeout counters in ``/metrics`` instead of unexplained
+latency spikes.
+"""
+
+import math
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, cast
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+from app.config import settings
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A checkout timeout this recent marks the pool as saturated in /metrics
+RECENT_TIMEOUT_SECONDS = 60.0
+
+# Per-context cap on the pool checkout timeout, set through checkout_timeout()
+_checkout_timeout: ContextVar[float | None] = ContextVar("checkout_timeout", default=None)
+
+
+class PoolMetrics:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.overflow_events = 0
+            self.timeouts = 0
+            self.last_timeout_at: float | None = None
+            self.wait_bucket_counts = [0] * (len(WAIT_BUCKETS) + 1)
+            self.wait_sum_seconds = 0.0
+            self.wait_max_seconds = 0.0
+            self.connections_opened = 0
+            self._connected_at: dict[int, float] = {}
+
+    def observe_wait(self, seconds: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if overflowed:
+                self.overflow_events += 1
+            self.wait_sum_seconds += seconds
+            self.wait_max_seconds = max(self.wait_max_seconds, seconds)
+            for i, upper in enumerate(WAIT_BUCKETS):
+                if seconds <= upper:
+                    self.wait_bucket_counts[i] += 1
+                    break
+            else:
+                self.wait_bucket_counts[-1] += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.last_timeout_at = time.monotonic()
+
+    def connection_opened(self, key: int) -> None:
+        with self._lock:
+            self.connections_opened += 1
+            self._connected_at[key] = time.monotonic()
+
+    def connection_closed(self, key: int) -> None:
+        with self._lock:
+            self._connected_at.pop(key, None)
+
+    def recently_timed_out(self) -> bool:
+        return (
+            self.last_timeout_at is not None
+            and time.monotonic() - self.last_timeout_at < RECENT_TIMEOUT_SECONDS
+        )
+
+    def snapshot(self, pool: QueuePool) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - t for t in self._connected_at.values()]
+            buckets: dict[str, int] = {}
+            cumulative = 0
+            for upper, count in zip(
+                (*(str(b) for b in WAIT_BUCKETS), "+Inf"), self.wait_bucket_counts, strict=True
+            ):
+                cumulative += count
+                buckets[upper] = cumulative
+            return {
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "saturated": is_saturated(pool),
+                "checkouts": self.checkouts,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "connections_opened": self.connections_opened,
+                "connection_age_seconds": {
+                    "open": len(ages),
+                    "max": round(max(ages), 3) if ages else 0.0,
+                    "avg": round(sum(ages) / len(ages), 3) if ages else 0.0,
+                },
+                "wait_seconds": {
+                    "count": self.checkouts,
+                    "sum": round(self.wait_sum_seconds, 6),
+                    "max": round(self.wait_max_seconds, 6),
+                    "buckets": buckets,
+                },
+            }
+
+
+class _InstrumentedPoolMixin:
+    metrics: PoolMetrics | None = None
+    _default_timeout: float
+
+    # QueuePool reads self._timeout on every checkout; serve the context's cap from here
+    @property
+    def _timeout(self) -> float:
+        cap = _checkout_timeout.get()
+        return self._default_timeout if cap is None else min(cap, self._default_timeout)
+
+    @_timeout.setter
+    def _timeout(self, value: float) -> None:
+        self._default_timeout = value
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        overflow_before = self._overflow  # type: ignore[attr-defined]
+        start = time.perf_counter()
+        try:
+            entry = super()._do_get()  # type: ignore[misc]
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_timeout()
+            raise
+        if self.metrics is not None:
+            # _overflow counts up from -pool_size, so > 0 means beyond pool_size
+            overflowed = self._overflow > max(overflow_before, 0)  # type: ignore[attr-defined]
+            self.metrics.observe_wait(time.perf_counter() - start, overflowed)
+        return cast(ConnectionPoolEntry, entry)
+
+    def recreate(self) -> QueuePool:
+        # dispose() recreates the pool; keep reporting into the same metrics
+        pool = cast(QueuePool, super().recreate())  # type: ignore[misc]
+        pool.metrics = self.metrics  # type: ignore[attr-defined]
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options() -> dict[str, Any]:
+    """create_engine keyword arguments from the db_pool_* settings."""
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_pool_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_use_lifo": settings.db_pool_use_lifo,
+    }
+
+
+def instrument_engine(engine: Engine, metrics: PoolMetrics) -> None:
+    pool = engine.pool
+    if isinstance(pool, _InstrumentedPoolMixin):
+        pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+        metrics.connection_opened(id(connection_record))
+
+    @event.listens_for(engine, "close")
+    def _on_close(dbapi_connection: Any, connection_record: Any) -> None:
+        metrics.connection_closed(id(connection_record))
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+        metrics.connection_closed(id(connection_record))
+
+
+def is_saturated(pool: QueuePool) -> bool:
+    """True when every permitted connection is checked out, or a checkout recently timed out."""
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None and metrics.recently_timed_out():
+        return True
+    if pool._max_overflow < 0:
+        # Unbounded overflow never makes callers wait
+        return False
+    return pool.checkedout() >= pool.size() + pool._max_overflow
+
+
+@contextmanager
+def checkout_timeout(seconds: float) -> Iterator[None]:
+    """Cap how long instrumented pool checkouts in this context wait for a connection."""
+    token = _checkout_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _checkout_timeout.reset(token)
+
+
+def probe_direct(engine: Engine, timeout_seconds: float) -> None:
+    """``SELECT 1`` over a fresh psycopg2 connection that bypasses the pool.
+
+    Tells a busy pool from a dead database: the pool being full says nothing
+    about whether the server still answers.
+    """
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    cparams = {
+        **cparams,
+        "connect_timeout": max(1, math.ceil(timeout_seconds)),
+        "options": f"-c statement_timeout={int(timeout_seconds * 1000)}",
+    }
+    conn = engine.dialect.connect(*cargs, **cparams)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    finally:
+        conn.close()
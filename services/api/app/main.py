@@ -1,14 +1,52 @@
+import asyncio
+import hmac
 import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from typing import Any
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 from app.config import settings
-from app.database import SessionLocal
+from app.database import (
+    SessionLocal,
+    async_engine,
+    async_pool_metrics,
+    engine,
+    sync_pool_metrics,
+)
+from app.db_pool import PoolMetrics, checkout_timeout, is_saturated, probe_direct
 from app.middleware.logging import RequestIDMiddleware
 from app.routers import ai, auth, chat, model_assets, products, storage, uploads
+from app.services.chat_service import reconcile_unread_counts
+from app.services.connection_manager import manager as chat_manager
+from app.services.storage_service import StorageService
+from app.services.view_counter import view_counter
+
+logger = logging.getLogger(__name__)
+
+
+def _authorize_metrics(request: Request) -> None:
+    if not settings.metrics_token:
+        if settings.app_env != "local":
+            raise HTTPException(status_code=404)
+        return
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(supplied, settings.metrics_token):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+def _pool_pressure(pool: Any, metrics: PoolMetrics) -> dict[str, Any]:
+    return {
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "timeouts": metrics.timeouts,
+        "saturated": is_saturated(pool),
+    }
 
 
 def _resolve_cors_origins() -> list[str]:
@@ -26,11 +64,65 @@ logging.basicConfig(
 )
 
 
+async def _flush_views_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.view_count_flush_interval_seconds)
+        try:
+            await asyncio.to_thread(view_counter.flush_with_new_session)
+        except Exception:
+            logger.warning("Product view flush failed; will retry", exc_info=True)
+
+
+async def _reconcile_unread_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.chat_unread_reconcile_interval_seconds)
+        try:
+            await asyncio.to_thread(reconcile_unread_counts)
+        except Exception:
+            logger.warning("Unread counter reconciliation failed; will retry", exc_info=True)
+
+
+async def _sweep_multipart_uploads_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.storage_multipart_sweep_interval_seconds)
+        try:
+            await asyncio.to_thread(
+                StorageService().cleanup_stale_multipart_uploads,
+                settings.storage_multipart_ttl_seconds,
+            )
+        except Exception:
+            logger.warning("Multipart upload cleanup failed; will retry", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    flusher = asyncio.create_task(_flush_views_periodically())
+    reconciler = asyncio.create_task(_reconcile_unread_periodically())
+    sweeper = asyncio.create_task(_sweep_multipart_uploads_periodically())
+    await chat_manager.start()
+    try:
+        yield
+    finally:
+        await chat_manager.stop()
+        for task in (flusher, reconciler, sweeper):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        # Don't drop views buffered since the last tick
+        try:
+            await asyncio.to_thread(view_counter.flush_with_new_session)
+        except Exception:
+            logger.warning("Final product view flush failed", exc_info=True)
+        # asyncpg connections are bound to this event loop
+        await async_engine.dispose()
+
+
 def create_app() -> FastAPI:
     application = FastAPI(
         title="3D Marketplace API",
         version="0.1.0",
         docs_url="/docs" if settings.app_env != "production" else None,
+        lifespan=lifespan,
     )
 
     application.add_middleware(RequestIDMiddleware)
@@ -55,16 +147,44 @@ def create_app() -> FastAPI:
     def healthz() -> dict[str, str]:
         return {"status": "ok"}
 
+    @application.get("/metrics")
+    def metrics(request: Request) -> dict[str, Any]:
+        _authorize_metrics(request)
+        return {
+            "db_pools": {
+                "sync": sync_pool_metrics.snapshot(engine.pool),  # type: ignore[arg-type]
+                "async": async_pool_metrics.snapshot(async_engine.pool),  # type: ignore[arg-type]
+            },
+            "chat": chat_manager.snapshot(),
+        }
+
     @application.get("/readyz")
     def readyz() -> JSONResponse:
+        pools = {
+            "sync": _pool_pressure(engine.pool, sync_pool_metrics),
+            "async": _pool_pressure(async_engine.pool, async_pool_metrics),
+        }
+        timeout = settings.db_ready_probe_timeout_seconds
         try:
-            db = SessionLocal()
             try:
-                db.execute(text("SELECT 1"))
-            finally:
-                db.close()
+                with checkout_timeout(timeout):
+                    db = SessionLocal()
+                    try:
+                        db.execute(text("SELECT 1"))
+                    finally:
+                        db.close()
+            except PoolTimeoutError:
+                # Busy is not broken, but a pool pinned by a hung database looks
+                # the same from inside it; ask the server over a fresh connection
+                probe_direct(engine, timeout)
+                pools["sync"]["saturated"] = True
         except Exception:
+            logger.warning("Readiness probe failed", exc_info=True)
             return JSONResponse(status_code=503, content={"status": "unavailable"})
+        # A saturated pool keeps the instance in rotation: pulling it would push its
+        # load onto the rest. Report it as degraded instead
+        if any(p["saturated"] for p in pools.values()):
+            return JSONResponse(status_code=200, content={"status": "degraded", "pool": pools})
         return JSONResponse(status_code=200, content={"status": "ok"})
 
     return application
@@ -2,47 +2,61 @@ import uuid
 
 import jwt
 from fastapi import Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models.user import User
 from app.services.jwt_service import JwtService
 
 
-def resolve_user_from_token(token: str, db: Session) -> User | None:
+def _user_id_from_token(token: str) -> uuid.UUID | None:
     """Try JWT first, then UUID fallback in dev/test mode."""
     # 1. Try JWT decode
     try:
         jwt_service = JwtService()
         payload = jwt_service.decode_access_token(token)
-        user_id = uuid.UUID(str(payload["sub"]))
-        return db.get(User, user_id)
+        return uuid.UUID(str(payload["sub"]))
     except (jwt.InvalidTokenError, KeyError, ValueError):
         pass
 
     # 2. UUID fallback (dev/test only)
     if settings.app_env in ("local", "test"):
         try:
-            user_id = uuid.UUID(token)
-            return db.get(User, user_id)
+            return uuid.UUID(token)
         except ValueError:
             pass
 
     return None
 
 
+def _bearer_token(request: Request) -> str | None:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.removeprefix("Bearer ").strip()
+
+
+def resolve_user_from_token(token: str, db: Session) -> User | None:
+    user_id = _user_id_from_token(token)
+    return db.get(User, user_id) if user_id is not None else None
+
+
+async def resolve_user_from_token_async(token: str, db: AsyncSession) -> User | None:
+    user_id = _user_id_from_token(token)
+    return await db.get(User, user_id) if user_id is not None else None
+
+
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     """Extract and validate the current user from the Authorization header.
 
     Supports JWT access tokens. In local/test env, also accepts raw UUID.
     """
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
+    token = _bearer_token(request)
+    if token is None:
         raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
 
-    token = auth_header.removeprefix("Bearer ").strip()
-
     user = resolve_user_from_token(token, db)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token or user not found")
@@ -55,10 +69,34 @@ def get_optional_user(request: Request, db: Session = Depends(get_db)) -> User |
 
     Never raises 401 — used for endpoints that work with or without auth.
     """
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
+    token = _bearer_token(request)
+    if token is None:
         return None
 
-    token = auth_header.removeprefix("Bearer ").strip()
-
     return resolve_user_from_token(token, db)
+
+
+async def get_current_user_async(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Async counterpart of get_current_user for routes on the async engine."""
+    token = _bearer_token(request)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+
+    user = await resolve_user_from_token_async(token, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token or user not found")
+
+    return user
+
+
+async def get_optional_user_async(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> User | None:
+    """Async counterpart of get_optional_user for routes on the async engine."""
+    token = _bearer_token(request)
+    if token is None:
+        return None
+
+    return await resolve_user_from_token_async(token, db)
@@ -0,0 +1,21 @@
+import hashlib
+from typing import Any
+
+from fastapi import Request
+
+
+def make_etag(*version: Any) -> str:
+    """Strong ETag over the values a response is built from."""
+    raw = "|".join("" if v is None else str(v) for v in version)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for it)."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -28,6 +28,15 @@ class ChatRoom(Base):
     seller_last_read_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    # seq of the room's latest message; each participant's unread count is
+    # last_seq minus their last read seq (sending advances the sender's)
+    last_seq: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
+    buyer_last_read_seq: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0", default=0
+    )
+    seller_last_read_seq: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0", default=0
+    )
 
     # Relationships
     messages: Mapped[list["ChatMessage"]] = relationship(back_populates="room")
@@ -38,10 +47,16 @@ class ChatRoom(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_room_created_id", "room_id", "created_at", "id"),
+        UniqueConstraint("room_id", "seq", name="uq_chat_messages_room_seq"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     room_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("chat_rooms.id"), nullable=False)
     sender_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Allocated from chat_rooms.last_seq under the room row lock: 1, 2, 3, ... per room
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
     body: Mapped[str] = mapped_column(Text, nullable=False)
     message_type: Mapped[str] = mapped_column(String(20), server_default="TEXT", nullable=False)
     image_url: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -60,3 +60,21 @@ class ProductStatus(enum.StrEnum):
     FOR_SALE = "FOR_SALE"
     RESERVED = "RESERVED"
     SOLD_OUT = "SOLD_OUT"
+
+
+class ProductSort(enum.StrEnum):
+    LATEST = "latest"
+    RELEVANCE = "relevance"
+
+
+class ChatSendQueuePolicy(enum.StrEnum):
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+    COALESCE = "coalesce"
+
+
+class ProductCountStrategy(enum.StrEnum):
+    EXACT = "exact"
+    CACHED = "cached"
+    ESTIMATED = "estimated"
+    NONE = "none"
@@ -1,11 +1,30 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy import (
+    BigInteger,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
 
+# Bigram tokenization (see migration 016) so Korean substrings are searchable
+SEARCH_VECTOR_EXPR = (
+    "setweight(to_tsvector('simple'::regconfig, product_search_ngrams(title)), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, "
+    "product_search_ngrams(coalesce(description, ''))), 'B')"
+)
+
 
 class Product(Base):
     __tablename__ = "products"
@@ -13,6 +32,13 @@ class Product(Base):
         Index("ix_products_published_at", "published_at"),
         Index("ix_products_seller_id", "seller_id"),
         Index("ix_products_category_published_at", "category", "published_at"),
+        Index(
+            "ix_products_feed_published_at_id",
+            "published_at",
+            "id",
+            postgresql_where=text("deleted_at IS NULL AND published_at IS NOT NULL"),
+        ),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
     )
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
@@ -29,6 +55,11 @@ class Product(Base):
     category: Mapped[str | None] = mapped_column(String(30), nullable=True)
     condition: Mapped[str | None] = mapped_column(String(20), nullable=True)
     dims_comparison: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Copied from the asset's first THUMBNAIL image at publish time so list
+    # responses don't have to load asset images
+    thumbnail_key: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    thumbnail_width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    thumbnail_height: Mapped[int | None] = mapped_column(Integer, nullable=True)
     status: Mapped[str] = mapped_column(
         String(20), nullable=False, server_default="FOR_SALE", default="FOR_SALE"
     )
@@ -43,6 +74,9 @@ class Product(Base):
     deleted_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True, default=None
     )
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR, Computed(SEARCH_VECTOR_EXPR, persisted=True), deferred=True
+    )
 
     # Relationships
     seller: Mapped["User"] = relationship(back_populates="products")  # type: ignore[name-defined]  # noqa: F821
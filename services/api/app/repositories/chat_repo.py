@@ -1,11 +1,28 @@
 import uuid
 from datetime import UTC, datetime
+from typing import Any, cast
 
-from sqlalchemy import func, or_, select
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import (
+    CTE,
+    ColumnElement,
+    CursorResult,
+    Select,
+    Update,
+    case,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, Session, joinedload
 
 from app.models.chat import ChatMessage, ChatRoom
-from app.models.product import Product
+from app.models.user import User
+from app.repositories.pagination import decode_cursor, encode_cursor
 
 
 class ChatRepo:
@@ -29,34 +46,9 @@ class ChatRepo:
         self.db.flush()
         return room
 
-    def list_rooms(self, user_id: uuid.UUID) -> list[ChatRoom]:
-        stmt = (
-            select(ChatRoom)
-            .options(
-                joinedload(ChatRoom.buyer),
-                joinedload(ChatRoom.seller),
-                joinedload(ChatRoom.product).joinedload(Product.asset),
-            )
-            .where(or_(ChatRoom.buyer_id == user_id, ChatRoom.seller_id == user_id))
-            .order_by(ChatRoom.last_message_at.desc().nullslast(), ChatRoom.created_at.desc())
-        )
-        return list(self.db.execute(stmt).scalars().unique().all())
-
     def get_room(self, room_id: uuid.UUID) -> ChatRoom | None:
         return self.db.get(ChatRoom, room_id)
 
-    def get_messages(
-        self,
-        room_id: uuid.UUID,
-        before: datetime | None = None,
-        limit: int = 50,
-    ) -> list[ChatMessage]:
-        stmt = select(ChatMessage).where(ChatMessage.room_id == room_id)
-        if before:
-            stmt = stmt.where(ChatMessage.created_at < before)
-        stmt = stmt.order_by(ChatMessage.created_at.desc()).limit(limit)
-        return list(self.db.execute(stmt).scalars().all())
-
     def add_message(
         self,
         room_id: uuid.UUID,
@@ -64,25 +56,49 @@ class ChatRepo:
         body: str,
         message_type: str = "TEXT",
         image_url: str | None = None,
-    ) -> ChatMessage:
+    ) -> tuple[ChatMessage, dict[uuid.UUID, tuple[int, int]]]:
+        """Insert a message with the room's next seq and mark the sender read up to it.
+
+        Returns the message and each participant's (room unread, total unread).
+        """
+        # Row lock serializes seq allocation and the unread bookkeeping below
+        room = self.db.get(ChatRoom, room_id, with_for_update=True, populate_existing=True)
+        if room is None:
+            raise ValueError("Chat room not found")
+
+        sender_unread = _unread_for(room, sender_id)
+        room.last_seq += 1
         msg = ChatMessage(
             room_id=room_id,
             sender_id=sender_id,
+            seq=room.last_seq,
             body=body,
             message_type=message_type,
             image_url=image_url,
         )
         self.db.add(msg)
-        self.db.flush()
 
-        # Update room's last_message_at and last_message_body
-        room = self.db.get(ChatRoom, room_id)
-        if room:
-            room.last_message_at = datetime.now(UTC)
-            room.last_message_body = "[사진]" if message_type == "IMAGE" else body
-            self.db.flush()
+        now = datetime.now(UTC)
+        room.last_message_at = now
+        room.last_message_body = "[사진]" if message_type == "IMAGE" else body
+        if sender_id == room.buyer_id:
+            room.buyer_last_read_seq = room.last_seq
+            room.buyer_last_read_at = now
+        if sender_id == room.seller_id:
+            room.seller_last_read_seq = room.last_seq
+            room.seller_last_read_at = now
 
-        return msg
+        deltas = {room.buyer_id: 1, room.seller_id: 1}
+        deltas[sender_id] = -sender_unread
+        unread: dict[uuid.UUID, tuple[int, int]] = {}
+        for user_id, delta in deltas.items():
+            total = self.db.execute(
+                _bump_user_unread_stmt(user_id, delta).returning(User.unread_messages_count),
+                execution_options={"synchronize_session": False},
+            ).scalar_one()
+            unread[user_id] = (_unread_for(room, user_id), total)
+        self.db.flush()
+        return msg, unread
 
     def is_participant(self, room_id: uuid.UUID, user_id: uuid.UUID) -> bool:
         room = self.db.get(ChatRoom, room_id)
@@ -91,45 +107,412 @@ class ChatRepo:
         return room.buyer_id == user_id or room.seller_id == user_id
 
     def count_unread_for_room(self, room: ChatRoom, user_id: uuid.UUID) -> int:
-        """Count messages after the user's last_read_at timestamp."""
-        if user_id == room.buyer_id:
-            last_read = room.buyer_last_read_at
-        elif user_id == room.seller_id:
-            last_read = room.seller_last_read_at
-        else:
-            return 0
-
-        stmt = (
-            select(func.count())
-            .select_from(ChatMessage)
-            .where(
-                ChatMessage.room_id == room.id,
-                ChatMessage.sender_id != user_id,
+        return _unread_for(room, user_id)
+
+    def mark_read(self, room_id: uuid.UUID, user_id: uuid.UUID) -> tuple[int, int] | None:
+        """Move the user's read mark to the room's last seq and clear their unread.
+
+        Returns the (read seq, total unread) now recorded for the reader.
+        """
+        row = self.db.execute(
+            _mark_read_stmt(room_id, user_id), execution_options={"synchronize_session": False}
+        ).one_or_none()
+        return (row[0], row[1]) if row else None
+
+    def user_ids_after(self, after: uuid.UUID | None, limit: int) -> list[uuid.UUID]:
+        """The next ``limit`` user ids past ``after``, for walking users in batches."""
+        stmt = select(User.id).order_by(User.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(User.id > after)
+        return list(self.db.execute(stmt).scalars())
+
+    def reconcile_unread_counts(self, user_ids: list[uuid.UUID]) -> tuple[int, int]:
+        """Recompute the unread totals of ``user_ids`` from their rooms' seqs where they drifted.
+
+        The rows are locked first, skipping any a sender or reader holds, so the
+        totals are computed after every write to them has committed and later
+        writes apply on top. Returns (users repaired, users skipped as busy).
+        """
+        locked = list(
+            self.db.execute(
+                select(User.id)
+                .where(User.id.in_(user_ids))
+                .order_by(User.id)
+                .with_for_update(skip_locked=True)
+            ).scalars()
+        )
+        if not locked:
+            return 0, len(user_ids)
+        result = self.db.execute(
+            _reconcile_users_stmt(locked), execution_options={"synchronize_session": False}
+        )
+        return cast(CursorResult[Any], result).rowcount, len(user_ids) - len(locked)
+
+
+def _unread_for(room: ChatRoom, user_id: uuid.UUID) -> int:
+    if user_id == room.buyer_id:
+        return room.last_seq - room.buyer_last_read_seq
+    if user_id == room.seller_id:
+        return room.last_seq - room.seller_last_read_seq
+    return 0
+
+
+def _room_activity_at() -> ColumnElement[datetime]:
+    # Rooms without messages yet rank by when they were opened
+    return func.coalesce(ChatRoom.last_message_at, ChatRoom.created_at)
+
+
+def _list_rooms_stmt(
+    user_id: uuid.UUID, cursor: str | None = None, limit: int | None = None
+) -> Select[tuple[ChatRoom, int]]:
+    activity_at = _room_activity_at()
+    stmt = (
+        select(
+            ChatRoom,
+            (
+                ChatRoom.last_seq
+                - case(
+                    (ChatRoom.buyer_id == user_id, ChatRoom.buyer_last_read_seq),
+                    else_=ChatRoom.seller_last_read_seq,
+                )
+            ).label("unread_count"),
+        )
+        .options(
+            joinedload(ChatRoom.buyer),
+            joinedload(ChatRoom.seller),
+            joinedload(ChatRoom.product),
+        )
+        .where(or_(ChatRoom.buyer_id == user_id, ChatRoom.seller_id == user_id))
+        .order_by(activity_at.desc(), ChatRoom.id.desc())
+    )
+    if cursor is not None:
+        after_activity_at, after_id = decode_cursor(cursor)
+        after = tuple_(
+            literal(after_activity_at, ChatRoom.created_at.type),
+            literal(after_id, ChatRoom.id.type),
+        )
+        stmt = stmt.where(tuple_(activity_at, ChatRoom.id) < after)
+    if limit is not None:
+        # Fetch one extra row to learn whether another page exists
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def _split_rooms_page(
+    rows: list[tuple[ChatRoom, int]], limit: int | None
+) -> tuple[list[tuple[ChatRoom, int]], str | None, bool]:
+    if limit is None or len(rows) <= limit:
+        return rows, None, False
+    rows = rows[:limit]
+    last = rows[-1][0]
+    return rows, encode_cursor(last.last_message_at or last.created_at, last.id), True
+
+
+def _message_position(cursor: str) -> ColumnElement[Any]:
+    """A message cursor as a (created_at, id) row value, bound with the columns' types."""
+    created_at, message_id = decode_cursor(cursor)
+    return tuple_(
+        literal(created_at, ChatMessage.created_at.type),
+        literal(message_id, ChatMessage.id.type),
+    )
+
+
+def _messages_stmt(
+    room_id: uuid.UUID,
+    before: datetime | None,
+    limit: int,
+    cursor: str | None = None,
+    after: str | None = None,
+    after_seq: int | None = None,
+) -> Select[tuple[ChatMessage]]:
+    """Range scan on ix_chat_messages_room_created_id (or the seq key) in either direction."""
+    modes = (after is not None, after_seq is not None, cursor is not None or before is not None)
+    if sum(modes) > 1:
+        raise ValueError("after, after_seq and cursor/before are mutually exclusive")
+    position = tuple_(ChatMessage.created_at, ChatMessage.id)
+    stmt = select(ChatMessage).where(ChatMessage.room_id == room_id)
+    if after_seq is not None:
+        stmt = stmt.where(ChatMessage.seq > after_seq).order_by(ChatMessage.seq)
+    elif after is not None:
+        stmt = stmt.where(position > _message_position(after)).order_by(
+            ChatMessage.created_at, ChatMessage.id
+        )
+    else:
+        if cursor is not None:
+            stmt = stmt.where(position < _message_position(cursor))
+        elif before:
+            stmt = stmt.where(ChatMessage.created_at < before)
+        stmt = stmt.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    # Fetch one extra row to learn whether another page exists
+    return stmt.limit(limit + 1)
+
+
+def _split_messages_page(
+    messages: list[ChatMessage], limit: int, by_seq: bool = False
+) -> tuple[list[ChatMessage], str | None, bool]:
+    if len(messages) <= limit:
+        return messages, None, False
+    messages = messages[:limit]
+    if by_seq:
+        # Seq ranges continue from the last message's seq, not a cursor
+        return messages, None, True
+    last = messages[-1]
+    return messages, encode_cursor(last.created_at, last.id), True
+
+
+def _locked_room_cte(room_id: uuid.UUID) -> CTE:
+    # seq allocation and read-mark moves below all happen under this row lock
+    return (
+        select(
+            ChatRoom.id,
+            ChatRoom.buyer_id,
+            ChatRoom.seller_id,
+            ChatRoom.last_seq,
+            ChatRoom.buyer_last_read_seq,
+            ChatRoom.seller_last_read_seq,
+        )
+        .where(ChatRoom.id == room_id)
+        .with_for_update()
+        .cte("room")
+    )
+
+
+def _own_unread(room: CTE, user_id: uuid.UUID) -> ColumnElement[int]:
+    return room.c.last_seq - case(
+        (room.c.buyer_id == user_id, room.c.buyer_last_read_seq),
+        else_=room.c.seller_last_read_seq,
+    )
+
+
+def _bump_user_unread_stmt(user_id: uuid.UUID, delta: int) -> Update:
+    return (
+        update(User)
+        .where(User.id == user_id)
+        # Unread counts are not a profile edit; keep updated_at untouched
+        .values(
+            unread_messages_count=func.greatest(User.unread_messages_count + delta, 0),
+            updated_at=User.updated_at,
+        )
+    )
+
+
+def _mark_read_stmt(room_id: uuid.UUID, user_id: uuid.UUID) -> Update:
+    """Move the user's read mark to the room's last seq and subtract it from their total."""
+    room = _locked_room_cte(room_id)
+    reader = (
+        update(User)
+        .where(User.id == user_id, or_(User.id == room.c.buyer_id, User.id == room.c.seller_id))
+        .values(
+            unread_messages_count=func.greatest(
+                User.unread_messages_count - _own_unread(room, user_id), 0
+            ),
+            updated_at=User.updated_at,
+        )
+        .returning(User.id, User.unread_messages_count)
+        .cte("reader")
+    )
+    now = func.now()
+    return (
+        update(ChatRoom)
+        .where(ChatRoom.id == room.c.id)
+        .values(
+            buyer_last_read_at=case(
+                (ChatRoom.buyer_id == user_id, now), else_=ChatRoom.buyer_last_read_at
+            ),
+            seller_last_read_at=case(
+                (ChatRoom.seller_id == user_id, now), else_=ChatRoom.seller_last_read_at
+            ),
+            buyer_last_read_seq=case(
+                (ChatRoom.buyer_id == user_id, ChatRoom.last_seq),
+                else_=ChatRoom.buyer_last_read_seq,
+            ),
+            seller_last_read_seq=case(
+                (ChatRoom.seller_id == user_id, ChatRoom.last_seq),
+                else_=ChatRoom.seller_last_read_seq,
+            ),
+        )
+        .add_cte(reader)
+        .returning(ChatRoom.last_seq, select(reader.c.unread_messages_count).scalar_subquery())
+    )
+
+
+def _add_message_stmt(
+    room_id: uuid.UUID,
+    sender_id: uuid.UUID,
+    body: str,
+    message_type: str,
+    image_url: str | None,
+) -> Update:
+    """Insert a message with the room's next seq, bump the preview, mark the sender read.
+
+    One statement: the recipient's unread total goes up by one and the sender's
+    drops by whatever they had unread in the room. Returns each participant's
+    new room unread and total alongside the message.
+    """
+    room = _locked_room_cte(room_id)
+    ins = (
+        insert(ChatMessage)
+        .values(
+            id=uuid.uuid4(),
+            room_id=room_id,
+            sender_id=sender_id,
+            seq=select(room.c.last_seq + 1).scalar_subquery(),
+            body=body,
+            message_type=message_type,
+            image_url=image_url,
+        )
+        .returning(ChatMessage.id, ChatMessage.room_id, ChatMessage.created_at, ChatMessage.seq)
+        .cte("ins")
+    )
+    participants = (
+        update(User)
+        .where(or_(User.id == room.c.buyer_id, User.id == room.c.seller_id))
+        .values(
+            unread_messages_count=case(
+                (
+                    User.id == sender_id,
+                    func.greatest(User.unread_messages_count - _own_unread(room, sender_id), 0),
+                ),
+                else_=User.unread_messages_count + 1,
+            ),
+            updated_at=User.updated_at,
+        )
+        .returning(User.id, User.unread_messages_count)
+        .cte("participants")
+    )
+
+    def total_of(user_id: InstrumentedAttribute[uuid.UUID]) -> ColumnElement[int]:
+        return (
+            select(participants.c.unread_messages_count)
+            .where(participants.c.id == user_id)
+            .scalar_subquery()
+        )
+
+    return (
+        update(ChatRoom)
+        .where(ChatRoom.id == ins.c.room_id, ChatRoom.id == room.c.id)
+        .values(
+            last_seq=ins.c.seq,
+            last_message_at=ins.c.created_at,
+            last_message_body="[사진]" if message_type == "IMAGE" else body,
+            buyer_last_read_at=case(
+                (ChatRoom.buyer_id == sender_id, ins.c.created_at),
+                else_=ChatRoom.buyer_last_read_at,
+            ),
+            seller_last_read_at=case(
+                (ChatRoom.seller_id == sender_id, ins.c.created_at),
+                else_=ChatRoom.seller_last_read_at,
+            ),
+            buyer_last_read_seq=case(
+                (ChatRoom.buyer_id == sender_id, ins.c.seq),
+                else_=ChatRoom.buyer_last_read_seq,
+            ),
+            seller_last_read_seq=case(
+                (ChatRoom.seller_id == sender_id, ins.c.seq),
+                else_=ChatRoom.seller_last_read_seq,
+            ),
+        )
+        .add_cte(participants)
+        .returning(
+            ins.c.id,
+            ins.c.created_at,
+            ins.c.seq,
+            ChatRoom.buyer_id,
+            ChatRoom.last_seq - ChatRoom.buyer_last_read_seq,
+            total_of(ChatRoom.buyer_id),
+            ChatRoom.seller_id,
+            ChatRoom.last_seq - ChatRoom.seller_last_read_seq,
+            total_of(ChatRoom.seller_id),
+        )
+    )
+
+
+def _reconcile_users_stmt(user_ids: list[uuid.UUID]) -> Update:
+    total = (
+        select(
+            func.coalesce(
+                func.sum(
+                    ChatRoom.last_seq
+                    - case(
+                        (ChatRoom.buyer_id == User.id, ChatRoom.buyer_last_read_seq),
+                        else_=ChatRoom.seller_last_read_seq,
+                    )
+                ),
+                0,
             )
         )
-        if last_read is not None:
-            stmt = stmt.where(ChatMessage.created_at > last_read)
+        .where(or_(ChatRoom.buyer_id == User.id, ChatRoom.seller_id == User.id))
+        .correlate(User)
+        .scalar_subquery()
+    )
+    return (
+        update(User)
+        .where(User.id.in_(user_ids), User.unread_messages_count != total)
+        .values(unread_messages_count=total, updated_at=User.updated_at)
+    )
 
-        return self.db.execute(stmt).scalar_one()
 
-    def mark_read(self, room_id: uuid.UUID, user_id: uuid.UUID) -> ChatRoom | None:
-        """Set the appropriate *_last_read_at to now()."""
-        room = self.db.get(ChatRoom, room_id)
+class AsyncChatRepo:
+    """Chat queries on an AsyncSession, mirroring ChatRepo."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def list_rooms(
+        self,
+        user_id: uuid.UUID,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[tuple[ChatRoom, int]], str | None, bool]:
+        rows = (await self.db.execute(_list_rooms_stmt(user_id, cursor, limit))).all()
+        return _split_rooms_page([(r[0], r[1]) for r in rows], limit)
+
+    async def get_room(self, room_id: uuid.UUID) -> ChatRoom | None:
+        return await self.db.get(ChatRoom, room_id)
+
+    async def get_messages(
+        self,
+        room_id: uuid.UUID,
+        before: datetime | None = None,
+        limit: int = 50,
+        cursor: str | None = None,
+        after: str | None = None,
+        after_seq: int | None = None,
+    ) -> tuple[list[ChatMessage], str | None, bool]:
+        stmt = _messages_stmt(room_id, before, limit, cursor, after, after_seq)
+        messages = list((await self.db.execute(stmt)).scalars().all())
+        return _split_messages_page(messages, limit, by_seq=after_seq is not None)
+
+    async def is_participant(self, room_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        room = await self.db.get(ChatRoom, room_id)
         if not room:
-            return None
+            return False
+        return room.buyer_id == user_id or room.seller_id == user_id
 
-        now = datetime.now(UTC)
-        if user_id == room.buyer_id:
-            room.buyer_last_read_at = now
-        elif user_id == room.seller_id:
-            room.seller_last_read_at = now
-        else:
-            return None
+    async def add_message(
+        self,
+        room_id: uuid.UUID,
+        sender_id: uuid.UUID,
+        body: str,
+        message_type: str = "TEXT",
+        image_url: str | None = None,
+    ) -> tuple[uuid.UUID, datetime, int, dict[uuid.UUID, tuple[int, int]]]:
+        """Persist a message in one round trip.
 
-        self.db.flush()
-        return room
+        Returns (message_id, created_at, seq, unread), where ``unread`` maps each
+        participant to their (room unread, total unread) after the send.
+        """
+        stmt = _add_message_stmt(room_id, sender_id, body, message_type, image_url)
+        # Core-level statement: nothing in the session needs synchronizing
+        result = await self.db.execute(stmt, execution_options={"synchronize_session": False})
+        row = result.one()
+        unread = {row[3]: (row[4], row[5]), row[6]: (row[7], row[8])}
+        return row[0], row[1], row[2], unread
 
-    def count_unread_for_user(self, user_id: uuid.UUID) -> int:
-        """Total unread messages across all rooms the user participates in."""
-        rooms = self.list_rooms(user_id)
-        return sum(self.count_unread_for_room(r, user_id) for r in rooms)
+    async def mark_read(self, room_id: uuid.UUID, user_id: uuid.UUID) -> tuple[int, int] | None:
+        """Returns the (read seq, total unread) now recorded for the reader."""
+        result = await self.db.execute(
+            _mark_read_stmt(room_id, user_id), execution_options={"synchronize_session": False}
+        )
+        row = result.one_or_none()
+        return (row[0], row[1]) if row else None
@@ -0,0 +1,25 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(sort_value: datetime, row_id: uuid.UUID) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque URL-safe token."""
+    raw = f"{sort_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Decode a token produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        sort_part, id_part = raw.split("|", 1)
+        sort_value = datetime.fromisoformat(sort_part)
+        row_id = uuid.UUID(id_part)
+    except (ValueError, UnicodeError, binascii.Error) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if sort_value.tzinfo is None:
+        raise ValueError("Invalid cursor")
+    return sort_value, row_id
@@ -1,6 +1,7 @@
 import uuid
 
-from sqlalchemy import select
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.product_like import ProductLike
@@ -11,11 +12,7 @@ class ProductLikeRepo:
         self.db = db
 
     def find_like(self, product_id: uuid.UUID, user_id: uuid.UUID) -> ProductLike | None:
-        stmt = select(ProductLike).where(
-            ProductLike.product_id == product_id,
-            ProductLike.user_id == user_id,
-        )
-        return self.db.execute(stmt).scalar_one_or_none()
+        return self.db.execute(_find_like_stmt(product_id, user_id)).scalar_one_or_none()
 
     def create_like(self, product_id: uuid.UUID, user_id: uuid.UUID) -> ProductLike:
         like = ProductLike(product_id=product_id, user_id=user_id)
@@ -32,8 +29,39 @@ class ProductLikeRepo:
     ) -> set[uuid.UUID]:
         if not product_ids:
             return set()
-        stmt = select(ProductLike.product_id).where(
-            ProductLike.user_id == user_id,
-            ProductLike.product_id.in_(product_ids),
-        )
-        return set(self.db.execute(stmt).scalars().all())
+        return set(self.db.execute(_liked_ids_stmt(user_id, product_ids)).scalars().all())
+
+
+def _find_like_stmt(product_id: uuid.UUID, user_id: uuid.UUID) -> Select[tuple[ProductLike]]:
+    return select(ProductLike).where(
+        ProductLike.product_id == product_id,
+        ProductLike.user_id == user_id,
+    )
+
+
+def _liked_ids_stmt(
+    user_id: uuid.UUID, product_ids: list[uuid.UUID]
+) -> Select[tuple[uuid.UUID]]:
+    return select(ProductLike.product_id).where(
+        ProductLike.user_id == user_id,
+        ProductLike.product_id.in_(product_ids),
+    )
+
+
+class AsyncProductLikeRepo:
+    """Read-only like queries on an AsyncSession, mirroring ProductLikeRepo."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def find_like(self, product_id: uuid.UUID, user_id: uuid.UUID) -> ProductLike | None:
+        result = await self.db.execute(_find_like_stmt(product_id, user_id))
+        return result.scalar_one_or_none()
+
+    async def get_liked_product_ids(
+        self, user_id: uuid.UUID, product_ids: list[uuid.UUID]
+    ) -> set[uuid.UUID]:
+        if not product_ids:
+            return set()
+        result = await self.db.execute(_liked_ids_stmt(user_id, product_ids))
+        return set(result.scalars().all())
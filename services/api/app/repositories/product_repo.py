@@ -1,14 +1,35 @@
+import json
+import typing
 import uuid
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import func, select, update
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import (
+    Integer,
+    Select,
+    Uuid,
+    column,
+    func,
+    literal,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.sql.expression import ClauseElement, ColumnElement, Executable
 
 from app.models.chat import ChatRoom
+from app.models.enums import ProductCountStrategy, ProductSort
 from app.models.model_asset import ModelAsset
+from app.models.model_asset_file import ModelAssetFile
 from app.models.product import Product
 from app.models.product_like import ProductLike
+from app.models.purchase import Purchase
+from app.models.user import User
+from app.repositories.pagination import decode_cursor, encode_cursor
 
 
 class ProductRepo:
@@ -25,6 +46,9 @@ class ProductRepo:
         category: str | None = None,
         condition: str | None = None,
         dims_comparison: str | None = None,
+        thumbnail_key: str | None = None,
+        thumbnail_width: int | None = None,
+        thumbnail_height: int | None = None,
     ) -> Product:
         product = Product(
             asset_id=asset_id,
@@ -36,21 +60,16 @@ class ProductRepo:
             category=category,
             condition=condition,
             dims_comparison=dims_comparison,
+            thumbnail_key=thumbnail_key,
+            thumbnail_width=thumbnail_width,
+            thumbnail_height=thumbnail_height,
         )
         self.db.add(product)
         self.db.flush()
         return product
 
     def get_by_id(self, product_id: uuid.UUID) -> Product | None:
-        stmt = (
-            select(Product)
-            .options(
-                joinedload(Product.seller),
-                joinedload(Product.asset).selectinload(ModelAsset.images),
-            )
-            .where(Product.id == product_id, Product.deleted_at.is_(None))
-        )
-        return self.db.execute(stmt).unique().scalar_one_or_none()
+        return self.db.execute(_by_id_stmt(product_id)).unique().scalar_one_or_none()
 
     def list_products(
         self,
@@ -60,66 +79,65 @@ class ProductRepo:
         seller_id: uuid.UUID | None = None,
         liked_by_user_id: uuid.UUID | None = None,
         category: str | None = None,
-    ) -> tuple[list[Product], int]:
-        stmt = (
-            select(Product)
-            .options(
-                joinedload(Product.seller),
-                joinedload(Product.asset).selectinload(ModelAsset.images),
-            )
-            .where(Product.published_at.isnot(None), Product.deleted_at.is_(None))
-        )
-        count_stmt = select(func.count()).select_from(Product).where(
-            Product.published_at.isnot(None), Product.deleted_at.is_(None)
-        )
-
-        if q:
-            stmt = stmt.where(Product.title.ilike(f"%{q}%"))
-            count_stmt = count_stmt.where(Product.title.ilike(f"%{q}%"))
-
-        if seller_id is not None:
-            stmt = stmt.where(Product.seller_id == seller_id)
-            count_stmt = count_stmt.where(Product.seller_id == seller_id)
-
-        if category is not None:
-            stmt = stmt.where(Product.category == category)
-            count_stmt = count_stmt.where(Product.category == category)
-
-        if liked_by_user_id is not None:
-            liked_subq = (
-                select(ProductLike.product_id)
-                .where(ProductLike.user_id == liked_by_user_id)
-                .subquery()
-            )
-            stmt = stmt.where(Product.id.in_(select(liked_subq)))
-            count_stmt = count_stmt.where(Product.id.in_(select(liked_subq)))
+        cursor: str | None = None,
+        sort: str = ProductSort.LATEST,
+    ) -> tuple[list[Product], str | None, bool]:
+        """Return one feed page, the cursor for the next page and whether one exists.
 
-        total = self.db.execute(count_stmt).scalar_one()
+        With ``cursor`` the page is located by a keyset seek on
+        ``(published_at, id)`` instead of OFFSET, so deep pages cost the same
+        as the first one and stay stable while new listings are published.
+        Cursors are only issued for the latest-first ordering.
+        """
+        stmt = _feed_stmt(q, page, limit, seller_id, liked_by_user_id, category, cursor, sort)
+        products = list(self.db.execute(stmt).unique().scalars().all())
+        return _split_page(products, limit, sort)
 
-        stmt = stmt.order_by(Product.published_at.desc())
-        stmt = stmt.offset((page - 1) * limit).limit(limit)
+    def count_products(
+        self,
+        q: str | None = None,
+        seller_id: uuid.UUID | None = None,
+        liked_by_user_id: uuid.UUID | None = None,
+        category: str | None = None,
+        strategy: str = ProductCountStrategy.EXACT,
+    ) -> tuple[int | None, str]:
+        """Total for a feed filter using ``strategy``; returns (total, strategy used).
 
-        products = list(self.db.execute(stmt).unique().scalars().all())
-        return products, total
+        ``none`` skips counting (callers rely on ``has_more``). ``cached`` is
+        served by the caller from the feed cache and counts exactly here.
+        """
+        if strategy == ProductCountStrategy.NONE:
+            return None, ProductCountStrategy.NONE
+        filters, _ = _feed_filters(q, seller_id, liked_by_user_id, category)
+        if strategy == ProductCountStrategy.ESTIMATED:
+            plan = self.db.execute(_Explain(_id_stmt(filters))).scalar_one()
+            return _plan_rows(plan), ProductCountStrategy.ESTIMATED
+        return self.db.execute(_count_stmt(filters)).scalar_one(), ProductCountStrategy.EXACT
 
     def count_chats(self, product_id: uuid.UUID) -> int:
-        stmt = (
-            select(func.count())
-            .select_from(ChatRoom)
-            .where(ChatRoom.product_id == product_id)
-        )
-        return self.db.execute(stmt).scalar_one()
+        return self.db.execute(_chat_count_stmt(product_id)).scalar_one()
 
     def count_chats_batch(self, product_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
         if not product_ids:
             return {}
+        rows = self.db.execute(_chat_counts_stmt(product_ids)).all()
+        return {row[0]: row[1] for row in rows}
+
+    def get_ar_asset_version(self, product_id: uuid.UUID) -> tuple[Any, ...] | None:
+        """Everything the AR asset response depends on, from one indexed lookup."""
+        files_count = (
+            select(func.count())
+            .select_from(ModelAssetFile)
+            .where(ModelAssetFile.asset_id == Product.asset_id)
+            .scalar_subquery()
+        )
         stmt = (
-            select(ChatRoom.product_id, func.count())
-            .where(ChatRoom.product_id.in_(product_ids))
-            .group_by(ChatRoom.product_id)
+            select(Product.asset_id, ModelAsset.status, ModelAsset.updated_at, files_count)
+            .outerjoin(ModelAsset, ModelAsset.id == Product.asset_id)
+            .where(Product.id == product_id, Product.deleted_at.is_(None))
         )
-        rows = self.db.execute(stmt).all()
-        return {row[0]: row[1] for row in rows}
+        row = self.db.execute(stmt).one_or_none()
+        return tuple(row) if row is not None else None
 
     def get_by_asset_id(self, asset_id: uuid.UUID) -> Product | None:
         stmt = select(Product).where(Product.asset_id == asset_id)
@@ -129,11 +147,22 @@ class ProductRepo:
         stmt = select(func.count()).select_from(Product).where(Product.seller_id == seller_id)
         return self.db.execute(stmt).scalar_one()
 
-    def increment_views(self, product_id: uuid.UUID) -> None:
+    def add_views(self, counts: dict[uuid.UUID, int]) -> None:
+        """Add buffered view counts to many products in one UPDATE ... FROM (VALUES ...)."""
+        if not counts:
+            return
+        # Sorted so concurrent flushes lock product rows in the same order
+        batch = values(
+            column("id", Uuid), column("n", Integer), name="view_counts"
+        ).data(sorted(counts.items()))
         stmt = (
             update(Product)
-            .where(Product.id == product_id)
-            .values(views_count=Product.views_count + 1)
+            .where(Product.id == batch.c.id)
+            # View counts are not an edit; keep updated_at untouched
+            .values(
+                views_count=Product.views_count + batch.c.n,
+                updated_at=Product.updated_at,
+            )
         )
         self.db.execute(stmt)
         self.db.flush()
@@ -186,3 +215,247 @@ class ProductRepo:
         )
         self.db.execute(stmt)
         self.db.flush()
+
+
+def _by_id_stmt(product_id: uuid.UUID) -> Select[tuple[Product]]:
+    return (
+        select(Product)
+        .options(joinedload(Product.seller))
+        .where(Product.id == product_id, Product.deleted_at.is_(None))
+    )
+
+
+def _feed_filters(
+    q: str | None,
+    seller_id: uuid.UUID | None,
+    liked_by_user_id: uuid.UUID | None,
+    category: str | None,
+) -> tuple[list[ColumnElement[bool]], ColumnElement[Any] | None]:
+    """WHERE clauses shared by the feed page and its count, plus the search query if any."""
+    filters: list[ColumnElement[bool]] = [
+        Product.published_at.isnot(None),
+        Product.deleted_at.is_(None),
+    ]
+
+    search_query = None
+    if q and q.strip():
+        # Each word's bigrams must sit next to each other in the indexed
+        # search_vector, so it matches as a contiguous substring
+        search_query = func.product_search_tsquery(q.strip())
+        filters.append(Product.search_vector.bool_op("@@")(search_query))
+
+    if seller_id is not None:
+        filters.append(Product.seller_id == seller_id)
+
+    if category is not None:
+        filters.append(Product.category == category)
+
+    if liked_by_user_id is not None:
+        liked_subq = (
+            select(ProductLike.product_id)
+            .where(ProductLike.user_id == liked_by_user_id)
+            .subquery()
+        )
+        filters.append(Product.id.in_(select(liked_subq)))
+
+    return filters, search_query
+
+
+def _feed_stmt(
+    q: str | None,
+    page: int,
+    limit: int,
+    seller_id: uuid.UUID | None,
+    liked_by_user_id: uuid.UUID | None,
+    category: str | None,
+    cursor: str | None,
+    sort: str,
+) -> Select[tuple[Product]]:
+    """Build the page query for the feed, fetching one row past ``limit``."""
+    if cursor is not None and sort != ProductSort.LATEST:
+        raise ValueError("cursor pagination is only supported with sort=latest")
+
+    filters, search_query = _feed_filters(q, seller_id, liked_by_user_id, category)
+    stmt = select(Product).options(joinedload(Product.seller)).where(*filters)
+
+    if sort == ProductSort.RELEVANCE and search_query is not None:
+        stmt = stmt.order_by(func.ts_rank_cd(Product.search_vector, search_query).desc())
+    stmt = stmt.order_by(Product.published_at.desc(), Product.id.desc())
+    if cursor is not None:
+        after_published_at, after_id = decode_cursor(cursor)
+        after = tuple_(
+            literal(after_published_at, Product.published_at.type),
+            literal(after_id, Product.id.type),
+        )
+        stmt = stmt.where(tuple_(Product.published_at, Product.id) < after)
+    else:
+        stmt = stmt.offset((page - 1) * limit)
+    # Fetch one extra row to learn whether another page exists
+    return stmt.limit(limit + 1)
+
+
+def _split_page(
+    products: list[Product], limit: int, sort: str
+) -> tuple[list[Product], str | None, bool]:
+    has_more = len(products) > limit
+    next_cursor = None
+    if has_more:
+        products = products[:limit]
+        if sort == ProductSort.LATEST:
+            last = products[-1]
+            next_cursor = encode_cursor(last.published_at, last.id)  # type: ignore[arg-type]
+    return products, next_cursor, has_more
+
+
+def _count_stmt(filters: list[ColumnElement[bool]]) -> Select[tuple[int]]:
+    return select(func.count()).select_from(Product).where(*filters)
+
+
+def _id_stmt(filters: list[ColumnElement[bool]]) -> Select[tuple[uuid.UUID]]:
+    return select(Product.id).where(*filters)
+
+
+def _detail_version_stmt(
+    product_id: uuid.UUID, viewer_id: uuid.UUID | None
+) -> Select[Any]:
+    chat_count = (
+        select(func.count())
+        .select_from(ChatRoom)
+        .where(ChatRoom.product_id == Product.id)
+        .scalar_subquery()
+    )
+    seller_products = aliased(Product)
+    seller_trade_count = (
+        select(func.count(Purchase.id))
+        .join(seller_products, Purchase.product_id == seller_products.id)
+        .where(seller_products.seller_id == Product.seller_id)
+        .scalar_subquery()
+    )
+    liked: ColumnElement[Any] = literal(None)
+    if viewer_id is not None:
+        liked = (
+            select(ProductLike.product_id)
+            .where(ProductLike.product_id == Product.id, ProductLike.user_id == viewer_id)
+            .exists()
+        )
+    return (
+        select(
+            Product.updated_at,
+            Product.likes_count,
+            Product.views_count,
+            chat_count,
+            User.updated_at,
+            seller_trade_count,
+            liked,
+        )
+        .join(User, User.id == Product.seller_id)
+        .where(Product.id == product_id, Product.deleted_at.is_(None))
+    )
+
+
+class _Explain(Executable, ClauseElement):
+    """``EXPLAIN (FORMAT JSON)`` around a statement, keeping its bound parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, stmt: Select[Any]) -> None:
+        self.stmt = stmt
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler: Any, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + typing.cast(str, compiler.process(element.stmt, **kw))
+
+
+def _plan_rows(plan: Any) -> int:
+    # psycopg2 decodes the json column, asyncpg returns it as text
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _chat_count_stmt(product_id: uuid.UUID) -> Select[tuple[int]]:
+    return select(func.count()).select_from(ChatRoom).where(ChatRoom.product_id == product_id)
+
+
+def _chat_counts_stmt(product_ids: list[uuid.UUID]) -> Select[tuple[uuid.UUID, int]]:
+    return (
+        select(ChatRoom.product_id, func.count())
+        .where(ChatRoom.product_id.in_(product_ids))
+        .group_by(ChatRoom.product_id)
+    )
+
+
+def _likes_counts_stmt(product_ids: list[uuid.UUID]) -> Select[tuple[uuid.UUID, int]]:
+    return select(Product.id, Product.likes_count).where(Product.id.in_(product_ids))
+
+
+class AsyncProductRepo:
+    """Read-only product queries on an AsyncSession, mirroring ProductRepo."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def get_by_id(self, product_id: uuid.UUID) -> Product | None:
+        result = await self.db.execute(_by_id_stmt(product_id))
+        return result.unique().scalar_one_or_none()
+
+    async def list_products(
+        self,
+        q: str | None = None,
+        page: int = 1,
+        limit: int = 20,
+        seller_id: uuid.UUID | None = None,
+        liked_by_user_id: uuid.UUID | None = None,
+        category: str | None = None,
+        cursor: str | None = None,
+        sort: str = ProductSort.LATEST,
+    ) -> tuple[list[Product], str | None, bool]:
+        stmt = _feed_stmt(q, page, limit, seller_id, liked_by_user_id, category, cursor, sort)
+        products = list((await self.db.execute(stmt)).unique().scalars().all())
+        return _split_page(products, limit, sort)
+
+    async def count_products(
+        self,
+        q: str | None = None,
+        seller_id: uuid.UUID | None = None,
+        liked_by_user_id: uuid.UUID | None = None,
+        category: str | None = None,
+        strategy: str = ProductCountStrategy.EXACT,
+    ) -> tuple[int | None, str]:
+        if strategy == ProductCountStrategy.NONE:
+            return None, ProductCountStrategy.NONE
+        filters, _ = _feed_filters(q, seller_id, liked_by_user_id, category)
+        if strategy == ProductCountStrategy.ESTIMATED:
+            plan = (await self.db.execute(_Explain(_id_stmt(filters)))).scalar_one()
+            return _plan_rows(plan), ProductCountStrategy.ESTIMATED
+
+        total = (await self.db.execute(_count_stmt(filters))).scalar_one()
+        return total, ProductCountStrategy.EXACT
+
+    async def get_detail_version(
+        self, product_id: uuid.UUID, viewer_id: uuid.UUID | None
+    ) -> tuple[Any, ...] | None:
+        """Everything the product detail response depends on, in one statement.
+
+        Used to answer conditional GETs without loading the product, its
+        seller and the counters separately.
+        """
+        result = await self.db.execute(_detail_version_stmt(product_id, viewer_id))
+        row = result.one_or_none()
+        return tuple(row) if row is not None else None
+
+    async def count_chats(self, product_id: uuid.UUID) -> int:
+        return (await self.db.execute(_chat_count_stmt(product_id))).scalar_one()
+
+    async def count_chats_batch(self, product_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+        if not product_ids:
+            return {}
+        rows = (await self.db.execute(_chat_counts_stmt(product_ids))).all()
+        return {row[0]: row[1] for row in rows}
+
+    async def get_likes_counts(self, product_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+        if not product_ids:
+            return {}
+        rows = (await self.db.execute(_likes_counts_stmt(product_ids))).all()
+        return {row[0]: row[1] for row in rows}
@@ -1,9 +1,9 @@
 import uuid
 
-from sqlalchemy import func, select
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
-from app.models.model_asset import ModelAsset
 from app.models.product import Product
 from app.models.purchase import Purchase
 
@@ -39,13 +39,7 @@ class PurchaseRepo:
 
         stmt = (
             select(Purchase)
-            .options(
-                joinedload(Purchase.product)
-                .joinedload(Product.seller),
-                joinedload(Purchase.product)
-                .joinedload(Product.asset)
-                .selectinload(ModelAsset.images),
-            )
+            .options(joinedload(Purchase.product).joinedload(Product.seller))
             .where(Purchase.buyer_id == buyer_id)
             .order_by(Purchase.purchased_at.desc())
             .offset((page - 1) * limit)
@@ -54,6 +48,13 @@ class PurchaseRepo:
         purchases = list(self.db.execute(stmt).unique().scalars().all())
         return purchases, total
 
+    def count_sales_by_sellers(self, seller_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+        """Completed trades per seller, for all given sellers in one grouped query."""
+        if not seller_ids:
+            return {}
+        rows = self.db.execute(_sales_by_sellers_stmt(seller_ids)).all()
+        return {row[0]: row[1] for row in rows}
+
     def get_by_product_and_buyer(
         self, product_id: uuid.UUID, buyer_id: uuid.UUID
     ) -> Purchase | None:
@@ -62,3 +63,25 @@ class PurchaseRepo:
             Purchase.buyer_id == buyer_id,
         )
         return self.db.execute(stmt).scalar_one_or_none()
+
+
+def _sales_by_sellers_stmt(seller_ids: list[uuid.UUID]) -> Select[tuple[uuid.UUID, int]]:
+    return (
+        select(Product.seller_id, func.count(Purchase.id))
+        .join(Product, Purchase.product_id == Product.id)
+        .where(Product.seller_id.in_(set(seller_ids)))
+        .group_by(Product.seller_id)
+    )
+
+
+class AsyncPurchaseRepo:
+    """Read-only purchase queries on an AsyncSession, mirroring PurchaseRepo."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def count_sales_by_sellers(self, seller_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+        if not seller_ids:
+            return {}
+        rows = (await self.db.execute(_sales_by_sellers_stmt(seller_ids))).all()
+        return {row[0]: row[1] for row in rows}
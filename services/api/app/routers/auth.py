@@ -4,7 +4,6 @@ from sqlalchemy.orm import Session
 from app.config import settings
 from app.database import get_db
 from app.middleware.auth import get_current_user
-from app.models.enums import ImageType
 from app.models.user import User
 from app.repositories.purchase_repo import PurchaseRepo
 from app.repositories.user_repo import UserRepo
@@ -158,11 +157,8 @@ def get_my_purchases(
         product_resp = None
         if p.product:
             thumbnail_url = None
-            if p.product.asset and p.product.asset.images:
-                for img in sorted(p.product.asset.images, key=lambda i: i.sort_order):
-                    if img.image_type == ImageType.THUMBNAIL:
-                        thumbnail_url = _storage.get_download_url(img.storage_key)
-                        break
+            if p.product.thumbnail_key:
+                thumbnail_url = _storage.get_download_url(p.product.thumbnail_key)
 
             product_resp = ProductResponse(
                 id=p.product.id,
@@ -175,6 +171,8 @@ def get_my_purchases(
                 created_at=p.product.created_at,
                 seller_name=p.product.seller.name if p.product.seller else "",
                 thumbnail_url=thumbnail_url,
+                thumbnail_width=p.product.thumbnail_width,
+                thumbnail_height=p.product.thumbnail_height,
                 status=p.product.status,
                 likes_count=p.product.likes_count,
                 views_count=p.product.views_count,
@@ -1,15 +1,28 @@
+import asyncio
 import json
+import logging
 import uuid
+from collections.abc import Callable, Coroutine
+from contextlib import suppress
 from datetime import datetime
+from typing import Any
 
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal, get_db
-from app.middleware.auth import get_current_user, resolve_user_from_token
+from app.config import settings
+from app.database import AsyncSessionLocal, get_async_db, get_db
+from app.middleware.auth import (
+    get_current_user,
+    get_current_user_async,
+    resolve_user_from_token_async,
+)
+from app.models.chat import ChatMessage
 from app.models.enums import MessageType
 from app.models.user import User
-from app.repositories.chat_repo import ChatRepo
+from app.repositories.chat_repo import AsyncChatRepo
 from app.schemas.chat import (
     ChatImageUploadResponse,
     ChatMessageListResponse,
@@ -18,9 +31,11 @@ from app.schemas.chat import (
     ChatRoomResponse,
     SendMessageRequest,
 )
-from app.services.chat_service import ChatService
+from app.services.chat_service import AsyncChatService, ChatService
 from app.services.connection_manager import manager
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["chat"])
 
 _MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20 MB
@@ -50,13 +65,18 @@ def _detect_content_type(data: bytes) -> str | None:
 
 
 @router.get("/v1/chat-rooms", response_model=ChatRoomListResponse)
-def list_chat_rooms(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def list_chat_rooms(
+    cursor: str | None = None,
+    limit: int = 50,
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ) -> ChatRoomListResponse:
-    svc = ChatService(db)
-    rooms = svc.list_rooms(user.id)
-    return ChatRoomListResponse(rooms=rooms)
+    svc = AsyncChatService(db)
+    try:
+        rooms, next_cursor, has_more = await svc.list_rooms(user.id, cursor=cursor, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return ChatRoomListResponse(rooms=rooms, next_cursor=next_cursor, has_more=has_more)
 
 
 @router.post("/v1/chat-rooms/{room_id}/read", response_model=ChatRoomResponse)
@@ -66,20 +86,63 @@ def mark_room_read(
     db: Session = Depends(get_db),
 ) -> ChatRoomResponse:
     svc = ChatService(db)
-    return svc.mark_read(room_id=room_id, user_id=user.id)
+    room, read = svc.mark_read(room_id=room_id, user_id=user.id)
+    # Same events as a read over a socket, so the other side's receipts stay current
+    _publish_from_thread(_publish_read, room_id, (room.buyer_id, room.seller_id), user.id, read)
+    return room
 
 
 @router.get("/v1/chat-rooms/{room_id}/messages", response_model=ChatMessageListResponse)
-def get_chat_messages(
+async def get_chat_messages(
     room_id: uuid.UUID,
     before: datetime | None = None,
     limit: int = 50,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    after: str | None = None,
+    after_seq: int | None = None,
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ) -> ChatMessageListResponse:
-    svc = ChatService(db)
-    messages = svc.get_messages(room_id=room_id, user_id=user.id, before=before, limit=limit)
-    return ChatMessageListResponse(messages=messages)
+    svc = AsyncChatService(db)
+    return await svc.get_messages(
+        room_id=room_id,
+        user_id=user.id,
+        before=before,
+        limit=limit,
+        cursor=cursor,
+        after=after,
+        after_seq=after_seq,
+    )
+
+
+@router.get("/v1/chat-rooms/{room_id}/messages/poll", response_model=ChatMessageListResponse)
+async def poll_chat_messages(
+    room_id: uuid.UUID,
+    after_seq: int,
+    limit: int = 50,
+    timeout: float | None = None,
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+) -> ChatMessageListResponse:
+    """Messages after ``after_seq``; if there are none yet, wait for one or the timeout."""
+    max_wait = settings.chat_long_poll_timeout_seconds
+    wait = max_wait if timeout is None else min(max(timeout, 0.0), max_wait)
+    svc = AsyncChatService(db)
+    async with manager.watch_room(room_id) as woken:
+        page = await svc.get_messages(
+            room_id=room_id, user_id=user.id, limit=limit, after_seq=after_seq
+        )
+        if page.messages or wait == 0:
+            return page
+        # Parked on the event only; the connection goes back to the pool meanwhile
+        await db.close()
+        with suppress(TimeoutError):
+            await asyncio.wait_for(woken.wait(), wait)
+    if not woken.is_set():
+        return page
+    return await svc.get_messages(
+        room_id=room_id, user_id=user.id, limit=limit, after_seq=after_seq
+    )
 
 
 @router.post(
@@ -94,9 +157,22 @@ def send_chat_message(
     db: Session = Depends(get_db),
 ) -> ChatMessageResponse:
     svc = ChatService(db)
-    return svc.send_message(
+    msg, unread = svc.send_message(
         room_id=room_id, sender_id=user.id, body=body.body, image_url=body.image_url,
     )
+    # Same fan-out as a socket send, so sockets and parked long-polls see it too
+    frame = _message_frame(
+        msg.id,
+        msg.room_id,
+        msg.sender_id,
+        msg.seq,
+        msg.body,
+        msg.message_type,
+        msg.image_url,
+        msg.created_at,
+    )
+    _publish_from_thread(_publish_message, room_id, frame, unread)
+    return msg
 
 
 @router.post("/v1/chat-images/upload", response_model=ChatImageUploadResponse)
@@ -146,87 +222,272 @@ async def upload_chat_image(
     return ChatImageUploadResponse(image_url=storage.get_download_url(key))
 
 
+def _publish_from_thread(publish: Callable[..., Coroutine[Any, Any, None]], *args: Any) -> None:
+    """Fan out from a sync route once its write has committed.
+
+    Failures are logged, not raised: a 500 for a stored message would make the
+    client retry it and post a duplicate.
+    """
+    try:
+        from_thread.run(publish, *args)
+    except Exception:
+        logger.warning("Chat fan-out failed after commit", exc_info=True)
+
+
+def _message_frame(
+    message_id: uuid.UUID,
+    room_id: uuid.UUID,
+    sender_id: uuid.UUID,
+    seq: int,
+    body: str,
+    message_type: str,
+    image_url: str | None,
+    created_at: datetime,
+) -> dict[str, Any]:
+    return {
+        "type": "message",
+        "id": str(message_id),
+        "room_id": str(room_id),
+        "sender_id": str(sender_id),
+        "seq": seq,
+        "body": body,
+        "message_type": message_type,
+        "image_url": image_url,
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _backlog_frame(
+    room_id: uuid.UUID, messages: list[ChatMessage], has_more: bool
+) -> dict[str, Any]:
+    return {
+        "type": "backlog",
+        "room_id": str(room_id),
+        "messages": [
+            _message_frame(
+                m.id,
+                m.room_id,
+                m.sender_id,
+                m.seq,
+                m.body,
+                m.message_type or MessageType.TEXT,
+                m.image_url,
+                m.created_at,
+            )
+            for m in messages
+        ],
+        "has_more": has_more,
+    }
+
+
+Participants = tuple[uuid.UUID, uuid.UUID]
+
+
+def _unread_frame(room_id: uuid.UUID, unread_count: int, total_unread: int) -> dict[str, Any]:
+    return {
+        "type": "unread",
+        "room_id": str(room_id),
+        "unread_count": unread_count,
+        "total_unread": total_unread,
+    }
+
+
+async def _load_participants(
+    db: AsyncSession, room_id: uuid.UUID, user_id: uuid.UUID
+) -> Participants | None:
+    """(buyer_id, seller_id) of the room, or None unless ``user_id`` is one of them."""
+    room = await AsyncChatRepo(db).get_room(room_id)
+    if room is None or user_id not in (room.buyer_id, room.seller_id):
+        return None
+    return room.buyer_id, room.seller_id
+
+
+def _parse_frame(data: str) -> dict[str, Any] | None:
+    try:
+        msg = json.loads(data)
+    except json.JSONDecodeError:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+
+async def _relay_typing(
+    room_id: uuid.UUID, participants: Participants, user_id: uuid.UUID
+) -> None:
+    # Ephemeral: relayed to the other participants, never persisted
+    await manager.broadcast_to_room(
+        room_id,
+        {"type": "typing", "room_id": str(room_id), "user_id": str(user_id)},
+        exclude_user_id=user_id,
+        participants=participants,
+    )
+
+
+async def _post_message(room_id: uuid.UUID, sender_id: uuid.UUID, msg: dict[str, Any]) -> None:
+    """Validate an inbound message frame, persist it and fan it out."""
+    body = msg.get("body", "")
+    image_url = msg.get("image_url")
+
+    # Validate image_url: must be http(s) or discard
+    if image_url and not isinstance(image_url, str):
+        image_url = None
+    if image_url and not image_url.startswith(("http://", "https://")):
+        image_url = None
+
+    if not body and not image_url:
+        return
+
+    message_type = MessageType.IMAGE if image_url else MessageType.TEXT
+    if not body:
+        body = "[사진]"
+
+    # Persist, update the room preview and mark the sender read in one statement
+    async with AsyncSessionLocal() as db:
+        message_id, created_at, seq, unread = await AsyncChatRepo(db).add_message(
+            room_id=room_id,
+            sender_id=sender_id,
+            body=body,
+            message_type=message_type,
+            image_url=image_url,
+        )
+        await db.commit()
+
+    await _publish_message(
+        room_id,
+        _message_frame(
+            message_id, room_id, sender_id, seq, body, message_type, image_url, created_at
+        ),
+        unread,
+    )
+
+
+async def _publish_message(
+    room_id: uuid.UUID, frame: dict[str, Any], unread: dict[uuid.UUID, tuple[int, int]]
+) -> None:
+    """A new message to the room and its participants, plus each one's new unread counts."""
+    # unread is keyed by participant
+    await manager.broadcast_to_room(room_id, frame, participants=unread)
+    for user_id, (unread_count, total_unread) in unread.items():
+        await manager.send_to_user(user_id, _unread_frame(room_id, unread_count, total_unread))
+
+
+async def _publish_read(
+    room_id: uuid.UUID, participants: Participants, reader_id: uuid.UUID, read: tuple[int, int]
+) -> None:
+    """Read receipt to the other participant, cleared badge to the reader."""
+    seq, total_unread = read
+    receipt = {"type": "read", "room_id": str(room_id), "user_id": str(reader_id), "seq": seq}
+    for user_id in set(participants) - {reader_id}:
+        await manager.send_to_user(user_id, receipt)
+    await manager.send_to_user(reader_id, _unread_frame(room_id, 0, total_unread))
+
+
 @router.websocket("/v1/chats/{room_id}")
 async def websocket_chat(
-    websocket: WebSocket, room_id: uuid.UUID, token: str | None = None,
+    websocket: WebSocket,
+    room_id: uuid.UUID,
+    token: str | None = None,
+    after_seq: int | None = None,
 ) -> None:
     # --- Auth ---
     if not token:
         await websocket.close(code=4001, reason="Missing token")
         return
 
-    db = SessionLocal()
-    try:
-        user = resolve_user_from_token(token, db)
+    async with AsyncSessionLocal() as db:
+        user = await resolve_user_from_token_async(token, db)
         if not user:
             await websocket.close(code=4001, reason="Invalid token")
             return
 
         # --- Participant check ---
-        chat_repo = ChatRepo(db)
-        if not chat_repo.is_participant(room_id, user.id):
+        participants = await _load_participants(db, room_id, user.id)
+        if participants is None:
             await websocket.close(code=4003, reason="Not a participant")
             return
 
-        await websocket.accept()
-        await manager.connect(room_id, user.id, websocket)
+    await websocket.accept()
+
+    # Register before marking read and reading the backlog, so a message committed
+    # meanwhile is delivered live rather than marked read unseen; on resume, hold
+    # live frames until the backlog has gone out
+    await manager.connect(room_id, user.id, websocket, hold=after_seq is not None)
+    try:
+        async with AsyncSessionLocal() as db:
+            chat_repo = AsyncChatRepo(db)
+            # Auto-mark read on connect
+            read = await chat_repo.mark_read(room_id, user.id)
+            await db.commit()
+            if after_seq is not None:
+                messages, _, has_more = await chat_repo.get_messages(
+                    room_id, limit=settings.chat_resume_backlog_limit, after_seq=after_seq
+                )
+        # The session goes back to the pool here; an idle socket holds no connection
+        if after_seq is not None:
+            manager.release(
+                room_id, user.id, websocket, _backlog_frame(room_id, messages, has_more)
+            )
+        if read is not None:
+            await _publish_read(room_id, participants, user.id, read)
+        while True:
+            msg = _parse_frame(await websocket.receive_text())
+            if msg is None:
+                continue
+            if msg.get("type") == "typing":
+                await _relay_typing(room_id, participants, user.id)
+            else:
+                await _post_message(room_id, user.id, msg)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await manager.disconnect(room_id, user.id, websocket)
 
-        # Auto-mark read on connect
-        chat_repo.mark_read(room_id, user.id)
-        db.commit()
 
-        try:
-            while True:
-                data = await websocket.receive_text()
-                try:
-                    msg = json.loads(data)
-                except json.JSONDecodeError:
-                    continue
-                body = msg.get("body", "")
-                image_url = msg.get("image_url")
+@router.websocket("/v1/chats")
+async def websocket_user_chat(websocket: WebSocket, token: str | None = None) -> None:
+    """One socket for all of the user's rooms; every inbound frame names its room_id."""
+    if not token:
+        await websocket.close(code=4001, reason="Missing token")
+        return
 
-                # Validate image_url: must be http(s) or discard
-                if image_url and not isinstance(image_url, str):
-                    image_url = None
-                if image_url and not image_url.startswith(("http://", "https://")):
-                    image_url = None
+    async with AsyncSessionLocal() as db:
+        user = await resolve_user_from_token_async(token, db)
+        if not user:
+            await websocket.close(code=4001, reason="Invalid token")
+            return
+    await websocket.accept()
 
-                if not body and not image_url:
+    # Rooms this socket has addressed, so the participant check runs once per room
+    rooms: dict[uuid.UUID, Participants] = {}
+    await manager.connect_user(user.id, websocket)
+    try:
+        while True:
+            msg = _parse_frame(await websocket.receive_text())
+            if msg is None:
+                continue
+            try:
+                room_id = uuid.UUID(str(msg.get("room_id")))
+            except ValueError:
+                continue
+            participants = rooms.get(room_id)
+            if participants is None:
+                async with AsyncSessionLocal() as db:
+                    participants = await _load_participants(db, room_id, user.id)
+                if participants is None:
                     continue
-
-                message_type = MessageType.IMAGE if image_url else MessageType.TEXT
-                if not body:
-                    body = "[사진]"
-
-                # Persist to DB
-                chat_msg = chat_repo.add_message(
-                    room_id=room_id,
-                    sender_id=user.id,
-                    body=body,
-                    message_type=message_type,
-                    image_url=image_url,
-                )
-                db.commit()
-
-                # Auto-mark read for the sender
-                chat_repo.mark_read(room_id, user.id)
-                db.commit()
-
-                # Broadcast to all room participants
-                broadcast_payload = {
-                    "type": "message",
-                    "id": str(chat_msg.id),
-                    "room_id": str(room_id),
-                    "sender_id": str(user.id),
-                    "body": body,
-                    "message_type": message_type,
-                    "image_url": image_url,
-                    "created_at": chat_msg.created_at.isoformat(),
-                }
-                await manager.broadcast_to_room(room_id, broadcast_payload)
-        except WebSocketDisconnect:
-            pass
-        finally:
-            manager.disconnect(room_id, user.id)
+                rooms[room_id] = participants
+
+            frame_type = msg.get("type", "message")
+            if frame_type == "typing":
+                await _relay_typing(room_id, participants, user.id)
+            elif frame_type == "read":
+                async with AsyncSessionLocal() as db:
+                    read = await AsyncChatRepo(db).mark_read(room_id, user.id)
+                    await db.commit()
+                if read is not None:
+                    await _publish_read(room_id, participants, user.id, read)
+            elif frame_type == "message":
+                await _post_message(room_id, user.id, msg)
+    except WebSocketDisconnect:
+        pass
     finally:
-        db.close()
+        await manager.disconnect_user(user.id, websocket)
@@ -1,20 +1,24 @@
+import asyncio
 import uuid
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.middleware.auth import get_current_user, get_optional_user
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.middleware.auth import get_current_user, get_optional_user_async
+from app.middleware.etag import etag_matches, make_etag
 from app.middleware.idempotency import IdempotencyChecker
-from app.models.enums import ImageType, ProductCategory, ProductStatus
+from app.models.enums import ProductCategory, ProductCountStrategy, ProductSort, ProductStatus
 from app.models.product import Product
-from app.models.purchase import Purchase
 from app.models.user import User
-from app.repositories.product_like_repo import ProductLikeRepo
-from app.repositories.product_repo import ProductRepo
-from app.repositories.purchase_repo import PurchaseRepo
+from app.repositories.product_like_repo import AsyncProductLikeRepo
+from app.repositories.product_repo import AsyncProductRepo, ProductRepo
+from app.repositories.purchase_repo import AsyncPurchaseRepo, PurchaseRepo
 from app.schemas.asset import ArAssetResponse
 from app.schemas.chat import ChatRoomResponse, CreateChatRoomRequest
 from app.schemas.product import (
@@ -29,8 +33,10 @@ from app.schemas.product import (
 from app.services.ar_asset_service import ArAssetService
 from app.services.chat_service import ChatService
 from app.services.like_service import LikeService
+from app.services.product_feed_cache import product_feed_cache
 from app.services.publish_service import PublishService
 from app.services.storage_service import StorageService
+from app.services.view_counter import view_counter
 
 router = APIRouter(prefix="/v1/products", tags=["products"])
 
@@ -42,14 +48,13 @@ def _build_product_response(
     liked_ids: set[uuid.UUID] | None = None,
     is_authed: bool = False,
     chat_count: int = 0,
-    db: Session | None = None,
+    seller_trade_count: int = 0,
 ) -> ProductResponse:
     # Seller info
     seller_name = ""
     seller_avatar_url = None
     seller_location_name = None
     seller_joined_at = None
-    seller_trade_count = 0
 
     if product.seller:
         seller_name = product.seller.name
@@ -57,25 +62,9 @@ def _build_product_response(
         seller_location_name = product.seller.location_name
         seller_joined_at = product.seller.created_at
 
-        if db:
-            from sqlalchemy import func
-
-            trade_count = (
-                db.query(func.count(Purchase.id))
-                .join(Product, Purchase.product_id == Product.id)
-                .filter(Product.seller_id == product.seller_id)
-                .scalar()
-                or 0
-            )
-            seller_trade_count = trade_count
-
-    # Thumbnail URL from asset images
     thumbnail_url = None
-    if product.asset and product.asset.images:
-        for img in sorted(product.asset.images, key=lambda i: i.sort_order):
-            if img.image_type == ImageType.THUMBNAIL:
-                thumbnail_url = _storage.get_download_url(img.storage_key)
-                break
+    if product.thumbnail_key:
+        thumbnail_url = _storage.get_download_url(product.thumbnail_key)
 
     # is_liked
     is_liked: bool | None = None
@@ -94,6 +83,8 @@ def _build_product_response(
         seller_name=seller_name,
         seller_avatar_url=seller_avatar_url,
         thumbnail_url=thumbnail_url,
+        thumbnail_width=product.thumbnail_width,
+        thumbnail_height=product.thumbnail_height,
         category=product.category,
         condition=product.condition,
         dims_comparison=product.dims_comparison,
@@ -108,6 +99,49 @@ def _build_product_response(
     )
 
 
+def _seller_trade_count(db: Session, seller_id: uuid.UUID) -> int:
+    return PurchaseRepo(db).count_sales_by_sellers([seller_id]).get(seller_id, 0)
+
+
+async def _count_products(
+    repo: AsyncProductRepo,
+    cache_generation: int | None,
+    q: str | None,
+    seller_id: uuid.UUID | None,
+    liked_by_user_id: uuid.UUID | None,
+    category: str | None,
+    strategy: str,
+) -> tuple[int | None, str]:
+    """Feed total; ``cached`` reads shared filters through the feed cache.
+
+    Without a cache generation (cache disabled, or a per-user filter the cache
+    doesn't cover) ``cached`` counts exactly.
+    """
+    if strategy != ProductCountStrategy.CACHED or cache_generation is None:
+        return await repo.count_products(
+            q=q,
+            seller_id=seller_id,
+            liked_by_user_id=liked_by_user_id,
+            category=category,
+            strategy=strategy,
+        )
+    # One total per filter, shared by every page and sort of it
+    count_params = {
+        "q": q.strip() if q and q.strip() else None,
+        "seller_id": seller_id,
+        "category": category,
+    }
+    cached = await asyncio.to_thread(product_feed_cache.get_count, cache_generation, count_params)
+    if cached is not None:
+        return cached, ProductCountStrategy.CACHED
+    total, _ = await repo.count_products(
+        q=q, seller_id=seller_id, category=category, strategy=ProductCountStrategy.EXACT
+    )
+    if total is not None:
+        await asyncio.to_thread(product_feed_cache.set_count, cache_generation, count_params, total)
+    return total, ProductCountStrategy.CACHED
+
+
 @router.post("/publish", response_model=ProductResponse, status_code=201)
 def publish_product(
     body: PublishRequest,
@@ -160,15 +194,18 @@ def publish_product(
 
 
 @router.get("", response_model=ProductListResponse)
-def list_products(
+async def list_products(
     q: str | None = None,
     page: int = 1,
     limit: int = 20,
     seller_id: uuid.UUID | None = None,
     liked: bool | None = None,
     category: str | None = None,
-    user: User | None = Depends(get_optional_user),
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    sort: str = ProductSort.LATEST,
+    count: str | None = None,
+    user: User | None = Depends(get_optional_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ) -> ProductListResponse:
     # Validate category if provided
     if category is not None:
@@ -179,6 +216,21 @@ def list_products(
                 detail=f"Invalid category. Must be one of: {', '.join(sorted(valid_cats))}",
             )
 
+    valid_sorts = {e.value for e in ProductSort}
+    if sort not in valid_sorts:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort. Must be one of: {', '.join(sorted(valid_sorts))}",
+        )
+
+    count_strategy = count or settings.product_feed_count_strategy
+    valid_strategies = {e.value for e in ProductCountStrategy}
+    if count_strategy not in valid_strategies:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid count. Must be one of: {', '.join(sorted(valid_strategies))}",
+        )
+
     # liked=true requires authentication
     liked_by_user_id: uuid.UUID | None = None
     if liked:
@@ -186,69 +238,148 @@ def list_products(
             raise HTTPException(status_code=401, detail="Authentication required for liked filter")
         liked_by_user_id = user.id
 
-    repo = ProductRepo(db)
-    products, total = repo.list_products(
-        q=q, page=page, limit=limit,
-        seller_id=seller_id,
-        liked_by_user_id=liked_by_user_id,
-        category=category,
-    )
+    # Pages without a per-user filter are shared; likes_count and is_liked are overlaid below
+    cache_params: dict[str, Any] | None = None
+    cache_generation: int | None = None
+    page_response: ProductListResponse | None = None
+    if liked_by_user_id is None:
+        cache_params = {
+            "q": q.strip() if q and q.strip() else None,
+            "category": category,
+            "seller_id": seller_id,
+            "page": page if cursor is None else None,
+            "limit": limit,
+            "cursor": cursor,
+            "sort": sort,
+            "count": count_strategy,
+        }
+        # The cache and view buffer may be Redis over a blocking client; keep it off the loop
+        cache_generation = await asyncio.to_thread(product_feed_cache.current_generation)
+        if cache_generation is not None:
+            page_response = await asyncio.to_thread(
+                product_feed_cache.get, cache_generation, cache_params
+            )
+
+    if page_response is None:
+        repo = AsyncProductRepo(db)
+        try:
+            products, next_cursor, has_more = await repo.list_products(
+                q=q, page=page, limit=limit,
+                seller_id=seller_id,
+                liked_by_user_id=liked_by_user_id,
+                category=category,
+                cursor=cursor,
+                sort=sort,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        total, total_strategy = await _count_products(
+            repo,
+            cache_generation,
+            q=q,
+            seller_id=seller_id,
+            liked_by_user_id=liked_by_user_id,
+            category=category,
+            strategy=count_strategy,
+        )
+
+        # Batch chat counts and seller trade counts
+        product_ids_all = [p.id for p in products]
+        chat_counts = await repo.count_chats_batch(product_ids_all)
+        trade_counts = await AsyncPurchaseRepo(db).count_sales_by_sellers(
+            [p.seller_id for p in products]
+        )
+
+        page_response = ProductListResponse(
+            products=[
+                _build_product_response(
+                    p,
+                    chat_count=chat_counts.get(p.id, 0),
+                    seller_trade_count=trade_counts.get(p.seller_id, 0),
+                )
+                for p in products
+            ],
+            total=total,
+            page=page,
+            limit=limit,
+            next_cursor=next_cursor,
+            has_more=has_more,
+            total_strategy=total_strategy,
+        )
+        if cache_params is not None and cache_generation is not None:
+            await asyncio.to_thread(
+                product_feed_cache.set, cache_generation, cache_params, page_response
+            )
+    else:
+        # Like toggles don't invalidate the cache, so cached counts are refreshed here
+        likes_counts = await AsyncProductRepo(db).get_likes_counts(
+            [p.id for p in page_response.products]
+        )
+        for item in page_response.products:
+            item.likes_count = likes_counts.get(item.id, item.likes_count)
 
     # Batch check liked IDs
-    liked_ids: set[uuid.UUID] = set()
-    is_authed = user is not None
     if user is not None:
-        like_repo = ProductLikeRepo(db)
-        product_ids = [p.id for p in products]
-        liked_ids = like_repo.get_liked_product_ids(user.id, product_ids)
-
-    # Batch chat counts
-    product_ids_all = [p.id for p in products]
-    chat_counts = repo.count_chats_batch(product_ids_all)
-
-    return ProductListResponse(
-        products=[
-            _build_product_response(
-                p,
-                liked_ids=liked_ids,
-                is_authed=is_authed,
-                chat_count=chat_counts.get(p.id, 0),
-                db=db,
-            )
-            for p in products
-        ],
-        total=total,
-        page=page,
-        limit=limit,
-    )
+        like_repo = AsyncProductLikeRepo(db)
+        product_ids = [p.id for p in page_response.products]
+        liked_ids = await like_repo.get_liked_product_ids(user.id, product_ids)
+        for item in page_response.products:
+            item.is_liked = item.id in liked_ids
+
+    return page_response
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(
+async def get_product(
     product_id: uuid.UUID,
-    user: User | None = Depends(get_optional_user),
-    db: Session = Depends(get_db),
-) -> ProductResponse:
-    repo = ProductRepo(db)
-    product = repo.get_by_id(product_id)
-    if not product:
+    request: Request,
+    response: Response,
+    user: User | None = Depends(get_optional_user_async),
+    db: AsyncSession = Depends(get_async_db),
+) -> ProductResponse | Response:
+    repo = AsyncProductRepo(db)
+    version = await repo.get_detail_version(product_id, user.id if user else None)
+    if version is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Increment views
-    repo.increment_views(product_id)
+    # Buffered and flushed in batches; the response shows the last flushed count
+    if user is not None:
+        viewer_key: str | None = str(user.id)
+    else:
+        viewer_key = request.client.host if request.client else None
+    await asyncio.to_thread(view_counter.record, product_id, viewer_key)
+
+    # is_liked makes the body per-user, so caches must key on Authorization
+    headers = {
+        "ETag": make_etag(*version),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    product = await repo.get_by_id(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
 
     # Check if liked
     liked_ids: set[uuid.UUID] = set()
     is_authed = user is not None
     if user is not None:
-        like_repo = ProductLikeRepo(db)
-        if like_repo.find_like(product_id, user.id):
+        like_repo = AsyncProductLikeRepo(db)
+        if await like_repo.find_like(product_id, user.id):
             liked_ids = {product_id}
 
-    chat_count = repo.count_chats(product_id)
+    chat_count = await repo.count_chats(product_id)
+    trade_counts = await AsyncPurchaseRepo(db).count_sales_by_sellers([product.seller_id])
 
     return _build_product_response(
-        product, liked_ids=liked_ids, is_authed=is_authed, chat_count=chat_count, db=db,
+        product,
+        liked_ids=liked_ids,
+        is_authed=is_authed,
+        chat_count=chat_count,
+        seller_trade_count=trade_counts.get(product.seller_id, 0),
     )
 
 
@@ -273,10 +404,14 @@ def update_product(
         raise HTTPException(status_code=400, detail="No fields to update")
 
     repo.update_fields(product_id, **fields)
+    product_feed_cache.invalidate_on_commit(db)
     db.commit()
 
     product = repo.get_by_id(product_id)
-    return _build_product_response(product, db=db)  # type: ignore[arg-type]
+    return _build_product_response(
+        product,  # type: ignore[arg-type]
+        seller_trade_count=_seller_trade_count(db, user.id),
+    )
 
 
 @router.delete("/{product_id}", status_code=204)
@@ -293,6 +428,7 @@ def delete_product(
         raise HTTPException(status_code=403, detail="Not the product owner")
 
     repo.soft_delete(product_id)
+    product_feed_cache.invalidate_on_commit(db)
     db.commit()
 
 
@@ -316,10 +452,14 @@ def change_product_status(
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {allowed}")
 
     repo.update_status(product_id, body.status)
+    product_feed_cache.invalidate_on_commit(db)
     db.commit()
 
     product = repo.get_by_id(product_id)
-    return _build_product_response(product, db=db)  # type: ignore[arg-type]
+    return _build_product_response(
+        product,  # type: ignore[arg-type]
+        seller_trade_count=_seller_trade_count(db, user.id),
+    )
 
 
 @router.post("/{product_id}/like", response_model=LikeToggleResponse)
@@ -335,19 +475,28 @@ def toggle_like(
 @router.get("/{product_id}/ar-asset", response_model=ArAssetResponse)
 def get_product_ar_asset(
     product_id: uuid.UUID,
+    request: Request,
+    response: Response,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
-) -> ArAssetResponse:
+) -> ArAssetResponse | Response:
     repo = ProductRepo(db)
-    product = repo.get_by_id(product_id)
-    if not product:
+    version = repo.get_ar_asset_version(product_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    if not product.asset_id:
+
+    headers = {"ETag": make_etag(*version), "Cache-Control": "private, no-cache"}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    asset_id = version[0]
+    if not asset_id:
         from app.models.enums import ArAvailability
         return ArAssetResponse(availability=ArAvailability.NONE.value, files=[])
 
     svc = ArAssetService(db)
-    return svc.get_ar_asset(product.asset_id)
+    return svc.get_ar_asset(asset_id)
 
 
 @router.post("/{product_id}/purchase", response_model=PurchaseResponse, status_code=201)
@@ -378,13 +527,16 @@ def purchase_product(
         )
         repo = ProductRepo(db)
         repo.update_status(product.id, ProductStatus.SOLD_OUT)
+        product_feed_cache.invalidate_on_commit(db)
         db.commit()
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=409, detail="Product already purchased")
     db.refresh(purchase)
 
-    product_resp = _build_product_response(product, db=db)
+    product_resp = _build_product_response(
+        product, seller_trade_count=_seller_trade_count(db, product.seller_id),
+    )
     return PurchaseResponse(
         id=purchase.id,
         product_id=purchase.product_id,
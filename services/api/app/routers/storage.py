@@ -1,25 +1,71 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Query, Request
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response
 
 from app.config import settings
-from app.services.storage_service import StorageService
+from app.middleware.etag import etag_matches
+from app.services.storage_service import ObjectWriter, StorageService
 
 router = APIRouter(tags=["storage"])
 
+# Request chunks are gathered up to this size before each hand-off to a worker thread
+_UPLOAD_WRITE_BYTES = 1024 * 1024
+
+# Chat image keys are random and written once. Asset keys are deterministic and a
+# retried upload rewrites them, so those are revalidated against the ETag instead
+_IMMUTABLE_PREFIXES = ("chat-images/",)
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_MEDIA_TYPES = {
+    ".usdz": "model/vnd.usdz+zip",
+    ".glb": "model/gltf-binary",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
 
 def _ensure_local_storage() -> None:
     if settings.app_env != "local":
         raise HTTPException(status_code=404)
 
 
+async def _stream_to(writer: ObjectWriter, request: Request) -> tuple[int, str]:
+    """Stream the request body through ``writer``; the object appears only if it all arrives."""
+    # Streamed to a temp file off the loop, hashed on the way, renamed into
+    # place at the end: memory stays at one buffer however large the model is
+    try:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= _UPLOAD_WRITE_BYTES:
+                data, buffer = buffer, bytearray()
+                await asyncio.to_thread(writer.write, data)
+        if buffer:
+            await asyncio.to_thread(writer.write, buffer)
+        if writer.size == 0:
+            raise HTTPException(status_code=400, detail="Empty body")
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    return await asyncio.to_thread(writer.commit)
+
+
 @router.put("/storage/{path:path}")
 async def upload_file(
     path: str,
     request: Request,
+    response: Response,
     exp: str | None = Query(default=None),
     sig: str | None = Query(default=None),
+    upload_id: str | None = Query(default=None, alias="uploadId"),
+    part_number: int | None = Query(default=None, alias="partNumber"),
 ) -> dict[str, str]:
-    """Local dev endpoint: receive file upload (simulates S3 presigned PUT)."""
+    """Local dev endpoint: receive file upload (simulates S3 presigned PUT).
+
+    With ``uploadId`` and ``partNumber``, receives one part of a multipart upload.
+    """
     _ensure_local_storage()
 
     storage = StorageService()
@@ -28,20 +74,34 @@ async def upload_file(
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    if not storage.verify_upload_signature(path, exp=exp, sig=sig):
+    if (upload_id is None) != (part_number is None):
+        raise HTTPException(status_code=400, detail="uploadId and partNumber go together")
+
+    if not storage.verify_upload_signature(
+        path, exp=exp, sig=sig, upload_id=upload_id, part_number=part_number
+    ):
         raise HTTPException(status_code=403, detail="Invalid or expired upload signature")
 
-    body = await request.body()
-    if not body:
-        raise HTTPException(status_code=400, detail="Empty body")
+    if upload_id is None or part_number is None:
+        writer = await asyncio.to_thread(storage.open_writer, path)
+    else:
+        try:
+            writer = await asyncio.to_thread(storage.open_part_writer, path, upload_id, part_number)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
 
-    storage.save_file(path, body)
+    _, checksum = await _stream_to(writer, request)
+    response.headers["ETag"] = f'"{checksum}"'
     return {"status": "ok"}
 
 
 @router.get("/storage/{path:path}")
-def download_file(path: str) -> Response:
-    """Local dev endpoint: serve stored files (simulates S3/CDN download)."""
+def download_file(path: str, request: Request) -> Response:
+    """Local dev endpoint: serve stored files (simulates S3/CDN download).
+
+    Streams from disk (sendfile where the server supports it) and honours
+    Range (206, including multi-range), If-Range and If-None-Match (304).
+    """
     _ensure_local_storage()
 
     storage = StorageService()
@@ -50,17 +110,21 @@ def download_file(path: str) -> Response:
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    if not file_path.exists():
+    if not file_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
-
-    suffix = file_path.suffix.lower()
-    media_types = {
-        ".usdz": "model/vnd.usdz+zip",
-        ".glb": "model/gltf-binary",
-        ".png": "image/png",
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
+    stat = file_path.stat()
+
+    # Content hash when the object was written through storage, else size+mtime
+    checksum = storage.get_recorded_checksum(path)
+    etag = f'"{checksum}"' if checksum else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            _IMMUTABLE_CACHE_CONTROL if path.startswith(_IMMUTABLE_PREFIXES) else "no-cache"
+        ),
     }
-    media_type = media_types.get(suffix, "application/octet-stream")
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
 
-    return Response(content=file_path.read_bytes(), media_type=media_type)
+    media_type = _MEDIA_TYPES.get(file_path.suffix.lower(), "application/octet-stream")
+    return FileResponse(file_path, media_type=media_type, stat_result=stat, headers=headers)
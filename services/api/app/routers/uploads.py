@@ -1,5 +1,7 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -11,6 +13,7 @@ from app.schemas.upload import (
     UploadCompleteResponse,
     UploadInitRequest,
     UploadInitResponse,
+    UploadPartsResponse,
 )
 from app.services.upload_service import UploadService
 
@@ -36,6 +39,32 @@ def init_upload(
     )
 
 
+@router.get("/{asset_id}/parts", response_model=UploadPartsResponse)
+def list_upload_parts(
+    asset_id: uuid.UUID,
+    role: str = Query(...),
+    upload_id: str = Query(...),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> UploadPartsResponse:
+    svc = UploadService(db)
+    return svc.list_upload_parts(
+        owner_id=user.id, asset_id=asset_id, role=role, upload_id=upload_id
+    )
+
+
+@router.delete("/{asset_id}/parts", status_code=204)
+def abort_upload_parts(
+    asset_id: uuid.UUID,
+    role: str = Query(...),
+    upload_id: str = Query(...),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> None:
+    svc = UploadService(db)
+    svc.abort_upload_parts(owner_id=user.id, asset_id=asset_id, role=role, upload_id=upload_id)
+
+
 @router.post("/complete", response_model=UploadCompleteResponse)
 def complete_upload(
     body: UploadCompleteRequest,
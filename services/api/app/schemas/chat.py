@@ -18,6 +18,7 @@ class ChatRoomResponse(BaseModel):
     created_at: datetime
     last_message_at: datetime | None = None
     last_message_body: str | None = None
+    last_seq: int = 0
     unread_count: int = 0
     buyer_name: str = ""
     seller_name: str = ""
@@ -43,6 +44,7 @@ class ChatMessageResponse(BaseModel):
     id: uuid.UUID
     room_id: uuid.UUID
     sender_id: uuid.UUID
+    seq: int
     body: str
     message_type: Literal["TEXT", "IMAGE"] = "TEXT"
     image_url: str | None = None
@@ -55,7 +57,12 @@ class ChatImageUploadResponse(BaseModel):
 
 class ChatRoomListResponse(BaseModel):
     rooms: list[ChatRoomResponse]
+    next_cursor: str | None = None
+    has_more: bool = False
 
 
 class ChatMessageListResponse(BaseModel):
     messages: list[ChatMessageResponse]
+    next_cursor: str | None = None
+    has_more: bool = False
+    sync_cursor: str | None = None
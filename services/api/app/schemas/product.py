@@ -57,6 +57,8 @@ class ProductResponse(BaseModel):
     seller_name: str = ""
     seller_avatar_url: str | None = None
     thumbnail_url: str | None = None
+    thumbnail_width: int | None = None
+    thumbnail_height: int | None = None
     category: str | None = None
     condition: str | None = None
     dims_comparison: str | None = None
@@ -72,9 +74,13 @@ class ProductResponse(BaseModel):
 
 class ProductListResponse(BaseModel):
     products: list[ProductResponse]
-    total: int
+    # None when total_strategy is "none"; approximate when "estimated"
+    total: int | None
     page: int
     limit: int
+    next_cursor: str | None = None
+    has_more: bool = False
+    total_strategy: str = "exact"
 
 
 class LikeToggleResponse(BaseModel):
@@ -7,6 +7,7 @@ from pydantic import BaseModel
 class FileInitMeta(BaseModel):
     role: str  # MODEL_USDZ | MODEL_GLB | PREVIEW_PNG
     size_bytes: int
+    multipart: bool = False  # upload in resumable parts instead of one PUT
 
 
 class ImageInitMeta(BaseModel):
@@ -25,10 +26,19 @@ class UploadInitRequest(BaseModel):
     images: list[ImageInitMeta] = []
 
 
+class PresignedPartTarget(BaseModel):
+    part_number: int
+    url: str
+    expires_at: datetime
+
+
 class PresignedUploadTarget(BaseModel):
     role: str
-    url: str
+    url: str | None = None  # single PUT; None for multipart uploads
     expires_at: datetime
+    upload_id: str | None = None
+    part_size: int | None = None
+    parts: list[PresignedPartTarget] = []
 
 
 class PresignedImageTarget(BaseModel):
@@ -49,6 +59,7 @@ class FileCompleteMeta(BaseModel):
     role: str
     size_bytes: int
     checksum_sha256: str
+    upload_id: str | None = None  # set for multipart uploads
 
 
 class ImageCompleteMeta(BaseModel):
@@ -64,6 +75,14 @@ class UploadCompleteRequest(BaseModel):
     images: list[ImageCompleteMeta] = []
 
 
+class UploadPartsResponse(BaseModel):
+    role: str
+    upload_id: str
+    part_count: int
+    received_parts: list[int]
+    missing_parts: list[PresignedPartTarget]
+
+
 class FileVerifyResult(BaseModel):
     role: str
     verified: bool
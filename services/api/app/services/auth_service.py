@@ -5,7 +5,6 @@ from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.models.user import User
-from app.repositories.chat_repo import ChatRepo
 from app.repositories.product_repo import ProductRepo
 from app.repositories.refresh_token_repo import RefreshTokenRepo
 from app.repositories.user_repo import UserRepo
@@ -25,7 +24,6 @@ class AuthService:
         self.db = db
         self.user_repo = UserRepo(db)
         self.product_repo = ProductRepo(db)
-        self.chat_repo = ChatRepo(db)
         self.refresh_token_repo = RefreshTokenRepo(db)
         self.jwt_service = JwtService()
 
@@ -179,9 +177,8 @@ class AuthService:
         if not user:
             return None
         product_count = self.product_repo.count_by_seller(user_id)
-        unread = self.chat_repo.count_unread_for_user(user_id)
         return UserSummaryResponse(
             user=self._user_response(user),
             product_count=product_count,
-            unread_messages=unread,
+            unread_messages=user.unread_messages_count,
         )
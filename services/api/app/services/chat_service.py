@@ -1,18 +1,91 @@
+import logging
 import uuid
 from datetime import datetime
+from typing import Literal, cast
 
 from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models.chat import ChatRoom
-from app.models.enums import ImageType, MessageType
-from app.repositories.chat_repo import ChatRepo
+from app.config import settings
+from app.database import SessionLocal
+from app.models.chat import ChatMessage, ChatRoom
+from app.models.enums import MessageType
+from app.repositories.chat_repo import AsyncChatRepo, ChatRepo
+from app.repositories.pagination import encode_cursor
 from app.repositories.product_repo import ProductRepo
-from app.schemas.chat import ChatMessageResponse, ChatRoomResponse
+from app.schemas.chat import ChatMessageListResponse, ChatMessageResponse, ChatRoomResponse
 from app.services.storage_service import StorageService
 
+logger = logging.getLogger(__name__)
+
 _storage = StorageService()
 
+def _room_response(room: ChatRoom, unread: int) -> ChatRoomResponse:
+    buyer_name = ""
+    seller_name = ""
+    product_title = ""
+    product_thumbnail_url: str | None = None
+
+    if room.buyer:
+        buyer_name = room.buyer.name or ""
+    if room.seller:
+        seller_name = room.seller.name or ""
+    if room.product:
+        product_title = room.product.title or ""
+        if room.product.thumbnail_key:
+            product_thumbnail_url = _storage.get_download_url(room.product.thumbnail_key)
+
+    return ChatRoomResponse(
+        id=room.id,
+        product_id=room.product_id,
+        buyer_id=room.buyer_id,
+        seller_id=room.seller_id,
+        subject=room.subject,
+        created_at=room.created_at,
+        last_message_at=room.last_message_at,
+        last_message_body=room.last_message_body,
+        last_seq=room.last_seq,
+        unread_count=unread,
+        buyer_name=buyer_name,
+        seller_name=seller_name,
+        product_title=product_title,
+        product_thumbnail_url=product_thumbnail_url,
+    )
+
+
+def _message_response(msg: ChatMessage) -> ChatMessageResponse:
+    return ChatMessageResponse(
+        id=msg.id,
+        room_id=msg.room_id,
+        sender_id=msg.sender_id,
+        seq=msg.seq,
+        body=msg.body,
+        message_type=cast(Literal["TEXT", "IMAGE"], msg.message_type or MessageType.TEXT),
+        image_url=msg.image_url,
+        created_at=msg.created_at,
+    )
+
+
+def _message_page(
+    messages: list[ChatMessage],
+    next_cursor: str | None,
+    has_more: bool,
+    after: str | None,
+    ascending: bool = False,
+) -> ChatMessageListResponse:
+    # Newest message on the page: where the next forward sync (?after=) starts
+    newest = None
+    if messages:
+        newest = messages[-1] if ascending else messages[0]
+    return ChatMessageListResponse(
+        messages=[_message_response(m) for m in messages],
+        next_cursor=next_cursor,
+        has_more=has_more,
+        sync_cursor=encode_cursor(newest.created_at, newest.id) if newest else after,
+    )
+
 
 class ChatService:
     def __init__(self, db: Session) -> None:
@@ -23,40 +96,7 @@ class ChatService:
     def _build_room_response(
         self, room: ChatRoom, user_id: uuid.UUID,
     ) -> ChatRoomResponse:
-        unread = self.chat_repo.count_unread_for_room(room, user_id)
-
-        buyer_name = ""
-        seller_name = ""
-        product_title = ""
-        product_thumbnail_url: str | None = None
-
-        if room.buyer:
-            buyer_name = room.buyer.name or ""
-        if room.seller:
-            seller_name = room.seller.name or ""
-        if room.product:
-            product_title = room.product.title or ""
-            if room.product.asset and room.product.asset.images:
-                for img in sorted(room.product.asset.images, key=lambda i: i.sort_order):
-                    if img.image_type == ImageType.THUMBNAIL:
-                        product_thumbnail_url = _storage.get_download_url(img.storage_key)
-                        break
-
-        return ChatRoomResponse(
-            id=room.id,
-            product_id=room.product_id,
-            buyer_id=room.buyer_id,
-            seller_id=room.seller_id,
-            subject=room.subject,
-            created_at=room.created_at,
-            last_message_at=room.last_message_at,
-            last_message_body=room.last_message_body,
-            unread_count=unread,
-            buyer_name=buyer_name,
-            seller_name=seller_name,
-            product_title=product_title,
-            product_thumbnail_url=product_thumbnail_url,
-        )
+        return _room_response(room, self.chat_repo.count_unread_for_room(room, user_id))
 
     def create_room(
         self,
@@ -78,49 +118,23 @@ class ChatService:
 
         return self._build_room_response(room, buyer_id)
 
-    def list_rooms(self, user_id: uuid.UUID) -> list[ChatRoomResponse]:
-        rooms = self.chat_repo.list_rooms(user_id)
-        return [self._build_room_response(r, user_id) for r in rooms]
-
-    def mark_read(self, room_id: uuid.UUID, user_id: uuid.UUID) -> ChatRoomResponse:
+    def mark_read(
+        self, room_id: uuid.UUID, user_id: uuid.UUID
+    ) -> tuple[ChatRoomResponse, tuple[int, int]]:
+        """Returns the room and the reader's (read seq, total unread) to publish."""
         room = self.chat_repo.get_room(room_id)
         if not room:
             raise HTTPException(status_code=404, detail="Chat room not found")
         if room.buyer_id != user_id and room.seller_id != user_id:
             raise HTTPException(status_code=403, detail="Not a participant")
 
-        self.chat_repo.mark_read(room_id, user_id)
+        read = self.chat_repo.mark_read(room_id, user_id)
+        if read is None:
+            raise HTTPException(status_code=404, detail="Chat room not found")
         self.db.commit()
         self.db.refresh(room)
 
-        return self._build_room_response(room, user_id)
-
-    def get_messages(
-        self,
-        room_id: uuid.UUID,
-        user_id: uuid.UUID,
-        before: datetime | None = None,
-        limit: int = 50,
-    ) -> list[ChatMessageResponse]:
-        room = self.chat_repo.get_room(room_id)
-        if not room:
-            raise HTTPException(status_code=404, detail="Chat room not found")
-        if room.buyer_id != user_id and room.seller_id != user_id:
-            raise HTTPException(status_code=403, detail="Not a participant")
-
-        messages = self.chat_repo.get_messages(room_id, before=before, limit=limit)
-        return [
-            ChatMessageResponse(
-                id=m.id,
-                room_id=m.room_id,
-                sender_id=m.sender_id,
-                body=m.body,
-                message_type=m.message_type or MessageType.TEXT,
-                image_url=m.image_url,
-                created_at=m.created_at,
-            )
-            for m in messages
-        ]
+        return self._build_room_response(room, user_id), read
 
     def send_message(
         self,
@@ -128,7 +142,8 @@ class ChatService:
         sender_id: uuid.UUID,
         body: str,
         image_url: str | None = None,
-    ) -> ChatMessageResponse:
+    ) -> tuple[ChatMessageResponse, dict[uuid.UUID, tuple[int, int]]]:
+        """Returns the message and each participant's (room unread, total unread)."""
         room = self.chat_repo.get_room(room_id)
         if not room:
             raise HTTPException(status_code=404, detail="Chat room not found")
@@ -136,7 +151,7 @@ class ChatService:
             raise HTTPException(status_code=403, detail="Not a participant")
 
         message_type = MessageType.IMAGE if image_url else MessageType.TEXT
-        msg = self.chat_repo.add_message(
+        msg, unread = self.chat_repo.add_message(
             room_id=room_id,
             sender_id=sender_id,
             body=body,
@@ -145,12 +160,87 @@ class ChatService:
         )
         self.db.commit()
 
-        return ChatMessageResponse(
-            id=msg.id,
-            room_id=msg.room_id,
-            sender_id=msg.sender_id,
-            body=msg.body,
-            message_type=msg.message_type or MessageType.TEXT,
-            image_url=msg.image_url,
-            created_at=msg.created_at,
-        )
+        return _message_response(msg), unread
+
+
+class AsyncChatService:
+    """Chat read paths on an AsyncSession; writes stay on ChatService."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+        self.chat_repo = AsyncChatRepo(db)
+
+    async def list_rooms(
+        self, user_id: uuid.UUID, cursor: str | None = None, limit: int | None = None
+    ) -> tuple[list[ChatRoomResponse], str | None, bool]:
+        rows, next_cursor, has_more = await self.chat_repo.list_rooms(user_id, cursor, limit)
+        return [_room_response(r, unread) for r, unread in rows], next_cursor, has_more
+
+    async def get_messages(
+        self,
+        room_id: uuid.UUID,
+        user_id: uuid.UUID,
+        before: datetime | None = None,
+        limit: int = 50,
+        cursor: str | None = None,
+        after: str | None = None,
+        after_seq: int | None = None,
+    ) -> ChatMessageListResponse:
+        room = await self.chat_repo.get_room(room_id)
+        if not room:
+            raise HTTPException(status_code=404, detail="Chat room not found")
+        if room.buyer_id != user_id and room.seller_id != user_id:
+            raise HTTPException(status_code=403, detail="Not a participant")
+
+        try:
+            messages, next_cursor, has_more = await self.chat_repo.get_messages(
+                room_id,
+                before=before,
+                limit=limit,
+                cursor=cursor,
+                after=after,
+                after_seq=after_seq,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        ascending = after is not None or after_seq is not None
+        return _message_page(messages, next_cursor, has_more, after, ascending)
+
+
+def reconcile_unread_counts() -> int:
+    """Repair drifted per-user unread totals in a fresh session. Returns users fixed.
+
+    Users are walked in batches of chat_unread_reconcile_batch_size, one short
+    READ COMMITTED transaction each, so the pass never holds more than one
+    batch of row locks against live sends and reads. Users a writer is holding
+    are skipped until the next pass.
+    """
+    repaired = skipped = 0
+    after: uuid.UUID | None = None
+    db = SessionLocal()
+    try:
+        repo = ChatRepo(db)
+        while user_ids := repo.user_ids_after(after, settings.chat_unread_reconcile_batch_size):
+            after = user_ids[-1]
+            try:
+                fixed, busy = repo.reconcile_unread_counts(user_ids)
+                db.commit()
+            except OperationalError:
+                db.rollback()
+                logger.warning(
+                    "Unread reconcile gave up on a batch of %d users after %s",
+                    len(user_ids),
+                    user_ids[0],
+                    exc_info=True,
+                )
+                skipped += len(user_ids)
+                continue
+            repaired += fixed
+            skipped += busy
+    finally:
+        db.close()
+    if repaired:
+        logger.info("Repaired unread totals on %d users", repaired)
+    if skipped:
+        logger.warning("Unread reconcile skipped %d busy users; retrying next pass", skipped)
+    return repaired
@@ -1,45 +1,577 @@
-"""WebSocket connection manager for room-based chat broadcast."""
+"""WebSocket connection manager for chat broadcast.
 
+Clients hold either a socket per open room or one per-user socket that
+carries events for all of the user's rooms, so connections are indexed by
+room and by user. Sockets are local to a worker, so deliveries also go
+through a broker: the in-memory one for a single process, or Redis pub/sub
+(one channel per room and per user) so sockets on other workers receive them
+too. A worker subscribes only to channels it has live sockets for.
+"""
+
+import asyncio
+import json
+import logging
+import time
 import uuid
-from typing import Any
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager
+from typing import Any, Protocol
 
 from fastapi import WebSocket
 
+from app.config import settings
+from app.models.enums import ChatSendQueuePolicy
+
+logger = logging.getLogger(__name__)
+
+_ROOM_CHANNEL_PREFIX = "chat:room:"
+_USER_CHANNEL_PREFIX = "chat:user:"
+
+DeliverFn = Callable[[str, dict[str, Any], uuid.UUID | None], Awaitable[None]]
+
+
+def _room_channel(room_id: uuid.UUID) -> str:
+    return f"{_ROOM_CHANNEL_PREFIX}{room_id}"
+
+
+def _user_channel(user_id: uuid.UUID) -> str:
+    return f"{_USER_CHANNEL_PREFIX}{user_id}"
+
+
+class ChatBroker(Protocol):
+    async def start(self, deliver: DeliverFn) -> None: ...
+
+    async def subscribe(self, channel: str) -> None: ...
+
+    async def unsubscribe(self, channel: str) -> None: ...
+
+    async def publish(
+        self, channel: str, message: dict[str, Any], exclude_user_id: uuid.UUID | None
+    ) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class InMemoryBroker:
+    """Single-process broker; local sockets are already delivered to by the manager."""
+
+    async def start(self, deliver: DeliverFn) -> None:
+        pass
+
+    async def subscribe(self, channel: str) -> None:
+        pass
+
+    async def unsubscribe(self, channel: str) -> None:
+        pass
+
+    async def publish(
+        self, channel: str, message: dict[str, Any], exclude_user_id: uuid.UUID | None
+    ) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """Fan-out across workers over Redis pub/sub, one channel per room and per user.
+
+    Every publish carries this worker's origin id; the reader drops its own
+    messages because the manager delivered them locally before publishing.
+    A subscribe that fails leaves the channel pending; the reader retries it
+    until Redis accepts it, so the sockets that asked for it start receiving.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.origin = uuid.uuid4().hex
+        self._client: Any = None
+        self._pubsub: Any = None
+        self._reader: asyncio.Task[None] | None = None
+        self._deliver: DeliverFn | None = None
+        self._wake: asyncio.Event | None = None
+        # Channels a subscribe failed on, resubscribed by the reader
+        self._pending: set[str] = set()
+
+    async def start(self, deliver: DeliverFn) -> None:
+        import redis.asyncio as aioredis
+
+        self._client = aioredis.Redis.from_url(
+            self.url, socket_connect_timeout=0.5, decode_responses=True
+        )
+        await self._client.ping()
+        self._pubsub = self._client.pubsub()
+        self._deliver = deliver
+        self._wake = asyncio.Event()
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def subscribe(self, channel: str) -> None:
+        try:
+            await self._pubsub.subscribe(channel)
+        except Exception:
+            logger.warning("Chat broker subscribe failed on %s; retrying", channel, exc_info=True)
+            self._pending.add(channel)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def unsubscribe(self, channel: str) -> None:
+        if channel in self._pending:
+            self._pending.discard(channel)
+            return
+        try:
+            await self._pubsub.unsubscribe(channel)
+        except Exception:
+            logger.warning("Chat broker unsubscribe failed on %s", channel, exc_info=True)
+
+    async def publish(
+        self, channel: str, message: dict[str, Any], exclude_user_id: uuid.UUID | None
+    ) -> None:
+        envelope = {
+            "origin": self.origin,
+            "channel": channel,
+            "exclude_user_id": str(exclude_user_id) if exclude_user_id else None,
+            "message": message,
+        }
+        try:
+            await self._client.publish(channel, json.dumps(envelope))
+        except Exception:
+            logger.warning("Chat broadcast publish failed on %s", channel, exc_info=True)
+
+    async def handle(self, raw: str) -> None:
+        envelope = json.loads(raw)
+        if envelope.get("origin") == self.origin or self._deliver is None:
+            return
+        exclude = envelope.get("exclude_user_id")
+        await self._deliver(
+            envelope["channel"],
+            envelope["message"],
+            uuid.UUID(exclude) if exclude else None,
+        )
+
+    async def _resubscribe_pending(self) -> None:
+        for channel in list(self._pending):
+            await self._pubsub.subscribe(channel)
+            if channel in self._pending:
+                self._pending.discard(channel)
+                logger.info("Chat broker resubscribed to %s", channel)
+            else:
+                # Its last socket left while the subscribe was in flight
+                await self._pubsub.unsubscribe(channel)
+
+    async def _read_loop(self) -> None:
+        assert self._wake is not None
+        while True:
+            # get_message needs at least one subscription
+            if not self._pubsub.subscribed and not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            try:
+                if self._pending:
+                    await self._resubscribe_pending()
+                msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if msg is not None:
+                    await self.handle(msg["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Chat broker read failed; retrying", exc_info=True)
+                await asyncio.sleep(1.0)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def _create_broker() -> ChatBroker:
+    if settings.chat_broker_backend == "redis":
+        return RedisBroker(settings.redis_url)
+    return InMemoryBroker()
+
+
+# Ephemeral frame types; under the coalesce policy a newer one replaces a queued one
+_COALESCE_TYPES = frozenset({"typing"})
+
+# Close code sent to a client dropped for falling behind (1013: try again later)
+_SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def _coalesce_key(message: dict[str, Any]) -> str | None:
+    frame_type = message.get("type")
+    if frame_type in _COALESCE_TYPES:
+        # Per room too: a per-user socket carries typing frames for every room
+        return f"{frame_type}:{message.get('room_id')}:{message.get('user_id')}"
+    return None
+
+
+def _seq_through(text: str, seq: int) -> bool:
+    frame = json.loads(text)
+    return frame.get("type") == "message" and int(frame["seq"]) <= seq
+
+
+class _Connection:
+    """One socket's bounded outbound queue, drained by its own writer task.
+
+    Broadcasters only enqueue, so a slow client delays nobody but itself.
+    """
+
+    def __init__(self, room_id: uuid.UUID | None, user_id: uuid.UUID, ws: WebSocket) -> None:
+        # room_id is None for a per-user socket
+        self.room_id = room_id
+        self.user_id = user_id
+        self.ws = ws
+        # (serialized frame, coalesce key, enqueued at)
+        self.queue: deque[tuple[str, str | None, float]] = deque()
+        self.ready = asyncio.Event()
+        # While held, frames queue up but the writer doesn't send them yet
+        self.held = False
+        self.writer: asyncio.Task[None] | None = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_queued = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def enqueue(self, text: str, key: str | None, max_size: int, policy: str) -> bool:
+        """Queue a frame. Returns False if the connection should be dropped."""
+        now = time.monotonic()
+        if policy == ChatSendQueuePolicy.COALESCE and key is not None:
+            for i, (_, queued_key, enqueued_at) in enumerate(self.queue):
+                if queued_key == key:
+                    # Keep the older enqueue time so lag still reflects the wait
+                    self.queue[i] = (text, key, enqueued_at)
+                    self.coalesced += 1
+                    return True
+        if len(self.queue) >= max_size:
+            if policy == ChatSendQueuePolicy.DISCONNECT:
+                return False
+            self._drop_one(policy)
+        self.queue.append((text, key, now))
+        self.max_queued = max(self.max_queued, len(self.queue))
+        self.ready.set()
+        return True
+
+    def _drop_one(self, policy: str) -> None:
+        if policy == ChatSendQueuePolicy.COALESCE:
+            # Shed ephemeral frames before real messages
+            for i, (_, key, _) in enumerate(self.queue):
+                if key is not None:
+                    del self.queue[i]
+                    self.dropped += 1
+                    return
+        self.queue.popleft()
+        self.dropped += 1
+
+    def release(self, first: str | None, through_seq: int | None = None) -> None:
+        """Start sending, with ``first`` ahead of everything queued while held.
+
+        Queued messages with a seq up to ``through_seq`` are dropped: ``first``
+        already carries them.
+        """
+        if through_seq is not None:
+            self.queue = deque(
+                entry for entry in self.queue if not _seq_through(entry[0], through_seq)
+            )
+        if first is not None:
+            self.queue.appendleft((first, None, time.monotonic()))
+        self.held = False
+        self.ready.set()
+
+    async def write_loop(self) -> None:
+        while True:
+            while not self.queue or self.held:
+                self.ready.clear()
+                await self.ready.wait()
+            text, _, enqueued_at = self.queue.popleft()
+            await self.ws.send_text(text)
+            lag = time.monotonic() - enqueued_at
+            self.sent += 1
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "room_id": str(self.room_id) if self.room_id else None,
+            "user_id": str(self.user_id),
+            "queued": len(self.queue),
+            "max_queued": self.max_queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "lag_seconds": {
+                "last": round(self.last_lag_seconds, 6),
+                "max": round(self.max_lag_seconds, 6),
+            },
+        }
+
 
 class ConnectionManager:
-    """Manages WebSocket connections per room for broadcast."""
+    """Manages WebSocket connections per room and per user for broadcast."""
+
+    def __init__(self, broker: ChatBroker) -> None:
+        # room_id -> {user_id -> connection}
+        self.active_connections: dict[uuid.UUID, dict[uuid.UUID, _Connection]] = {}
+        # user_id -> per-user connection
+        self.user_connections: dict[uuid.UUID, _Connection] = {}
+        # room_id -> events of parked long-poll requests, set by the next message
+        self.room_waiters: dict[uuid.UUID, set[asyncio.Event]] = {}
+        self.broker = broker
+        self.queue_size = settings.chat_send_queue_size
+        self.policy = settings.chat_send_queue_policy
+        self.slow_disconnects = 0
+        # Close handshakes to dropped slow clients, kept so they aren't collected mid-flight
+        self._closing: set[asyncio.Task[None]] = set()
 
-    def __init__(self) -> None:
-        # room_id -> {user_id -> WebSocket}
-        self.active_connections: dict[uuid.UUID, dict[uuid.UUID, WebSocket]] = {}
+    async def start(self) -> None:
+        try:
+            await self.broker.start(self._deliver_remote)
+        except Exception:
+            logger.warning(
+                "Chat broker unavailable; broadcasts reach this worker only", exc_info=True
+            )
+            self.broker = InMemoryBroker()
 
-    async def connect(self, room_id: uuid.UUID, user_id: uuid.UUID, ws: WebSocket) -> None:
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = {}
-        self.active_connections[room_id][user_id] = ws
+    async def stop(self) -> None:
+        for conn in self._all_connections():
+            self._stop_writer(conn)
+        self.active_connections.clear()
+        self.user_connections.clear()
+        for task in self._closing:
+            task.cancel()
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        await self.broker.close()
 
-    def disconnect(self, room_id: uuid.UUID, user_id: uuid.UUID) -> None:
+    async def connect(
+        self, room_id: uuid.UUID, user_id: uuid.UUID, ws: WebSocket, hold: bool = False
+    ) -> None:
+        """Register ``ws``. With ``hold``, live frames queue until :meth:`release`."""
+        # Registered before subscribing: a connect to the same room while
+        # subscribe is in flight must find this room, not replace it
+        subscribe = not self._room_watched(room_id)
+        room = self.active_connections.setdefault(room_id, {})
+        previous = room.get(user_id)
+        if previous is not None:
+            self._stop_writer(previous)
+        conn = _Connection(room_id, user_id, ws)
+        conn.held = hold
+        conn.writer = asyncio.create_task(self._run_writer(conn))
+        room[user_id] = conn
+        if subscribe:
+            await self.broker.subscribe(_room_channel(room_id))
+
+    async def connect_user(self, user_id: uuid.UUID, ws: WebSocket) -> None:
+        """Register ``ws`` as the user's socket for events from all their rooms."""
+        previous = self.user_connections.get(user_id)
+        if previous is not None:
+            self._stop_writer(previous)
+        conn = _Connection(None, user_id, ws)
+        conn.writer = asyncio.create_task(self._run_writer(conn))
+        self.user_connections[user_id] = conn
+        if previous is None:
+            await self.broker.subscribe(_user_channel(user_id))
+
+    async def disconnect(
+        self, room_id: uuid.UUID, user_id: uuid.UUID, ws: WebSocket | None = None
+    ) -> None:
+        """Forget ``user_id``'s socket. With ``ws``, only if it's still the registered one."""
         room = self.active_connections.get(room_id)
-        if room:
-            room.pop(user_id, None)
-            if not room:
-                del self.active_connections[room_id]
+        if not room:
+            return
+        conn = room.get(user_id)
+        if conn is None or (ws is not None and conn.ws is not ws):
+            return
+        del room[user_id]
+        self._stop_writer(conn)
+        if not room:
+            del self.active_connections[room_id]
+            if not self._room_watched(room_id):
+                await self.broker.unsubscribe(_room_channel(room_id))
+
+    async def disconnect_user(self, user_id: uuid.UUID, ws: WebSocket | None = None) -> None:
+        """Forget the user's per-user socket, only if it's still ``ws`` when given."""
+        conn = self.user_connections.get(user_id)
+        if conn is None or (ws is not None and conn.ws is not ws):
+            return
+        del self.user_connections[user_id]
+        self._stop_writer(conn)
+        await self.broker.unsubscribe(_user_channel(user_id))
+
+    @asynccontextmanager
+    async def watch_room(self, room_id: uuid.UUID) -> AsyncIterator[asyncio.Event]:
+        """An event set by the next message broadcast to ``room_id`` from any worker.
+
+        Enter before reading the room so a message sent in between still wakes it.
+        """
+        woken = asyncio.Event()
+        subscribe = not self._room_watched(room_id)
+        self.room_waiters.setdefault(room_id, set()).add(woken)
+        try:
+            if subscribe:
+                await self.broker.subscribe(_room_channel(room_id))
+            yield woken
+        finally:
+            waiters = self.room_waiters[room_id]
+            waiters.discard(woken)
+            if not waiters:
+                del self.room_waiters[room_id]
+                if not self._room_watched(room_id):
+                    await self.broker.unsubscribe(_room_channel(room_id))
+
+    def _room_watched(self, room_id: uuid.UUID) -> bool:
+        return room_id in self.active_connections or room_id in self.room_waiters
+
+    def release(
+        self,
+        room_id: uuid.UUID,
+        user_id: uuid.UUID,
+        ws: WebSocket,
+        first: dict[str, Any] | None = None,
+    ) -> None:
+        """Let a held connection send, delivering ``first`` before any live frame.
+
+        A message committed between connect and the backlog read is both in a
+        backlog ``first`` and queued live; the live copy is dropped.
+        """
+        conn = self.active_connections.get(room_id, {}).get(user_id)
+        if conn is None or conn.ws is not ws:
+            return
+        through_seq = None
+        if first is not None and first.get("messages"):
+            through_seq = max(m["seq"] for m in first["messages"])
+        conn.release(json.dumps(first) if first is not None else None, through_seq)
 
     async def broadcast_to_room(
         self,
         room_id: uuid.UUID,
         message: dict[str, Any],
         exclude_user_id: uuid.UUID | None = None,
+        participants: Iterable[uuid.UUID] = (),
     ) -> None:
-        room = self.active_connections.get(room_id, {})
-        for uid, ws in list(room.items()):
-            if uid == exclude_user_id:
-                continue
-            try:
-                await ws.send_json(message)
-            except Exception:
-                # Dead connection — clean up
-                self.disconnect(room_id, uid)
+        """Send to the room's sockets and to ``participants``' per-user sockets."""
+        # Serialized once for every local socket it goes to
+        text = json.dumps(message)
+        await self._deliver_room(room_id, message, exclude_user_id, text)
+        await self.broker.publish(_room_channel(room_id), message, exclude_user_id)
+        for user_id in set(participants):
+            if user_id != exclude_user_id:
+                await self._send_to_user(user_id, message, text)
+
+    async def send_to_user(self, user_id: uuid.UUID, message: dict[str, Any]) -> None:
+        """Send to the user's per-user socket, wherever it is connected."""
+        await self._send_to_user(user_id, message, json.dumps(message))
+
+    async def _send_to_user(self, user_id: uuid.UUID, message: dict[str, Any], text: str) -> None:
+        await self._deliver_user(user_id, message, text)
+        await self.broker.publish(_user_channel(user_id), message, None)
+
+    async def _deliver_remote(
+        self, channel: str, message: dict[str, Any], exclude_user_id: uuid.UUID | None
+    ) -> None:
+        if channel.startswith(_ROOM_CHANNEL_PREFIX):
+            room_id = uuid.UUID(channel.removeprefix(_ROOM_CHANNEL_PREFIX))
+            await self._deliver_room(room_id, message, exclude_user_id)
+        elif channel.startswith(_USER_CHANNEL_PREFIX):
+            await self._deliver_user(
+                uuid.UUID(channel.removeprefix(_USER_CHANNEL_PREFIX)), message
+            )
+
+    async def _deliver_room(
+        self,
+        room_id: uuid.UUID,
+        message: dict[str, Any],
+        exclude_user_id: uuid.UUID | None = None,
+        text: str | None = None,
+    ) -> None:
+        if message.get("type") == "message":
+            for woken in self.room_waiters.get(room_id, ()):
+                woken.set()
+        room = self.active_connections.get(room_id)
+        if not room:
+            return
+        if text is None:
+            text = json.dumps(message)
+        key = _coalesce_key(message)
+        for uid, conn in list(room.items()):
+            if uid != exclude_user_id:
+                await self._enqueue(conn, text, key)
+
+    async def _deliver_user(
+        self, user_id: uuid.UUID, message: dict[str, Any], text: str | None = None
+    ) -> None:
+        conn = self.user_connections.get(user_id)
+        if conn is not None:
+            if text is None:
+                text = json.dumps(message)
+            await self._enqueue(conn, text, _coalesce_key(message))
+
+    async def _enqueue(self, conn: _Connection, text: str, key: str | None) -> None:
+        if conn.enqueue(text, key, self.queue_size, self.policy):
+            return
+        self.slow_disconnects += 1
+        logger.info("Dropping slow chat client %s in room %s", conn.user_id, conn.room_id)
+        await self._forget(conn)
+        task = asyncio.create_task(self._close(conn.ws, _SLOW_CONSUMER_CLOSE_CODE))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _forget(self, conn: _Connection) -> None:
+        if conn.room_id is None:
+            await self.disconnect_user(conn.user_id, conn.ws)
+        else:
+            await self.disconnect(conn.room_id, conn.user_id, conn.ws)
+
+    async def _run_writer(self, conn: _Connection) -> None:
+        try:
+            await conn.write_loop()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead connection — clean up
+            await self._forget(conn)
+
+    def _all_connections(self) -> list[_Connection]:
+        rooms = [conn for room in self.active_connections.values() for conn in room.values()]
+        return rooms + list(self.user_connections.values())
+
+    @staticmethod
+    def _stop_writer(conn: _Connection) -> None:
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    @staticmethod
+    async def _close(ws: WebSocket, code: int) -> None:
+        try:
+            await ws.close(code=code, reason="Client too slow")
+        except Exception:
+            # Usually already gone; nothing more to tell it
+            logger.debug("Closing slow chat client failed", exc_info=True)
+
+    def snapshot(self) -> dict[str, Any]:
+        connections = [conn.snapshot() for conn in self._all_connections()]
+        return {
+            "rooms": len(self.active_connections),
+            "users": len(self.user_connections),
+            "long_poll_waiters": sum(len(w) for w in self.room_waiters.values()),
+            "connections": len(connections),
+            "queue_size": self.queue_size,
+            "policy": self.policy,
+            "slow_disconnects": self.slow_disconnects,
+            "max_lag_seconds": max(
+                (c["lag_seconds"]["max"] for c in connections), default=0.0
+            ),
+            "per_connection": connections,
+        }
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(_create_broker())
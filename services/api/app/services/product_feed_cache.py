@@ -0,0 +1,214 @@
+"""Read-through cache for anonymous product feed pages.
+
+Pages are keyed on the normalized filter tuple plus a cache generation.
+Writes that change what a feed page shows (publish, edits, status changes,
+deletes) bump the generation once their transaction commits, so invalidation
+is a single increment instead of a key scan; the services and routes making
+those writes flag their session with :meth:`ProductFeedCache.invalidate_on_commit`.
+Like counts change too often for that; readers overlay them onto cached pages,
+as they do ``is_liked``. Views, chat and seller trade counts are not overlaid
+and may lag by up to the TTL.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.schemas.product import ProductListResponse
+
+logger = logging.getLogger(__name__)
+
+_GENERATION_KEY = "product_feed:generation"
+_DIRTY_FLAG = "product_feed_cache_dirty"
+
+
+class _CacheBackend(Protocol):
+    def get(self, key: str) -> str | None: ...
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None: ...
+
+    def get_generation(self) -> int: ...
+
+    def bump_generation(self) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class _MemoryBackend:
+    """Per-process LRU with TTL. Used locally and when Redis is unavailable.
+
+    Generations are per process too, so a write handled by one worker leaves
+    other workers serving their cached pages until the TTL expires. Only use it
+    with a single worker.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self) -> None:
+        with self._lock:
+            self._generation += 1
+            # Older generations can never be read again
+            self._entries.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation = 0
+
+
+class _RedisBackend:
+    """Shared cache across workers on the configured redis_url."""
+
+    def __init__(self, url: str) -> None:
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=0.5, socket_connect_timeout=0.5, decode_responses=True
+        )
+        self.client.ping()
+
+    def get(self, key: str) -> str | None:
+        value = self.client.get(key)
+        return value if isinstance(value, str) else None
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self.client.set(key, value, ex=ttl_seconds)
+
+    def get_generation(self) -> int:
+        value = self.client.get(_GENERATION_KEY)
+        return int(value) if isinstance(value, str) else 0
+
+    def bump_generation(self) -> None:
+        self.client.incr(_GENERATION_KEY)
+
+    def clear(self) -> None:
+        self.bump_generation()
+
+
+def _create_backend() -> _CacheBackend:
+    if settings.product_feed_cache_backend == "redis":
+        try:
+            return _RedisBackend(settings.redis_url)
+        except Exception:
+            logger.warning(
+                "Redis unavailable for product feed cache; using in-process LRU",
+                exc_info=True,
+            )
+    return _MemoryBackend(settings.product_feed_cache_max_entries)
+
+
+class ProductFeedCache:
+    def __init__(self, backend: _CacheBackend) -> None:
+        self.backend = backend
+        self.ttl_seconds = settings.product_feed_cache_ttl_seconds
+
+    def _key(self, generation: int, params: dict[str, Any], kind: str = "page") -> str:
+        digest = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        prefix = "product_feed" if kind == "page" else f"product_feed_{kind}"
+        return f"{prefix}:{generation}:{digest}"
+
+    def current_generation(self) -> int | None:
+        """Read before querying; pages are stored under the generation they were built in."""
+        if self.ttl_seconds <= 0:
+            return None
+        try:
+            return self.backend.get_generation()
+        except Exception:
+            logger.warning("Product feed cache read failed", exc_info=True)
+            return None
+
+    def get(self, generation: int, params: dict[str, Any]) -> ProductListResponse | None:
+        try:
+            raw = self.backend.get(self._key(generation, params))
+        except Exception:
+            logger.warning("Product feed cache read failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        return ProductListResponse.model_validate_json(raw)
+
+    def set(self, generation: int, params: dict[str, Any], page: ProductListResponse) -> None:
+        try:
+            key = self._key(generation, params)
+            self.backend.set(key, page.model_dump_json(), self.ttl_seconds)
+        except Exception:
+            logger.warning("Product feed cache write failed", exc_info=True)
+
+    def get_count(self, generation: int, filters: dict[str, Any]) -> int | None:
+        """Total for a filter tuple, shared by every page and sort of that filter."""
+        try:
+            raw = self.backend.get(self._key(generation, filters, kind="count"))
+        except Exception:
+            logger.warning("Product feed cache read failed", exc_info=True)
+            return None
+        return int(raw) if raw is not None else None
+
+    def set_count(self, generation: int, filters: dict[str, Any], total: int) -> None:
+        try:
+            key = self._key(generation, filters, kind="count")
+            self.backend.set(key, str(total), self.ttl_seconds)
+        except Exception:
+            logger.warning("Product feed cache write failed", exc_info=True)
+
+    def invalidate(self) -> None:
+        try:
+            self.backend.bump_generation()
+        except Exception:
+            logger.warning("Product feed cache invalidation failed", exc_info=True)
+
+    def invalidate_on_commit(self, db: Session) -> None:
+        """Invalidate once ``db`` commits, so no reader can re-cache pre-commit rows."""
+        db.info[_DIRTY_FLAG] = True
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+product_feed_cache = ProductFeedCache(_create_backend())
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_FLAG, False):
+        product_feed_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_FLAG, None)
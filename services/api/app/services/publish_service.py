@@ -9,6 +9,7 @@ from app.repositories.model_asset_repo import ModelAssetRepo
 from app.repositories.product_repo import ProductRepo
 from app.repositories.user_repo import UserRepo
 from app.schemas.product import ProductResponse
+from app.services.product_feed_cache import product_feed_cache
 from app.services.storage_service import StorageService
 
 
@@ -45,6 +46,12 @@ class PublishService:
                 detail=f"Asset status must be READY to publish, got {asset.status}",
             )
 
+        # Denormalize the thumbnail so list responses don't load asset images
+        thumbnail = self.image_repo.get_thumbnail(asset_id)
+        thumbnail_dims = (
+            self.storage.get_image_dimensions(thumbnail.storage_key) if thumbnail else None
+        )
+
         # Create product
         product = self.product_repo.create(
             asset_id=asset_id,
@@ -55,10 +62,14 @@ class PublishService:
             category=category,
             condition=condition,
             dims_comparison=dims_comparison,
+            thumbnail_key=thumbnail.storage_key if thumbnail else None,
+            thumbnail_width=thumbnail_dims[0] if thumbnail_dims else None,
+            thumbnail_height=thumbnail_dims[1] if thumbnail_dims else None,
         )
 
         # Transition asset to PUBLISHED
         self.asset_repo.update_status(asset, AssetStatus.PUBLISHED)
+        product_feed_cache.invalidate_on_commit(self.db)
         self.db.commit()
 
         # Resolve seller info
@@ -66,10 +77,8 @@ class PublishService:
         seller_name = seller.name if seller else ""
         seller_avatar_url = seller.avatar_url if seller else None
 
-        # Resolve thumbnail
-        thumbnail = self.image_repo.get_thumbnail(asset_id)
         thumbnail_url = (
-            self.storage.get_download_url(thumbnail.storage_key) if thumbnail else None
+            self.storage.get_download_url(product.thumbnail_key) if product.thumbnail_key else None
         )
 
         seller_location_name = seller.location_name if seller else None
@@ -86,6 +95,8 @@ class PublishService:
             seller_name=seller_name,
             seller_avatar_url=seller_avatar_url,
             thumbnail_url=thumbnail_url,
+            thumbnail_width=product.thumbnail_width,
+            thumbnail_height=product.thumbnail_height,
             category=product.category,
             condition=product.condition,
             dims_comparison=product.dims_comparison,
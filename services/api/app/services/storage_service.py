@@ -1,14 +1,130 @@
 import hashlib
 import hmac
+import json
+import logging
+import os
 import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from typing import Any
 from urllib.parse import urlencode
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 VALID_STORAGE_KEY_PATTERN = re.compile(r"^[A-Za-z0-9._/-]+$")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Sidecar metadata lives under this directory; keys can't address dot-segments
+METADATA_DIR = ".meta"
+# In-progress multipart uploads: <upload_id>/manifest.json plus one file per part
+MULTIPART_DIR = ".multipart"
+_UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_name, path)
+
+
+# One reusable buffer per hash: large reads, no per-chunk allocation, and
+# hashlib drops the GIL on updates this size so pool threads hash in parallel
+_HASH_BUFFER_BYTES = 1024 * 1024
+
+
+def _hash_file(file_path: Path) -> str:
+    sha256 = hashlib.sha256()
+    buffer = bytearray(_HASH_BUFFER_BYTES)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            sha256.update(view[:size])
+    return sha256.hexdigest()
+
+
+_verify_pool: ThreadPoolExecutor | None = None
+_verify_pool_lock = threading.Lock()
+
+
+def _get_verify_pool() -> ThreadPoolExecutor:
+    global _verify_pool
+    with _verify_pool_lock:
+        if _verify_pool is None:
+            _verify_pool = ThreadPoolExecutor(
+                max_workers=settings.storage_verify_workers,
+                thread_name_prefix="storage-verify",
+            )
+        return _verify_pool
+
+
+@dataclass
+class ObjectVerification:
+    storage_key: str
+    verified: bool
+    size_bytes: int
+    seconds: float
+    # False when the checksum recorded at write time was used
+    rehashed: bool
+
+    @property
+    def throughput_bytes_per_second(self) -> float:
+        return self.size_bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+class ObjectWriter:
+    """Writes one object to a temp file beside its destination, hashing as it goes.
+
+    Readers never see a partial object: :meth:`commit` renames the temp file
+    into place and records its size and checksum in the sidecar at
+    ``metadata_path``; :meth:`abort` removes it. Blocking I/O; call off the
+    event loop.
+    """
+
+    def __init__(self, file_path: Path, metadata_path: Path) -> None:
+        self.file_path = file_path
+        self.metadata_path = metadata_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".upload-", dir=file_path.parent)
+        self._tmp_path = Path(tmp_name)
+        self._file = os.fdopen(fd, "wb")
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes | bytearray | memoryview) -> None:
+        self._file.write(data)
+        self._sha256.update(data)
+        self.size += len(data)
+
+    def commit(self) -> tuple[int, str]:
+        """Move the object into place. Returns its (size, sha256 hex)."""
+        self._file.close()
+        # mkstemp creates 0600; stored objects are world-readable like write_bytes made them
+        os.chmod(self._tmp_path, 0o644)
+        os.replace(self._tmp_path, self.file_path)
+        checksum = self._sha256.hexdigest()
+        # mtime pins the sidecar to this write; a later write without one won't match
+        metadata = {
+            "size": self.size,
+            "sha256": checksum,
+            "mtime_ns": self.file_path.stat().st_mtime_ns,
+        }
+        _write_atomic(self.metadata_path, json.dumps(metadata).encode("utf-8"))
+        return self.size, checksum
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
 
 
 class StorageService:
@@ -32,7 +148,8 @@ class StorageService:
             raise ValueError("Storage path contains invalid characters")
 
         parts = normalized.split("/")
-        if any(part in {"", ".", ".."} for part in parts):
+        # Dot-segments also cover sidecar metadata and in-flight temp files
+        if any(part == "" or part.startswith(".") for part in parts):
             raise ValueError("Storage path contains invalid path segments")
         return normalized
 
@@ -59,8 +176,17 @@ class StorageService:
     ) -> str:
         return f"assets/{asset_id}/{image_type.lower()}_{sort_order}.png"
 
-    def _sign_upload(self, storage_key: str, exp: int) -> str:
+    def _sign_upload(
+        self,
+        storage_key: str,
+        exp: int,
+        upload_id: str | None = None,
+        part_number: int | None = None,
+    ) -> str:
         canonical = f"PUT\n{storage_key}\n{exp}"
+        if upload_id is not None:
+            # A part URL is only good for that part of that upload
+            canonical += f"\n{upload_id}\n{part_number}"
         secret = settings.storage_upload_signing_secret.encode("utf-8")
         digest = hmac.new(
             key=secret,
@@ -69,16 +195,28 @@ class StorageService:
         )
         return digest.hexdigest()
 
-    def generate_presigned_url(self, storage_key: str) -> tuple[str, datetime]:
+    def generate_presigned_url(
+        self, storage_key: str, upload_id: str | None = None, part_number: int | None = None
+    ) -> tuple[str, datetime]:
+        """Signed PUT URL for the object, or with ``upload_id`` for one part of it."""
         normalized = self.validate_storage_key(storage_key)
         expires_at = datetime.now(UTC) + timedelta(seconds=settings.storage_upload_ttl_seconds)
         exp = int(expires_at.timestamp())
-        sig = self._sign_upload(normalized, exp)
-        query = urlencode({"exp": str(exp), "sig": sig})
-        url = f"{settings.server_base_url}/storage/{normalized}?{query}"
+        sig = self._sign_upload(normalized, exp, upload_id, part_number)
+        params = {"exp": str(exp), "sig": sig}
+        if upload_id is not None:
+            params.update({"uploadId": upload_id, "partNumber": str(part_number)})
+        url = f"{settings.server_base_url}/storage/{normalized}?{urlencode(params)}"
         return url, expires_at
 
-    def verify_upload_signature(self, storage_key: str, exp: str | None, sig: str | None) -> bool:
+    def verify_upload_signature(
+        self,
+        storage_key: str,
+        exp: str | None,
+        sig: str | None,
+        upload_id: str | None = None,
+        part_number: int | None = None,
+    ) -> bool:
         if not exp or not sig:
             return False
         try:
@@ -91,41 +229,223 @@ class StorageService:
             return False
 
         normalized = self.validate_storage_key(storage_key)
-        expected_sig = self._sign_upload(normalized, exp_int)
+        expected_sig = self._sign_upload(normalized, exp_int, upload_id, part_number)
         return hmac.compare_digest(expected_sig, sig)
 
     def get_download_url(self, storage_key: str) -> str:
         normalized = self.validate_storage_key(storage_key)
         return f"{settings.server_base_url}/storage/{normalized}"
 
+    def _metadata_path(self, storage_key: str) -> Path:
+        return self.base_path / METADATA_DIR / f"{self.validate_storage_key(storage_key)}.json"
+
+    def get_recorded_checksum(self, storage_key: str) -> str | None:
+        """SHA256 recorded when the object was written; never hashes the file."""
+        return self._recorded_checksum(storage_key, self.resolve_safe_path(storage_key))
+
+    def _recorded_checksum(self, storage_key: str, file_path: Path) -> str | None:
+        """SHA256 recorded when the object was written, if it still describes the file."""
+        try:
+            metadata = json.loads(self._metadata_path(storage_key).read_bytes())
+            stat = file_path.stat()
+            if metadata["size"] != stat.st_size or metadata["mtime_ns"] != stat.st_mtime_ns:
+                return None
+            return str(metadata["sha256"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
     def verify_object(
-        self, storage_key: str, expected_size: int, expected_checksum: str
+        self,
+        storage_key: str,
+        expected_size: int,
+        expected_checksum: str,
+        audit: bool = False,
     ) -> bool:
-        """Verify a stored object's size and SHA256 checksum."""
-        file_path = self.resolve_safe_path(storage_key)
-        if not file_path.exists():
-            return False
+        """Verify a stored object's size and SHA256 checksum.
 
-        actual_size = file_path.stat().st_size
-        if actual_size != expected_size:
-            return False
+        Uses the checksum recorded at write time; ``audit`` re-hashes the file.
+        """
+        return self._verify(storage_key, expected_size, expected_checksum, audit).verified
 
-        sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                sha256.update(chunk)
-        actual_checksum = sha256.hexdigest()
+    def verify_objects(
+        self, expected: list[tuple[str, int, str]], audit: bool = False
+    ) -> list[ObjectVerification]:
+        """Verify (storage_key, size, sha256) triples concurrently, in input order.
+
+        Objects are checked on a bounded thread pool, so a batch takes about as
+        long as its largest file rather than the sum of all of them.
+        """
+        if len(expected) <= 1:
+            return [self._verify(*item, audit) for item in expected]
+        futures = [
+            _get_verify_pool().submit(self._verify, key, size, checksum, audit)
+            for key, size, checksum in expected
+        ]
+        return [future.result() for future in futures]
 
-        return actual_checksum == expected_checksum
+    def _verify(
+        self, storage_key: str, expected_size: int, expected_checksum: str, audit: bool
+    ) -> ObjectVerification:
+        started = time.perf_counter()
+        file_path = self.resolve_safe_path(storage_key)
+        try:
+            actual_size = file_path.stat().st_size
+        except FileNotFoundError:
+            return ObjectVerification(storage_key, False, 0, 0.0, False)
+        if actual_size != expected_size:
+            return ObjectVerification(storage_key, False, actual_size, 0.0, False)
+
+        checksum = None if audit else self._recorded_checksum(storage_key, file_path)
+        rehashed = checksum is None
+        if checksum is None:
+            checksum = _hash_file(file_path)
+        result = ObjectVerification(
+            storage_key,
+            checksum == expected_checksum,
+            actual_size,
+            time.perf_counter() - started,
+            rehashed,
+        )
+        if rehashed:
+            logger.info(
+                "Hashed %s: %d bytes in %.3fs (%.1f MB/s)",
+                storage_key,
+                result.size_bytes,
+                result.seconds,
+                result.throughput_bytes_per_second / 1_000_000,
+            )
+        return result
 
     def object_exists(self, storage_key: str) -> bool:
         return self.resolve_safe_path(storage_key).exists()
 
+    def open_writer(self, storage_key: str) -> ObjectWriter:
+        """Start writing ``storage_key`` incrementally; see :class:`ObjectWriter`."""
+        return ObjectWriter(self.resolve_safe_path(storage_key), self._metadata_path(storage_key))
+
     def save_file(self, storage_key: str, data: bytes) -> None:
         """Save file locally (for dev upload simulation)."""
-        file_path = self.resolve_safe_path(storage_key)
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        file_path.write_bytes(data)
+        writer = self.open_writer(storage_key)
+        try:
+            writer.write(data)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+
+    def _multipart_dir(self, upload_id: str) -> Path:
+        if not _UPLOAD_ID_PATTERN.fullmatch(upload_id):
+            raise ValueError("Invalid upload id")
+        return self.base_path / MULTIPART_DIR / upload_id
+
+    def _multipart_manifest(self, storage_key: str, upload_id: str) -> dict[str, Any]:
+        try:
+            manifest: dict[str, Any] = json.loads(
+                (self._multipart_dir(upload_id) / "manifest.json").read_bytes()
+            )
+        except (OSError, json.JSONDecodeError) as exc:
+            raise ValueError("Unknown multipart upload") from exc
+        if manifest["storage_key"] != self.validate_storage_key(storage_key):
+            raise ValueError("Multipart upload belongs to another object")
+        return manifest
+
+    def create_multipart_upload(
+        self, storage_key: str, size_bytes: int, part_size: int
+    ) -> tuple[str, int]:
+        """Start a resumable upload of ``size_bytes`` in ``part_size`` parts.
+
+        Parts may arrive in any order and in parallel. Returns (upload_id, part_count).
+        """
+        normalized = self.validate_storage_key(storage_key)
+        part_count = max(1, -(-size_bytes // part_size))
+        upload_id = uuid.uuid4().hex
+        manifest = {
+            "storage_key": normalized,
+            "size_bytes": size_bytes,
+            "part_size": part_size,
+            "part_count": part_count,
+        }
+        _write_atomic(
+            self._multipart_dir(upload_id) / "manifest.json", json.dumps(manifest).encode("utf-8")
+        )
+        return upload_id, part_count
+
+    def open_part_writer(self, storage_key: str, upload_id: str, part_number: int) -> ObjectWriter:
+        """Write one part; re-sending a part replaces it."""
+        manifest = self._multipart_manifest(storage_key, upload_id)
+        if not 1 <= part_number <= manifest["part_count"]:
+            raise ValueError("Part number out of range")
+        part_path = self._multipart_dir(upload_id) / f"{part_number:05d}.part"
+        return ObjectWriter(part_path, part_path.with_suffix(".json"))
+
+    def list_parts(self, storage_key: str, upload_id: str) -> tuple[int, dict[int, int]]:
+        """(part_count, {part_number: size}) of the parts received so far.
+
+        Every part is ``part_size`` bytes but the last, which holds the rest. A
+        part of any other size counts as missing, so the client sends it again.
+        """
+        manifest = self._multipart_manifest(storage_key, upload_id)
+        part_count: int = manifest["part_count"]
+        part_size: int = manifest["part_size"]
+        last_size = manifest["size_bytes"] - part_size * (part_count - 1)
+        received: dict[int, int] = {}
+        for part in self._multipart_dir(upload_id).glob("*.part"):
+            part_number, size = int(part.stem), part.stat().st_size
+            if size == (last_size if part_number == part_count else part_size):
+                received[part_number] = size
+        return part_count, received
+
+    def complete_multipart_upload(self, storage_key: str, upload_id: str) -> tuple[int, str]:
+        """Concatenate the parts into the object, hashing as it streams.
+
+        The parts stay until :meth:`abort_multipart_upload`, so a completion
+        that fails afterwards can be retried. Raises ValueError if parts are
+        missing. Returns the object's (size, sha256 hex).
+        """
+        part_count, received = self.list_parts(storage_key, upload_id)
+        missing = [n for n in range(1, part_count + 1) if n not in received]
+        if missing:
+            raise ValueError(f"Missing parts: {missing}")
+
+        parts_dir = self._multipart_dir(upload_id)
+        buffer = bytearray(_HASH_BUFFER_BYTES)
+        view = memoryview(buffer)
+        writer = self.open_writer(storage_key)
+        try:
+            for part_number in range(1, part_count + 1):
+                with open(parts_dir / f"{part_number:05d}.part", "rb", buffering=0) as f:
+                    while size := f.readinto(buffer):
+                        writer.write(view[:size])
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def abort_multipart_upload(self, storage_key: str, upload_id: str) -> None:
+        """Delete the upload's parts. Raises ValueError if there is no such upload."""
+        self._multipart_manifest(storage_key, upload_id)
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+
+    def cleanup_stale_multipart_uploads(self, max_age_seconds: float) -> int:
+        """Delete uploads with no part written for ``max_age_seconds``. Returns how many."""
+        root = self.base_path / MULTIPART_DIR
+        if not root.is_dir():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for upload_dir in root.iterdir():
+            try:
+                last_write = max(
+                    (entry.stat().st_mtime for entry in upload_dir.iterdir()),
+                    default=upload_dir.stat().st_mtime,
+                )
+            except OSError:
+                # Completed or aborted while we looked
+                continue
+            if last_write < cutoff:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                removed += 1
+        return removed
 
     def get_object_size(self, storage_key: str) -> int | None:
         file_path = self.resolve_safe_path(storage_key)
@@ -133,12 +453,28 @@ class StorageService:
             return None
         return file_path.stat().st_size
 
-    def get_object_checksum(self, storage_key: str) -> str | None:
+    def get_image_dimensions(self, storage_key: str) -> tuple[int, int] | None:
+        """Read (width, height) from a stored PNG's IHDR header without decoding it."""
         file_path = self.resolve_safe_path(storage_key)
         if not file_path.exists():
             return None
-        sha256 = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                sha256.update(chunk)
-        return sha256.hexdigest()
+            header = f.read(24)
+        if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+            return None
+        width, height = struct.unpack(">II", header[16:24])
+        return width, height
+
+    def get_object_checksum(self, storage_key: str, audit: bool = False) -> str | None:
+        """SHA256 of a stored object: as recorded at write time, or re-hashed.
+
+        Objects without a current sidecar (written some other way) are hashed.
+        """
+        file_path = self.resolve_safe_path(storage_key)
+        if not file_path.exists():
+            return None
+        if not audit:
+            recorded = self._recorded_checksum(storage_key, file_path)
+            if recorded is not None:
+                return recorded
+        return _hash_file(file_path)
@@ -1,9 +1,12 @@
+import logging
 import uuid
 
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models.enums import AssetStatus, FileRole, ImageType
+from app.models.model_asset import ModelAsset
 from app.repositories.asset_image_repo import AssetImageRepo
 from app.repositories.model_asset_repo import ModelAssetRepo
 from app.schemas.upload import (
@@ -14,12 +17,16 @@ from app.schemas.upload import (
     ImageInitMeta,
     ImageVerifyResult,
     PresignedImageTarget,
+    PresignedPartTarget,
     PresignedUploadTarget,
     UploadCompleteResponse,
     UploadInitResponse,
+    UploadPartsResponse,
 )
 from app.services.storage_service import StorageService
 
+logger = logging.getLogger(__name__)
+
 VALID_STATUS_FOR_INIT = {AssetStatus.INITIATED}
 VALID_STATUS_FOR_COMPLETE = {AssetStatus.UPLOADING}
 
@@ -61,6 +68,9 @@ class UploadService:
         presigned_uploads: list[PresignedUploadTarget] = []
         for file_meta in files:
             storage_key = self.storage.generate_storage_key(asset.id, file_meta.role)
+            if file_meta.multipart:
+                presigned_uploads.append(self._init_multipart(storage_key, file_meta))
+                continue
             url, expires_at = self.storage.generate_presigned_url(storage_key)
             presigned_uploads.append(
                 PresignedUploadTarget(role=file_meta.role, url=url, expires_at=expires_at)
@@ -91,6 +101,80 @@ class UploadService:
             presigned_image_uploads=presigned_image_uploads,
         )
 
+    def _sign_parts(
+        self, storage_key: str, upload_id: str, part_numbers: list[int]
+    ) -> list[PresignedPartTarget]:
+        targets: list[PresignedPartTarget] = []
+        for part_number in part_numbers:
+            url, expires_at = self.storage.generate_presigned_url(
+                storage_key, upload_id=upload_id, part_number=part_number
+            )
+            targets.append(
+                PresignedPartTarget(part_number=part_number, url=url, expires_at=expires_at)
+            )
+        return targets
+
+    def _init_multipart(self, storage_key: str, file_meta: FileInitMeta) -> PresignedUploadTarget:
+        part_size = settings.storage_multipart_part_size
+        upload_id, part_count = self.storage.create_multipart_upload(
+            storage_key, file_meta.size_bytes, part_size
+        )
+        parts = self._sign_parts(storage_key, upload_id, list(range(1, part_count + 1)))
+        return PresignedUploadTarget(
+            role=file_meta.role,
+            expires_at=parts[0].expires_at,
+            upload_id=upload_id,
+            part_size=part_size,
+            parts=parts,
+        )
+
+    def _get_owned_asset(self, owner_id: uuid.UUID, asset_id: uuid.UUID) -> ModelAsset:
+        asset = self.repo.get_by_id(asset_id)
+        if not asset:
+            raise HTTPException(status_code=404, detail="Asset not found")
+
+        if asset.owner_id != owner_id:
+            raise HTTPException(status_code=403, detail="Not the owner of this asset")
+
+        return asset
+
+    def list_upload_parts(
+        self, owner_id: uuid.UUID, asset_id: uuid.UUID, role: str, upload_id: str
+    ) -> UploadPartsResponse:
+        """Parts received so far, with fresh URLs for the missing ones to resume with."""
+        asset = self._get_owned_asset(owner_id, asset_id)
+        if AssetStatus(asset.status) not in VALID_STATUS_FOR_COMPLETE:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Asset status {asset.status} is not uploading",
+            )
+
+        storage_key = self.storage.generate_storage_key(asset_id, role)
+        try:
+            part_count, received = self.storage.list_parts(storage_key, upload_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Multipart upload not found")
+
+        missing = [n for n in range(1, part_count + 1) if n not in received]
+        return UploadPartsResponse(
+            role=role,
+            upload_id=upload_id,
+            part_count=part_count,
+            received_parts=sorted(received),
+            missing_parts=self._sign_parts(storage_key, upload_id, missing),
+        )
+
+    def abort_upload_parts(
+        self, owner_id: uuid.UUID, asset_id: uuid.UUID, role: str, upload_id: str
+    ) -> None:
+        """Discard a multipart upload's parts; the client can init a new one."""
+        self._get_owned_asset(owner_id, asset_id)
+        storage_key = self.storage.generate_storage_key(asset_id, role)
+        try:
+            self.storage.abort_multipart_upload(storage_key, upload_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Multipart upload not found")
+
     def complete_upload(
         self,
         owner_id: uuid.UUID,
@@ -100,12 +184,7 @@ class UploadService:
     ) -> UploadCompleteResponse:
         images = images or []
 
-        asset = self.repo.get_by_id(asset_id)
-        if not asset:
-            raise HTTPException(status_code=404, detail="Asset not found")
-
-        if asset.owner_id != owner_id:
-            raise HTTPException(status_code=403, detail="Not the owner of this asset")
+        asset = self._get_owned_asset(owner_id, asset_id)
 
         if AssetStatus(asset.status) not in VALID_STATUS_FOR_COMPLETE:
             raise HTTPException(
@@ -113,21 +192,54 @@ class UploadService:
                 detail=f"Asset status {asset.status} cannot be completed",
             )
 
-        # Verify each file
-        results: list[FileVerifyResult] = []
-        for file_meta in files:
-            storage_key = self.storage.generate_storage_key(asset_id, file_meta.role)
+        file_keys = [self.storage.generate_storage_key(asset_id, f.role) for f in files]
+        image_keys = [
+            self.storage.generate_image_storage_key(asset_id, img.image_type, img.sort_order)
+            for img in images
+        ]
+
+        # Multipart files become objects here, then verify like any other
+        for file_meta, storage_key in zip(files, file_keys, strict=True):
+            if file_meta.upload_id is None:
+                continue
+            try:
+                self.storage.complete_multipart_upload(storage_key, file_meta.upload_id)
+            except ValueError as exc:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Multipart upload for role {file_meta.role}: {exc}",
+                )
 
-            # Verify the file in storage
+        for file_meta, storage_key in zip(files, file_keys, strict=True):
             if not self.storage.object_exists(storage_key):
                 raise HTTPException(
                     status_code=409,
                     detail=f"Object not found for role {file_meta.role}",
                 )
+        for img_meta, storage_key in zip(images, image_keys, strict=True):
+            if not self.storage.object_exists(storage_key):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Image not found for {img_meta.image_type}_{img_meta.sort_order}",
+                )
 
-            if not self.storage.verify_object(
-                storage_key, file_meta.size_bytes, file_meta.checksum_sha256
-            ):
+        # Files and images are verified together, concurrently
+        checks = self.storage.verify_objects(
+            [
+                (key, f.size_bytes, f.checksum_sha256)
+                for key, f in zip(file_keys, files, strict=True)
+            ]
+            + [
+                (key, img.size_bytes, img.checksum_sha256)
+                for key, img in zip(image_keys, images, strict=True)
+            ],
+            audit=settings.storage_verify_audit,
+        )
+        file_checks, image_checks = checks[: len(files)], checks[len(files) :]
+
+        results: list[FileVerifyResult] = []
+        for file_meta, check in zip(files, file_checks, strict=True):
+            if not check.verified:
                 raise HTTPException(
                     status_code=409,
                     detail=f"Checksum/size mismatch for role {file_meta.role}",
@@ -137,28 +249,15 @@ class UploadService:
             self.repo.add_file(
                 asset_id=asset_id,
                 file_role=FileRole(file_meta.role),
-                storage_key=storage_key,
+                storage_key=check.storage_key,
                 size_bytes=file_meta.size_bytes,
                 checksum_sha256=file_meta.checksum_sha256,
             )
             results.append(FileVerifyResult(role=file_meta.role, verified=True))
 
-        # Verify each image
         image_results: list[ImageVerifyResult] = []
-        for img_meta in images:
-            storage_key = self.storage.generate_image_storage_key(
-                asset_id, img_meta.image_type, img_meta.sort_order
-            )
-
-            if not self.storage.object_exists(storage_key):
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"Image not found for {img_meta.image_type}_{img_meta.sort_order}",
-                )
-
-            if not self.storage.verify_object(
-                storage_key, img_meta.size_bytes, img_meta.checksum_sha256
-            ):
+        for img_meta, check in zip(images, image_checks, strict=True):
+            if not check.verified:
                 raise HTTPException(
                     status_code=409,
                     detail=f"Image checksum/size mismatch for "
@@ -169,7 +268,7 @@ class UploadService:
             self.image_repo.add_image(
                 asset_id=asset_id,
                 image_type=ImageType(img_meta.image_type),
-                storage_key=storage_key,
+                storage_key=check.storage_key,
                 size_bytes=img_meta.size_bytes,
                 checksum_sha256=img_meta.checksum_sha256,
                 sort_order=img_meta.sort_order,
@@ -186,6 +285,20 @@ class UploadService:
         self.repo.update_status(asset, AssetStatus.READY)
         self.db.commit()
 
+        # Parts are kept until now so a failed completion can be retried. The asset
+        # is READY either way; parts the sweeper or a concurrent retry already
+        # removed, or that fail to delete, are left to the stale-upload sweep
+        for file_meta, storage_key in zip(files, file_keys, strict=True):
+            if file_meta.upload_id is not None:
+                try:
+                    self.storage.abort_multipart_upload(storage_key, file_meta.upload_id)
+                except (ValueError, OSError):
+                    logger.warning(
+                        "Could not remove parts of multipart upload %s",
+                        file_meta.upload_id,
+                        exc_info=True,
+                    )
+
         return UploadCompleteResponse(
             asset_id=asset_id,
             status=AssetStatus.READY.value,
@@ -0,0 +1,171 @@
+"""Write-behind aggregation of product detail views.
+
+Product detail reads only record a view in a buffer (in-process or Redis);
+``flush`` periodically folds the buffered counts into ``products.views_count``
+with one batched UPDATE, so readers never contend on a product row lock.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Protocol
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repositories.product_repo import ProductRepo
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "product_views:pending"
+_SEEN_KEY_PREFIX = "product_views:seen"
+
+# Read and delete in one step: every worker flushes, and two flushes must
+# never both take the same counts
+_DRAIN_SCRIPT = """
+local pending = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return pending
+"""
+
+
+class _ViewBackend(Protocol):
+    def add(self, product_id: uuid.UUID, viewer_key: str | None, dedupe_seconds: int) -> bool: ...
+
+    def drain(self) -> dict[uuid.UUID, int]: ...
+
+    def restore(self, counts: dict[uuid.UUID, int]) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class _MemoryBackend:
+    """Per-process buffer. Each worker flushes its own increments."""
+
+    def __init__(self, max_seen: int) -> None:
+        self.max_seen = max_seen
+        self._pending: dict[uuid.UUID, int] = {}
+        self._seen: OrderedDict[tuple[uuid.UUID, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, product_id: uuid.UUID, viewer_key: str | None, dedupe_seconds: int) -> bool:
+        with self._lock:
+            if viewer_key is not None and dedupe_seconds > 0:
+                now = time.monotonic()
+                seen_key = (product_id, viewer_key)
+                expires_at = self._seen.get(seen_key)
+                if expires_at is not None and expires_at > now:
+                    return False
+                self._seen[seen_key] = now + dedupe_seconds
+                self._seen.move_to_end(seen_key)
+                while len(self._seen) > self.max_seen:
+                    self._seen.popitem(last=False)
+            self._pending[product_id] = self._pending.get(product_id, 0) + 1
+            return True
+
+    def drain(self) -> dict[uuid.UUID, int]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def restore(self, counts: dict[uuid.UUID, int]) -> None:
+        with self._lock:
+            for product_id, count in counts.items():
+                self._pending[product_id] = self._pending.get(product_id, 0) + count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._seen.clear()
+
+
+class _RedisBackend:
+    """Buffer shared by all workers on the configured redis_url."""
+
+    def __init__(self, url: str) -> None:
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=0.5, socket_connect_timeout=0.5, decode_responses=True
+        )
+        self.client.ping()
+        self._drain = self.client.register_script(_DRAIN_SCRIPT)
+
+    def add(self, product_id: uuid.UUID, viewer_key: str | None, dedupe_seconds: int) -> bool:
+        if viewer_key is not None and dedupe_seconds > 0:
+            seen_key = f"{_SEEN_KEY_PREFIX}:{product_id}:{viewer_key}"
+            if not self.client.set(seen_key, 1, nx=True, ex=dedupe_seconds):
+                return False
+        self.client.hincrby(_PENDING_KEY, str(product_id), 1)
+        return True
+
+    def drain(self) -> dict[uuid.UUID, int]:
+        # Increments landing after the script go to a fresh hash. A failed
+        # flush puts its counts back via restore(); a worker killed between
+        # drain and commit loses that batch rather than risking a double count
+        flat: list[str] = self._drain(keys=[_PENDING_KEY])
+        return {
+            uuid.UUID(key): int(value) for key, value in zip(flat[::2], flat[1::2], strict=True)
+        }
+
+    def restore(self, counts: dict[uuid.UUID, int]) -> None:
+        pipe = self.client.pipeline()
+        for product_id, count in counts.items():
+            pipe.hincrby(_PENDING_KEY, str(product_id), count)
+        pipe.execute()
+
+    def clear(self) -> None:
+        self.client.delete(_PENDING_KEY)
+
+
+def _create_backend() -> _ViewBackend:
+    if settings.view_count_backend == "redis":
+        try:
+            return _RedisBackend(settings.redis_url)
+        except Exception:
+            logger.warning("Redis unavailable for view counts; buffering in-process", exc_info=True)
+    return _MemoryBackend(settings.view_count_dedupe_max_entries)
+
+
+class ViewCounter:
+    def __init__(self, backend: _ViewBackend) -> None:
+        self.backend = backend
+        self.dedupe_seconds = settings.view_count_dedupe_window_seconds
+
+    def record(self, product_id: uuid.UUID, viewer_key: str | None = None) -> bool:
+        """Buffer one view. Returns False if ``viewer_key`` already counted within the window."""
+        try:
+            return self.backend.add(product_id, viewer_key, self.dedupe_seconds)
+        except Exception:
+            logger.warning("Failed to record product view", exc_info=True)
+            return False
+
+    def flush(self, db: Session) -> int:
+        """Apply buffered views in one UPDATE and commit. Returns the number of views applied."""
+        counts = self.backend.drain()
+        if not counts:
+            return 0
+        try:
+            ProductRepo(db).add_views(counts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.backend.restore(counts)
+            raise
+        return sum(counts.values())
+
+    def flush_with_new_session(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+view_counter = ViewCounter(_create_backend())
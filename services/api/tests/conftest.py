@@ -13,6 +13,8 @@ from alembic import command
 
 # Enable dev auth for tests (must be set before importing settings)
 os.environ.setdefault("DEV_AUTH_ENABLED", "true")
+# Tests flush buffered product views explicitly
+os.environ.setdefault("VIEW_COUNT_FLUSH_INTERVAL_SECONDS", "3600")
 TEST_DB_URL = os.getenv("TEST_DATABASE_URL")
 if not TEST_DB_URL:
     raise RuntimeError("TEST_DATABASE_URL is required for test execution")
@@ -57,10 +59,15 @@ def db() -> Generator[Session, None, None]:
 def client(db: Session) -> Generator[TestClient, None, None]:
     from app.database import get_db
     from app.main import app
+    from app.services.product_feed_cache import product_feed_cache
+    from app.services.view_counter import view_counter
 
     def override_get_db() -> Generator[Session, None, None]:
         yield db
 
+    # Cached pages would outlive the per-test TRUNCATE
+    product_feed_cache.clear()
+    view_counter.clear()
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as test_client:
         yield test_client
@@ -46,6 +46,16 @@ def test_ar_asset_ready(client, auth_headers):
     assert len(data["files"]) == 1
     assert data["files"][0]["type"] == "model"
 
+    # Unchanged asset revalidates with 304
+    etag = resp.headers["ETag"]
+    resp = client.get(
+        f"/v1/products/{product_id}/ar-asset",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    assert resp.content == b""
+
 
 def test_ar_asset_none_no_asset(client, auth_headers):
     # Product with no asset
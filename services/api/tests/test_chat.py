@@ -1,6 +1,11 @@
 import hashlib
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
 
+from app.models.chat import ChatMessage, ChatRoom
+from app.services.connection_manager import manager
 from app.services.storage_service import StorageService
 
 
@@ -86,3 +91,120 @@ def test_send_and_get_messages(client, auth_headers):
     resp = client.get(f"/v1/chat-rooms/{room_id}/messages", headers=auth_headers)
     assert resp.status_code == 200
     assert len(resp.json()["messages"]) == 1
+
+
+def test_message_keyset_pagination_and_sync(client, db, auth_headers):
+    product_id = _create_product(client, auth_headers)
+    resp = client.post(
+        f"/v1/products/{product_id}/chat-rooms",
+        headers=auth_headers,
+        json={"subject": "Keyset test"},
+    )
+    room = resp.json()
+
+    # Same timestamp everywhere: only the id tie-break keeps pages exact
+    same_time = datetime(2026, 1, 1, tzinfo=UTC)
+    ids = sorted((uuid.uuid4() for _ in range(5)), reverse=True)
+    for i, msg_id in enumerate(ids):
+        db.add(ChatMessage(
+            id=msg_id,
+            room_id=uuid.UUID(room["id"]),
+            sender_id=uuid.UUID(room["seller_id"]),
+            seq=i + 1,
+            body=f"m{i}",
+            created_at=same_time,
+        ))
+    db.get(ChatRoom, uuid.UUID(room["id"])).last_seq = len(ids)
+    db.commit()
+
+    url = f"/v1/chat-rooms/{room['id']}/messages"
+    seen = []
+    cursor = None
+    sync_cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get(url, headers=auth_headers, params=params).json()
+        sync_cursor = sync_cursor or page["sync_cursor"]
+        seen += [m["id"] for m in page["messages"]]
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        cursor = page["next_cursor"]
+    assert seen == [str(i) for i in ids]
+
+    # Forward sync returns only what arrived after the newest message seen
+    client.post(url, headers=auth_headers, json={"body": "new"})
+    page = client.get(url, headers=auth_headers, params={"after": sync_cursor}).json()
+    assert [m["body"] for m in page["messages"]] == ["new"]
+    page = client.get(url, headers=auth_headers, params={"after": page["sync_cursor"]}).json()
+    assert page["messages"] == []
+
+    resp = client.get(url, headers=auth_headers, params={"after": sync_cursor, "cursor": cursor})
+    assert resp.status_code == 400
+
+
+def test_message_seq_and_after_seq(client, auth_headers):
+    product_id = _create_product(client, auth_headers)
+    room = client.post(
+        f"/v1/products/{product_id}/chat-rooms",
+        headers=auth_headers,
+        json={"subject": "Seq test"},
+    ).json()
+    url = f"/v1/chat-rooms/{room['id']}/messages"
+
+    seqs = [
+        client.post(url, headers=auth_headers, json={"body": f"m{i}"}).json()["seq"]
+        for i in range(4)
+    ]
+    assert seqs == [1, 2, 3, 4]
+
+    # Catch-up from the last seq the client holds, oldest first
+    page = client.get(url, headers=auth_headers, params={"after_seq": 2, "limit": 1}).json()
+    assert [m["seq"] for m in page["messages"]] == [3]
+    assert page["has_more"] is True
+    page = client.get(url, headers=auth_headers, params={"after_seq": 3}).json()
+    assert [m["seq"] for m in page["messages"]] == [4]
+    assert page["has_more"] is False
+
+    rooms = client.get("/v1/chat-rooms", headers=auth_headers).json()["rooms"]
+    assert rooms[0]["last_seq"] == 4
+
+    params = {"after_seq": 1, "after": page["sync_cursor"]}
+    resp = client.get(url, headers=auth_headers, params=params)
+    assert resp.status_code == 400
+
+
+def test_long_poll_returns_waits_and_wakes(client, auth_headers):
+    product_id = _create_product(client, auth_headers)
+    room = client.post(
+        f"/v1/products/{product_id}/chat-rooms",
+        headers=auth_headers,
+        json={"subject": "Long poll"},
+    ).json()
+    url = f"/v1/chat-rooms/{room['id']}/messages"
+    client.post(url, headers=auth_headers, json={"body": "first"})
+
+    # Something newer already there: answered immediately
+    page = client.get(f"{url}/poll", headers=auth_headers, params={"after_seq": 0}).json()
+    assert [m["body"] for m in page["messages"]] == ["first"]
+
+    # Nothing newer: empty page once the timeout expires
+    page = client.get(
+        f"{url}/poll", headers=auth_headers, params={"after_seq": 1, "timeout": 0.1}
+    ).json()
+    assert page["messages"] == []
+
+    # A send wakes the parked request
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        started = time.monotonic()
+        parked = pool.submit(
+            client.get, f"{url}/poll", headers=auth_headers, params={"after_seq": 1, "timeout": 10}
+        )
+        while uuid.UUID(room["id"]) not in manager.room_waiters:
+            assert time.monotonic() - started < 5
+            time.sleep(0.01)
+        client.post(url, headers=auth_headers, json={"body": "second"})
+        page = parked.result(timeout=5).json()
+    assert [m["body"] for m in page["messages"]] == ["second"]
+    assert time.monotonic() - started < 5
+    assert uuid.UUID(room["id"]) not in manager.room_waiters
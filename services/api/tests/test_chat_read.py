@@ -3,10 +3,13 @@ import json
 import uuid
 
 import pytest
+from sqlalchemy import event, select, text
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
 
+from app.database import async_engine
 from app.models.user import User
+from app.services.chat_service import reconcile_unread_counts
 from app.services.storage_service import StorageService
 
 
@@ -201,3 +204,122 @@ def test_chat_count_on_product(client: TestClient, chat_setup: dict) -> None:
     assert resp.status_code == 200
     data = resp.json()
     assert data["chat_count"] == 1  # one room was created in chat_setup
+
+
+def test_list_rooms_paginated_in_one_query(
+    client: TestClient, chat_setup: dict, auth_headers: dict[str, str]
+) -> None:
+    """Seller's inbox pages by latest activity, each page in a single statement."""
+    buyer_headers = chat_setup["buyer_headers"]
+    seller_headers = chat_setup["seller_headers"]
+    room_ids = [chat_setup["room_id"]]
+    for _ in range(2):
+        product_id = _publish_product(client, auth_headers)
+        resp = client.post(
+            f"/v1/products/{product_id}/chat-rooms",
+            headers=buyer_headers,
+            json={"subject": "Another chat"},
+        )
+        room_ids.append(resp.json()["id"])
+    # Activity moves the first room to the top
+    client.post(
+        f"/v1/chat-rooms/{room_ids[0]}/messages",
+        headers=buyer_headers,
+        json={"body": "Bump"},
+    )
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        first = client.get("/v1/chat-rooms?limit=2", headers=seller_headers).json()
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+    # Auth lookup plus the room page
+    assert len(statements) == 2
+
+    assert [r["id"] for r in first["rooms"]] == [room_ids[0], room_ids[2]]
+    assert first["rooms"][0]["unread_count"] == 1
+    assert first["has_more"] is True
+
+    second = client.get(
+        f"/v1/chat-rooms?limit=2&cursor={first['next_cursor']}", headers=seller_headers
+    ).json()
+    assert [r["id"] for r in second["rooms"]] == [room_ids[1]]
+    assert second["has_more"] is False
+    assert second["next_cursor"] is None
+
+    resp = client.get("/v1/chat-rooms?cursor=bogus", headers=seller_headers)
+    assert resp.status_code == 400
+
+
+def _unread_badge(client: TestClient, db: Session, headers: dict[str, str]) -> int:
+    # Requests share the test session; drop users loaded before async-path writes
+    db.expire_all()
+    return client.get("/v1/me/summary", headers=headers).json()["unread_messages"]
+
+
+def test_summary_unread_counters(client: TestClient, db: Session, chat_setup: dict) -> None:
+    """Sends bump the recipient's badge; reading or replying clears the reader's."""
+    room_id = chat_setup["room_id"]
+    buyer_headers = chat_setup["buyer_headers"]
+    seller_headers = chat_setup["seller_headers"]
+
+    for body in ("One", "Two"):
+        client.post(
+            f"/v1/chat-rooms/{room_id}/messages", headers=buyer_headers, json={"body": body}
+        )
+    assert _unread_badge(client, db, seller_headers) == 2
+    assert _unread_badge(client, db, buyer_headers) == 0
+
+    # Replying over the socket marks the seller read and leaves one for the buyer
+    seller_token = chat_setup["seller_id"]
+    with client.websocket_connect(f"/v1/chats/{room_id}?token={seller_token}") as ws:
+        ws.send_text(json.dumps({"body": "Reply"}))
+        ws.receive_json()
+    assert _unread_badge(client, db, seller_headers) == 0
+    assert _unread_badge(client, db, buyer_headers) == 1
+
+    resp = client.post(f"/v1/chat-rooms/{room_id}/read", headers=buyer_headers)
+    assert resp.json()["unread_count"] == 0
+    assert _unread_badge(client, db, buyer_headers) == 0
+
+
+def test_reconcile_unread_counts(client: TestClient, db: Session, chat_setup: dict) -> None:
+    room_id = chat_setup["room_id"]
+    client.post(
+        f"/v1/chat-rooms/{room_id}/messages",
+        headers=chat_setup["buyer_headers"],
+        json={"body": "Hello"},
+    )
+    # Simulate drift
+    db.execute(text("UPDATE users SET unread_messages_count = 5"))
+    db.commit()
+
+    assert reconcile_unread_counts() == 2
+    assert reconcile_unread_counts() == 0
+
+    assert _unread_badge(client, db, chat_setup["seller_headers"]) == 1
+    assert _unread_badge(client, db, chat_setup["buyer_headers"]) == 0
+
+
+def test_reconcile_walks_users_in_batches_and_skips_busy_rows(
+    client: TestClient, db: Session, chat_setup: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "chat_unread_reconcile_batch_size", 1)
+    db.execute(text("UPDATE users SET unread_messages_count = 5"))
+    db.commit()
+
+    # A writer holding one user's row: that user waits for the next pass
+    seller_id = uuid.UUID(chat_setup["seller_id"])
+    db.execute(select(User.id).where(User.id == seller_id).with_for_update())
+    assert reconcile_unread_counts() == 1
+    db.commit()
+
+    assert reconcile_unread_counts() == 1
+    assert reconcile_unread_counts() == 0
@@ -1,3 +1,8 @@
+import os
+
+import pytest
+
+
 def test_healthz(client):
     resp = client.get("/healthz")
     assert resp.status_code == 200
@@ -8,3 +13,138 @@ def test_readyz(client):
     resp = client.get("/readyz")
     assert resp.status_code == 200
     assert resp.json() == {"status": "ok"}
+
+
+def test_async_database_url_uses_asyncpg():
+    from app.database import _async_database_url
+
+    url = _async_database_url("postgresql://u:p@db:5432/market?sslmode=require")
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.database == "market"
+    assert dict(url.query) == {"ssl": "require"}
+
+
+def test_metrics_reports_db_pools(client):
+    client.get("/v1/products")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    pools = resp.json()["db_pools"]
+    assert set(pools) == {"sync", "async"}
+    async_pool = pools["async"]
+    assert async_pool["checkouts"] >= 1
+    assert async_pool["wait_seconds"]["buckets"]["+Inf"] == async_pool["wait_seconds"]["count"]
+    assert async_pool["saturated"] is False
+
+
+def test_saturated_pool_reports_degraded(client):
+    from app.database import sync_pool_metrics
+
+    sync_pool_metrics.record_timeout()
+    try:
+        ready = client.get("/readyz")
+        metrics = client.get("/metrics")
+    finally:
+        sync_pool_metrics.last_timeout_at = None
+    # Busy is not unready, but the pressure is visible to callers
+    assert ready.status_code == 200
+    body = ready.json()
+    assert body["status"] == "degraded"
+    assert set(body["pool"]) == {"sync", "async"}
+    assert body["pool"]["sync"]["saturated"] is True
+    assert body["pool"]["sync"]["timeouts"] >= 1
+    assert metrics.json()["db_pools"]["sync"]["saturated"] is True
+
+
+def test_readyz_probes_database_directly_when_checkout_times_out(client, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    import app.main
+
+    def _exhausted() -> None:
+        raise PoolTimeoutError("pool exhausted")
+
+    monkeypatch.setattr(app.main, "SessionLocal", _exhausted)
+    resp = client.get("/readyz")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "degraded"
+
+    def _unreachable(engine, timeout_seconds):
+        raise OperationalError("SELECT 1", {}, Exception("server closed the connection"))
+
+    monkeypatch.setattr(app.main, "probe_direct", _unreachable)
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.json() == {"status": "unavailable"}
+
+
+def test_metrics_requires_token_when_configured(client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    resp = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert resp.status_code == 200
+
+    monkeypatch.setattr(settings, "metrics_token", "")
+    monkeypatch.setattr(settings, "app_env", "production")
+    assert client.get("/metrics").status_code == 404
+
+
+def test_instrumented_pool_counts_overflow_and_timeouts():
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    from app.db_pool import InstrumentedQueuePool, PoolMetrics, instrument_engine, is_saturated
+
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        os.environ["TEST_DATABASE_URL"],
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    instrument_engine(engine, metrics)
+    try:
+        first = engine.connect()
+        second = engine.connect()
+        assert metrics.overflow_events == 1
+        assert is_saturated(engine.pool)  # type: ignore[arg-type]
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        assert metrics.timeouts == 1
+        first.close()
+        second.close()
+        snapshot = metrics.snapshot(engine.pool)  # type: ignore[arg-type]
+        assert snapshot["checkouts"] == 2
+        assert snapshot["connection_age_seconds"]["open"] == 1
+    finally:
+        engine.dispose()
+
+
+def test_checkout_timeout_caps_pool_wait():
+    import time
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    from app.db_pool import InstrumentedQueuePool, checkout_timeout
+
+    engine = create_engine(
+        os.environ["TEST_DATABASE_URL"],
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=30,
+    )
+    try:
+        held = engine.connect()
+        start = time.monotonic()
+        with checkout_timeout(0.05), pytest.raises(PoolTimeoutError):
+            engine.connect()
+        assert time.monotonic() - start < 5
+        held.close()
+    finally:
+        engine.dispose()
@@ -1,7 +1,10 @@
 import hashlib
 import uuid
 
+from sqlalchemy import event
+
 from app.services.storage_service import StorageService
+from app.services.view_counter import view_counter
 
 
 def _publish_product(client, auth_headers, title="Test", price=1000):
@@ -92,5 +95,35 @@ def test_views_increment(client, auth_headers, db):
 
     resp = client.get(f"/v1/products/{product_id}")
     assert resp.status_code == 200
-    # 4 previous GETs + this one = 5
+    # Views are buffered, not written on the read path
+    assert resp.json()["views_count"] == 0
+
+    view_counter.flush(db)
+
+    resp = client.get(f"/v1/products/{product_id}")
+    # 4 previous GETs + the one above = 5
     assert resp.json()["views_count"] == 5
+
+
+def test_views_flushed_in_one_statement(client, auth_headers, db):
+    first = _publish_product(client, auth_headers)["id"]
+    second = _publish_product(client, auth_headers)["id"]
+    for _ in range(3):
+        client.get(f"/v1/products/{first}")
+    client.get(f"/v1/products/{second}")
+
+    statements: list[str] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    bind = db.get_bind()
+    event.listen(bind, "before_cursor_execute", _capture)
+    try:
+        assert view_counter.flush(db) == 4
+    finally:
+        event.remove(bind, "before_cursor_execute", _capture)
+
+    assert len([s for s in statements if s.lstrip().upper().startswith("UPDATE")]) == 1
+    assert client.get(f"/v1/products/{first}").json()["views_count"] == 3
+    assert client.get(f"/v1/products/{second}").json()["views_count"] == 1
@@ -1,6 +1,9 @@
 import hashlib
 import uuid
 
+from sqlalchemy import event
+
+from app.database import async_engine
 from app.services.storage_service import StorageService
 
 
@@ -104,3 +107,321 @@ def test_search_products(client, auth_headers):
     data = resp.json()
     assert data["total"] == 1
     assert data["products"][0]["title"] == "Blue Widget"
+
+
+def test_list_products_cursor_pagination(client, auth_headers):
+    for i in range(5):
+        _publish_product(client, auth_headers, f"Cursor {i}", 1000 + i)
+
+    resp = client.get("/v1/products?limit=2")
+    assert resp.status_code == 200
+    data = resp.json()
+    seen = [p["id"] for p in data["products"]]
+    cursor = data["next_cursor"]
+    assert cursor is not None
+
+    while cursor:
+        resp = client.get(f"/v1/products?limit=2&cursor={cursor}")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total"] == 5
+        seen.extend(p["id"] for p in data["products"])
+        cursor = data["next_cursor"]
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+    titles = [p["title"] for p in client.get("/v1/products?limit=5").json()["products"]]
+    assert titles == ["Cursor 4", "Cursor 3", "Cursor 2", "Cursor 1", "Cursor 0"]
+
+
+def test_list_products_cursor_stable_when_new_listing_published(client, auth_headers):
+    for i in range(3):
+        _publish_product(client, auth_headers, f"Stable {i}", 1000)
+
+    first = client.get("/v1/products?limit=2").json()
+    _publish_product(client, auth_headers, "Newer", 1000)
+
+    second = client.get(f"/v1/products?limit=2&cursor={first['next_cursor']}").json()
+    assert [p["title"] for p in second["products"]] == ["Stable 0"]
+    assert second["next_cursor"] is None
+
+
+def test_list_products_invalid_cursor(client):
+    resp = client.get("/v1/products?cursor=not-a-cursor")
+    assert resp.status_code == 400
+
+
+def test_search_products_korean_substring(client, auth_headers):
+    _publish_product(client, auth_headers, "원목 의자 팝니다", 1000)
+    _publish_product(client, auth_headers, "책상 세트", 2000)
+
+    resp = client.get("/v1/products", params={"q": "의자"})
+    assert resp.status_code == 200
+    assert [p["title"] for p in resp.json()["products"]] == ["원목 의자 팝니다"]
+
+    # Single-syllable queries match too
+    resp = client.get("/v1/products", params={"q": "책"})
+    assert [p["title"] for p in resp.json()["products"]] == ["책상 세트"]
+
+
+def test_search_products_requires_contiguous_substring(client, auth_headers):
+    # Contains both bigrams of "가나다" ("가나", "나다"), but not next to each other
+    _publish_product(client, auth_headers, "나다 가나", 1000)
+    _publish_product(client, auth_headers, "가나다라", 1000)
+
+    resp = client.get("/v1/products", params={"q": "가나다"})
+    assert [p["title"] for p in resp.json()["products"]] == ["가나다라"]
+
+    # Words of a multi-word query match independently
+    resp = client.get("/v1/products", params={"q": "다라 가나다"})
+    assert [p["title"] for p in resp.json()["products"]] == ["가나다라"]
+
+
+def test_search_products_relevance_sort(client, auth_headers):
+    _publish_product(client, auth_headers, "Lamp", 1000)
+    _publish_product(client, auth_headers, "Desk lamp lamp", 1000)
+    _publish_product(client, auth_headers, "Chair", 1000)
+
+    resp = client.get("/v1/products", params={"q": "lamp", "sort": "relevance"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] == 2
+    assert data["products"][0]["title"] == "Desk lamp lamp"
+    assert data["next_cursor"] is None
+
+
+def test_search_products_invalid_sort(client):
+    resp = client.get("/v1/products", params={"sort": "cheapest"})
+    assert resp.status_code == 400
+
+
+def test_search_products_cursor_requires_latest_sort(client, auth_headers):
+    _publish_product(client, auth_headers, "Lamp", 1000)
+    _publish_product(client, auth_headers, "Lamp 2", 1000)
+    cursor = client.get("/v1/products?limit=1").json()["next_cursor"]
+
+    resp = client.get("/v1/products", params={"cursor": cursor, "sort": "relevance"})
+    assert resp.status_code == 400
+
+
+def _capture_statements(db, fn):
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Read routes run on the async engine, writes on the sync one
+    engines = [db.get_bind(), async_engine.sync_engine]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _record)
+    try:
+        fn()
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _record)
+    return statements
+
+
+def _count_statements(db, fn):
+    return len(_capture_statements(db, fn))
+
+
+def test_list_products_constant_statement_count(client, auth_headers, db):
+    _publish_product(client, auth_headers, "First", 1000)
+    one_item = _count_statements(db, lambda: client.get("/v1/products"))
+
+    for i in range(4):
+        _publish_product(client, auth_headers, f"More {i}", 1000)
+    five_items = _count_statements(db, lambda: client.get("/v1/products"))
+
+    assert five_items == one_item
+
+
+def test_list_products_served_from_cache_until_write(client, auth_headers, db):
+    from sqlalchemy import update
+
+    from app.models.product import Product
+
+    product = _publish_product(client, auth_headers, "Cached title", 1000)
+    assert client.get("/v1/products").json()["products"][0]["title"] == "Cached title"
+
+    # A write that bypasses ProductRepo is not visible until invalidation
+    db.execute(update(Product).where(Product.id == uuid.UUID(product["id"])).values(title="Raw"))
+    db.commit()
+    assert client.get("/v1/products").json()["products"][0]["title"] == "Cached title"
+
+    resp = client.patch(
+        f"/v1/products/{product['id']}", headers=auth_headers, json={"title": "Edited"},
+    )
+    assert resp.status_code == 200
+    assert client.get("/v1/products").json()["products"][0]["title"] == "Edited"
+
+
+def test_list_products_cache_overlays_is_liked(client, auth_headers):
+    product = _publish_product(client, auth_headers, "Liked", 1000)
+    client.post(f"/v1/products/{product['id']}/like", headers=auth_headers)
+
+    anon = client.get("/v1/products").json()["products"][0]
+    assert anon["is_liked"] is None
+    assert anon["likes_count"] == 1
+
+    authed = client.get("/v1/products", headers=auth_headers).json()["products"][0]
+    assert authed["is_liked"] is True
+
+    client.post(f"/v1/products/{product['id']}/like", headers=auth_headers)
+    authed = client.get("/v1/products", headers=auth_headers).json()["products"][0]
+    assert authed["is_liked"] is False
+    assert authed["likes_count"] == 0
+
+
+def test_like_toggle_keeps_feed_cache(client, auth_headers, db):
+    from sqlalchemy import update
+
+    from app.models.product import Product
+
+    product = _publish_product(client, auth_headers, "Cached title", 1000)
+    assert client.get("/v1/products").json()["products"][0]["likes_count"] == 0
+
+    db.execute(update(Product).where(Product.id == uuid.UUID(product["id"])).values(title="Raw"))
+    db.commit()
+    client.post(f"/v1/products/{product['id']}/like", headers=auth_headers)
+
+    # Still the cached page, with the current like count overlaid
+    item = client.get("/v1/products").json()["products"][0]
+    assert (item["title"], item["likes_count"]) == ("Cached title", 1)
+
+
+def test_thumbnail_denormalized_on_publish(client, auth_headers, db):
+    import struct
+
+    resp = client.post(
+        "/v1/model-assets/uploads/init",
+        headers=auth_headers,
+        json={
+            "files": [{"role": "MODEL_USDZ", "size_bytes": 5}],
+            "images": [{"image_type": "THUMBNAIL", "sort_order": 0, "size_bytes": 24}],
+        },
+    )
+    asset_id = resp.json()["asset_id"]
+
+    storage = StorageService()
+    model_data = b"hello"
+    storage.save_file(storage.generate_storage_key(uuid.UUID(asset_id), "MODEL_USDZ"), model_data)
+    # PNG signature + IHDR header for a 640x480 image
+    png_header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 640, 480)
+    img_key = storage.generate_image_storage_key(uuid.UUID(asset_id), "THUMBNAIL", 0)
+    storage.save_file(img_key, png_header)
+
+    client.post(
+        "/v1/model-assets/uploads/complete",
+        headers={**auth_headers, "Idempotency-Key": f"c-{asset_id}"},
+        json={
+            "asset_id": asset_id,
+            "files": [
+                {
+                    "role": "MODEL_USDZ",
+                    "size_bytes": 5,
+                    "checksum_sha256": hashlib.sha256(model_data).hexdigest(),
+                },
+            ],
+            "images": [
+                {
+                    "image_type": "THUMBNAIL",
+                    "sort_order": 0,
+                    "size_bytes": 24,
+                    "checksum_sha256": hashlib.sha256(png_header).hexdigest(),
+                },
+            ],
+        },
+    )
+    published = client.post(
+        "/v1/products/publish",
+        headers={**auth_headers, "Idempotency-Key": f"p-{asset_id}"},
+        json={"asset_id": asset_id, "title": "With thumb", "price_cents": 1000},
+    ).json()
+    assert published["thumbnail_url"].endswith(img_key)
+    assert (published["thumbnail_width"], published["thumbnail_height"]) == (640, 480)
+
+    pages = []
+    statements = _capture_statements(db, lambda: pages.append(client.get("/v1/products")))
+    item = pages[0].json()["products"][0]
+    assert item["thumbnail_url"] == published["thumbnail_url"]
+    assert (item["thumbnail_width"], item["thumbnail_height"]) == (640, 480)
+    assert not any("asset_images" in s or "model_assets" in s for s in statements)
+
+    detail = client.get(f"/v1/products/{published['id']}").json()
+    assert detail["thumbnail_url"] == published["thumbnail_url"]
+
+
+def test_list_products_count_strategies(client, auth_headers, db):
+    for i in range(3):
+        _publish_product(client, auth_headers, f"Counted {i}", 1000)
+
+    exact = client.get("/v1/products?limit=2&count=exact").json()
+    assert (exact["total"], exact["total_strategy"], exact["has_more"]) == (3, "exact", True)
+
+    none = client.get("/v1/products?limit=2&count=none").json()
+    assert none["total"] is None
+    assert none["total_strategy"] == "none"
+    assert none["has_more"] is True
+    last_page = client.get("/v1/products?limit=2&page=2&count=none").json()
+    assert last_page["has_more"] is False
+
+    estimated = client.get("/v1/products?count=estimated").json()
+    assert estimated["total_strategy"] == "estimated"
+    assert isinstance(estimated["total"], int)
+
+    # Later pages of the same filter reuse the cached total instead of counting
+    client.get("/v1/products?limit=1&count=cached")
+    statements = _capture_statements(
+        db, lambda: client.get("/v1/products?limit=1&page=2&count=cached")
+    )
+    assert not any(s.startswith("SELECT count(*)") for s in statements)
+    second_page = client.get("/v1/products?limit=1&page=2&count=cached").json()
+    assert (second_page["total"], second_page["total_strategy"]) == (3, "cached")
+
+    _publish_product(client, auth_headers, "Counted 3", 1000)
+    assert client.get("/v1/products?limit=1&page=2&count=cached").json()["total"] == 4
+
+
+def test_list_products_invalid_count_strategy(client):
+    resp = client.get("/v1/products?count=bogus")
+    assert resp.status_code == 400
+
+
+def test_product_detail_conditional_get(client, auth_headers, db):
+    from app.services.view_counter import view_counter
+
+    product_id = _publish_product(client, auth_headers, "ETag", 1000)["id"]
+    url = f"/v1/products/{product_id}"
+
+    resp = client.get(url)
+    etag = resp.headers["ETag"]
+    assert "Authorization" in resp.headers["Vary"]
+
+    # Only the version lookup runs for an unchanged product
+    results = []
+    statements = _capture_statements(
+        db, lambda: results.append(client.get(url, headers={"If-None-Match": etag}))
+    )
+    assert results[0].status_code == 304
+    assert results[0].headers["ETag"] == etag
+    assert len(statements) == 1
+
+    assert client.get(url, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    # is_liked is per user, so authed viewers get their own tag
+    assert client.get(url, headers=auth_headers).headers["ETag"] != etag
+
+    client.post(f"{url}/like", headers=auth_headers)
+    resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json()["likes_count"] == 1
+
+    etag = resp.headers["ETag"]
+    view_counter.flush(db)
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_product_detail_conditional_get_missing(client):
+    resp = client.get(f"/v1/products/{uuid.uuid4()}", headers={"If-None-Match": "*"})
+    assert resp.status_code == 404
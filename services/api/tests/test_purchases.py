@@ -165,3 +165,18 @@ def test_duplicate_purchase_returns_409(client, auth_headers, test_user, db):
     resp2 = client.post(f"/v1/products/{product['id']}/purchase", headers=buyer2_headers)
     assert resp2.status_code == 409
     assert "already purchased" in resp2.json()["detail"].lower()
+
+
+def test_seller_trade_count_in_feed(client, auth_headers, test_user, db):
+    sold = _publish_product(client, auth_headers, "Sold", 1000)
+    _publish_product(client, auth_headers, "Unsold", 1000)
+    _, buyer_headers = _create_buyer(db)
+
+    client.post(f"/v1/products/{sold['id']}/purchase", headers=buyer_headers)
+
+    resp = client.get("/v1/products")
+    assert resp.status_code == 200
+    assert [p["seller_trade_count"] for p in resp.json()["products"]] == [1, 1]
+
+    resp = client.get(f"/v1/products/{sold['id']}")
+    assert resp.json()["seller_trade_count"] == 1
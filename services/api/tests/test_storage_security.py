@@ -1,9 +1,13 @@
 import hashlib
 import hmac
+import os
 import time
 from urllib.parse import urlencode, urlparse
 
+import pytest
+
 from app.config import settings
+from app.services import storage_service
 from app.services.storage_service import StorageService
 
 
@@ -64,3 +68,118 @@ def test_storage_endpoints_blocked_in_non_local(client, monkeypatch):
 
     put_resp = client.put("/storage/assets/test/non-local.bin", content=b"abc")
     assert put_resp.status_code == 404
+
+
+def test_storage_put_streams_chunked_body(client, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    storage = StorageService()
+    storage_key = "assets/test-streamed/streamed.bin"
+    signed_url, _ = storage.generate_presigned_url(storage_key)
+    parsed = urlparse(signed_url)
+    chunks = [bytes([n]) * 700_000 for n in range(3)]
+
+    resp = client.put(f"{parsed.path}?{parsed.query}", content=iter(chunks))
+    assert resp.status_code == 200
+    stored = storage.resolve_safe_path(storage_key)
+    assert stored.read_bytes() == b"".join(chunks)
+    # Only the renamed object is left behind, no temp files
+    assert [p.name for p in stored.parent.iterdir()] == ["streamed.bin"]
+
+
+def test_storage_put_empty_body_leaves_nothing(client, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    storage = StorageService()
+    storage_key = "assets/test-empty/empty.bin"
+    signed_url, _ = storage.generate_presigned_url(storage_key)
+    parsed = urlparse(signed_url)
+
+    resp = client.put(f"{parsed.path}?{parsed.query}", content=b"")
+    assert resp.status_code == 400
+    assert list(storage.resolve_safe_path(storage_key).parent.iterdir()) == []
+
+
+def test_verify_object_uses_checksum_recorded_at_write(monkeypatch):
+    storage = StorageService()
+    storage_key = "assets/test-sidecar/model.glb"
+    storage.save_file(storage_key, b"hello")
+    checksum = hashlib.sha256(b"hello").hexdigest()
+
+    def no_rehash(_path):
+        raise AssertionError("object was re-hashed")
+
+    with monkeypatch.context() as m:
+        m.setattr(storage_service, "_hash_file", no_rehash)
+        assert storage.verify_object(storage_key, 5, checksum)
+        assert not storage.verify_object(storage_key, 5, "0" * 64)
+    assert storage.verify_object(storage_key, 5, checksum, audit=True)
+
+    # Rewritten behind the storage layer's back: the sidecar no longer matches
+    stored = storage.resolve_safe_path(storage_key)
+    mtime_ns = stored.stat().st_mtime_ns
+    stored.write_bytes(b"jello")
+    os.utime(stored, ns=(mtime_ns + 1_000_000, mtime_ns + 1_000_000))
+    assert not storage.verify_object(storage_key, 5, checksum)
+
+
+def test_storage_keys_cannot_address_metadata():
+    storage = StorageService()
+    with pytest.raises(ValueError):
+        storage.resolve_safe_path(".meta/assets/x/model.glb.json")
+
+
+def test_verify_objects_hashes_concurrently_in_order(monkeypatch):
+    storage = StorageService()
+    blobs = {f"assets/test-batch/{n}.bin": bytes([n]) * (n + 1) * 100_000 for n in range(3)}
+    for key, data in blobs.items():
+        storage.save_file(key, data)
+    expected = [(key, len(data), hashlib.sha256(data).hexdigest()) for key, data in blobs.items()]
+    expected[1] = (expected[1][0], expected[1][1], "0" * 64)
+
+    real_hash = storage_service._hash_file
+
+    def slow_hash(path):
+        time.sleep(0.3)
+        return real_hash(path)
+
+    monkeypatch.setattr(storage_service, "_hash_file", slow_hash)
+    started = time.monotonic()
+    checks = storage.verify_objects(expected, audit=True)
+    assert time.monotonic() - started < 0.6
+
+    assert [c.storage_key for c in checks] == list(blobs)
+    assert [c.verified for c in checks] == [True, False, True]
+    assert all(c.rehashed and c.throughput_bytes_per_second > 0 for c in checks)
+
+
+def test_storage_get_serves_ranges_and_conditional_requests(client, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    storage = StorageService()
+    storage_key = "assets/test-download/model.glb"
+    data = bytes(range(256)) * 4
+    storage.save_file(storage_key, data)
+    url = f"/storage/{storage_key}"
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.content == data
+    assert resp.headers["etag"] == f'"{hashlib.sha256(data).hexdigest()}"'
+    assert resp.headers["accept-ranges"] == "bytes"
+    # Asset keys can be rewritten by a retried upload, so caches revalidate
+    assert resp.headers["cache-control"] == "no-cache"
+    assert "last-modified" in resp.headers
+
+    resp = client.get(url, headers={"Range": "bytes=100-199"})
+    assert resp.status_code == 206
+    assert resp.content == data[100:200]
+    assert resp.headers["content-range"] == f"bytes 100-199/{len(data)}"
+
+    resp = client.get(url, headers={"Range": "bytes=0-9,500-509"})
+    assert resp.status_code == 206
+    assert resp.headers["content-type"].startswith("multipart/byteranges")
+    assert data[:10] in resp.content and data[500:510] in resp.content
+
+    etag = client.get(url).headers["etag"]
+    resp = client.get(url, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
@@ -1,7 +1,8 @@
 import hashlib
 import uuid
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import parse_qs, urlencode, urlparse
 
+from app.config import settings
 from app.services.storage_service import StorageService
 
 
@@ -277,3 +278,223 @@ def test_complete_upload_with_images(client, auth_headers):
     assert len(data["image_results"]) == 1
     assert data["image_results"][0]["verified"] is True
     assert data["image_results"][0]["image_type"] == "THUMBNAIL"
+
+
+def test_multipart_upload_resumes_and_completes(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    monkeypatch.setattr(settings, "storage_multipart_part_size", 4)
+    model_data = b"hello, multipart"  # 16 bytes -> 4 parts
+
+    resp = client.post(
+        "/v1/model-assets/uploads/init",
+        headers=auth_headers,
+        json={"files": [{"role": "MODEL_GLB", "size_bytes": 16, "multipart": True}]},
+    )
+    assert resp.status_code == 200
+    asset_id = resp.json()["asset_id"]
+    target = resp.json()["presigned_uploads"][0]
+    assert target["url"] is None
+    assert target["part_size"] == 4
+    assert [p["part_number"] for p in target["parts"]] == [1, 2, 3, 4]
+    upload_id = target["upload_id"]
+
+    def put_part(part: dict) -> None:
+        parsed = urlparse(part["url"])
+        n = part["part_number"]
+        resp = client.put(f"{parsed.path}?{parsed.query}", content=model_data[(n - 1) * 4 : n * 4])
+        assert resp.status_code == 200
+        assert resp.headers["ETag"]
+
+    # Parts arrive out of order and the upload is interrupted halfway
+    put_part(target["parts"][2])
+    put_part(target["parts"][0])
+
+    complete_body = {
+        "asset_id": asset_id,
+        "files": [
+            {
+                "role": "MODEL_GLB",
+                "size_bytes": 16,
+                "checksum_sha256": hashlib.sha256(model_data).hexdigest(),
+                "upload_id": upload_id,
+            }
+        ],
+    }
+    resp = client.post(
+        "/v1/model-assets/uploads/complete",
+        headers={**auth_headers, "Idempotency-Key": "multipart-early"},
+        json=complete_body,
+    )
+    assert resp.status_code == 409
+    assert "Missing parts: [2, 4]" in resp.json()["detail"]
+
+    # Resume: ask which parts are missing and send only those
+    resp = client.get(
+        f"/v1/model-assets/uploads/{asset_id}/parts",
+        headers=auth_headers,
+        params={"role": "MODEL_GLB", "upload_id": upload_id},
+    )
+    assert resp.status_code == 200
+    parts = resp.json()
+    assert parts["part_count"] == 4
+    assert parts["received_parts"] == [1, 3]
+    assert [p["part_number"] for p in parts["missing_parts"]] == [2, 4]
+    for part in parts["missing_parts"]:
+        put_part(part)
+
+    resp = client.post(
+        "/v1/model-assets/uploads/complete",
+        headers={**auth_headers, "Idempotency-Key": "multipart-done"},
+        json=complete_body,
+    )
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "READY"
+    storage = StorageService()
+    key = storage.generate_storage_key(uuid.UUID(asset_id), "MODEL_GLB")
+    assert storage.resolve_safe_path(key).read_bytes() == model_data
+
+
+def test_multipart_part_url_is_bound_to_its_part(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    monkeypatch.setattr(settings, "storage_multipart_part_size", 4)
+    resp = client.post(
+        "/v1/model-assets/uploads/init",
+        headers=auth_headers,
+        json={"files": [{"role": "MODEL_GLB", "size_bytes": 8, "multipart": True}]},
+    )
+    part = resp.json()["presigned_uploads"][0]["parts"][0]
+    parsed = urlparse(part["url"])
+    query = parse_qs(parsed.query)
+    query["partNumber"] = ["2"]
+
+    resp = client.put(f"{parsed.path}?{urlencode(query, doseq=True)}", content=b"abcd")
+    assert resp.status_code == 403
+
+
+def test_multipart_complete_can_be_retried(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    monkeypatch.setattr(settings, "storage_multipart_part_size", 4)
+    model_data = b"0123456789"  # parts of 4, 4 and 2 bytes
+
+    resp = client.post(
+        "/v1/model-assets/uploads/init",
+        headers=auth_headers,
+        json={"files": [{"role": "MODEL_GLB", "size_bytes": 10, "multipart": True}]},
+    )
+    asset_id = resp.json()["asset_id"]
+    target = resp.json()["presigned_uploads"][0]
+    upload_id = target["upload_id"]
+    for part, data in zip(target["parts"], (b"0123", b"456", b"89"), strict=True):
+        parsed = urlparse(part["url"])
+        client.put(f"{parsed.path}?{parsed.query}", content=data)
+
+    # A short middle part doesn't count as received
+    resp = client.get(
+        f"/v1/model-assets/uploads/{asset_id}/parts",
+        headers=auth_headers,
+        params={"role": "MODEL_GLB", "upload_id": upload_id},
+    )
+    assert resp.json()["received_parts"] == [1, 3]
+    parsed = urlparse(resp.json()["missing_parts"][0]["url"])
+    client.put(f"{parsed.path}?{parsed.query}", content=b"4567")
+
+    def complete(checksum: str, key: str) -> int:
+        return client.post(
+            "/v1/model-assets/uploads/complete",
+            headers={**auth_headers, "Idempotency-Key": key},
+            json={
+                "asset_id": asset_id,
+                "files": [
+                    {
+                        "role": "MODEL_GLB",
+                        "size_bytes": 10,
+                        "checksum_sha256": checksum,
+                        "upload_id": upload_id,
+                    }
+                ],
+            },
+        ).status_code
+
+    # A failed completion keeps the parts, so the same upload can complete later
+    assert complete("0" * 64, "multipart-retry-1") == 409
+    assert complete(hashlib.sha256(model_data).hexdigest(), "multipart-retry-2") == 200
+
+    storage = StorageService()
+    key = storage.generate_storage_key(uuid.UUID(asset_id), "MODEL_GLB")
+    assert storage.resolve_safe_path(key).read_bytes() == model_data
+    # Parts are deleted once the upload has completed
+    resp = client.get(
+        f"/v1/model-assets/uploads/{asset_id}/parts",
+        headers=auth_headers,
+        params={"role": "MODEL_GLB", "upload_id": upload_id},
+    )
+    assert resp.status_code == 409
+
+
+def test_multipart_abort_and_stale_cleanup(client, auth_headers):
+    resp = client.post(
+        "/v1/model-assets/uploads/init",
+        headers=auth_headers,
+        json={"files": [{"role": "MODEL_GLB", "size_bytes": 10, "multipart": True}]},
+    )
+    asset_id = resp.json()["asset_id"]
+    upload_id = resp.json()["presigned_uploads"][0]["upload_id"]
+    params = {"role": "MODEL_GLB", "upload_id": upload_id}
+
+    resp = client.delete(
+        f"/v1/model-assets/uploads/{asset_id}/parts", headers=auth_headers, params=params
+    )
+    assert resp.status_code == 204
+    resp = client.get(
+        f"/v1/model-assets/uploads/{asset_id}/parts", headers=auth_headers, params=params
+    )
+    assert resp.status_code == 404
+
+    storage = StorageService()
+    key = storage.generate_storage_key(uuid.UUID(asset_id), "MODEL_GLB")
+    stale_id, _ = storage.create_multipart_upload(key, 10, 4)
+    assert storage.cleanup_stale_multipart_uploads(max_age_seconds=3600) == 0
+    assert storage.cleanup_stale_multipart_uploads(max_age_seconds=-1) >= 1
+    assert not (storage.base_path / ".multipart" / stale_id).exists()
+
+
+def test_multipart_complete_succeeds_when_parts_already_removed(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "local")
+    monkeypatch.setattr(settings, "storage_multipart_part_size", 4)
+    model_data = b"0123"
+
+    resp = client.post(
+        "/v1/model-assets/uploads/init",
+        headers=auth_headers,
+        json={"files": [{"role": "MODEL_GLB", "size_bytes": 4, "multipart": True}]},
+    )
+    asset_id = resp.json()["asset_id"]
+    target = resp.json()["presigned_uploads"][0]
+    parsed = urlparse(target["parts"][0]["url"])
+    client.put(f"{parsed.path}?{parsed.query}", content=model_data)
+
+    # The stale-upload sweep removes the parts between commit and cleanup
+    original = StorageService.abort_multipart_upload
+
+    def swept_first(self: StorageService, storage_key: str, upload_id: str) -> None:
+        self.cleanup_stale_multipart_uploads(max_age_seconds=-1)
+        original(self, storage_key, upload_id)
+
+    monkeypatch.setattr(StorageService, "abort_multipart_upload", swept_first)
+    resp = client.post(
+        "/v1/model-assets/uploads/complete",
+        headers={**auth_headers, "Idempotency-Key": "multipart-swept"},
+        json={
+            "asset_id": asset_id,
+            "files": [
+                {
+                    "role": "MODEL_GLB",
+                    "size_bytes": 4,
+                    "checksum_sha256": hashlib.sha256(model_data).hexdigest(),
+                    "upload_id": target["upload_id"],
+                }
+            ],
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "READY"
@@ -1,12 +1,24 @@
+import asyncio
 import hashlib
 import json
 import uuid
+from typing import Any
+from unittest.mock import AsyncMock
 
 import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
 
+from app.database import async_engine
+from app.models.enums import ChatSendQueuePolicy
 from app.models.user import User
+from app.services.connection_manager import (
+    ConnectionManager,
+    InMemoryBroker,
+    RedisBroker,
+    _Connection,
+)
 from app.services.storage_service import StorageService
 
 
@@ -161,3 +173,438 @@ def test_ws_disconnect_cleanup(client: TestClient, chat_room: dict) -> None:
         ws.send_text(json.dumps({"body": "After reconnect"}))
         data = ws.receive_json()
         assert data["body"] == "After reconnect"
+
+
+class _FakeSocket:
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+
+def test_broker_delivers_remote_publishes_only() -> None:
+    room_id, sender_id, other_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    sender, other = _FakeSocket(), _FakeSocket()
+
+    def envelope(origin: str, exclude: uuid.UUID | None) -> str:
+        return json.dumps({
+            "origin": origin,
+            "channel": f"chat:room:{room_id}",
+            "exclude_user_id": str(exclude) if exclude else None,
+            "message": {"type": "message", "body": "hi"},
+        })
+
+    async def scenario() -> None:
+        broker = RedisBroker("redis://unused")
+        broker._pubsub = AsyncMock()
+        mgr = ConnectionManager(broker)
+        broker._deliver = mgr._deliver_remote
+        await mgr.connect(room_id, sender_id, sender)
+        await mgr.connect(room_id, other_id, other)
+
+        # Published by this worker: already delivered locally, so ignored
+        await broker.handle(envelope(broker.origin, None))
+        await broker.handle(envelope("other-worker", sender_id))
+        await asyncio.sleep(0)
+        await mgr.stop()
+
+    asyncio.run(scenario())
+    assert sender.sent == []
+    assert other.sent == [{"type": "message", "body": "hi"}]
+
+
+def test_concurrent_connects_to_new_room_both_register() -> None:
+    room_id, first_id, second_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    first, second = _FakeSocket(), _FakeSocket()
+
+    async def slow_subscribe(channel: str) -> None:
+        await asyncio.sleep(0.01)
+
+    async def scenario() -> None:
+        broker = InMemoryBroker()
+        broker.subscribe = slow_subscribe  # type: ignore[method-assign]
+        mgr = ConnectionManager(broker)
+        await asyncio.gather(
+            mgr.connect(room_id, first_id, first), mgr.connect(room_id, second_id, second)
+        )
+        await mgr.broadcast_to_room(room_id, {"type": "message", "body": "hi"})
+        await asyncio.sleep(0)
+        await mgr.stop()
+
+    asyncio.run(scenario())
+    assert first.sent == second.sent == [{"type": "message", "body": "hi"}]
+
+
+def test_redis_subscribe_failure_is_retried_until_delivery_resumes() -> None:
+    room_id, user_id = uuid.uuid4(), uuid.uuid4()
+    socket = _FakeSocket()
+    remote = {"type": "message", "body": "from another worker"}
+    envelope = json.dumps({
+        "origin": "other-worker",
+        "channel": f"chat:room:{room_id}",
+        "exclude_user_id": None,
+        "message": remote,
+    })
+
+    async def scenario() -> None:
+        broker = RedisBroker("redis://unused")
+        pubsub = AsyncMock()
+        pubsub.subscribed = False
+        failures = 1
+
+        async def subscribe(channel: str) -> None:
+            nonlocal failures
+            if failures:
+                failures -= 1
+                raise ConnectionError("redis down")
+            pubsub.subscribed = True
+
+        inbox = [{"data": envelope}]
+
+        async def get_message(**kwargs: Any) -> dict[str, str] | None:
+            if inbox:
+                return inbox.pop()
+            await asyncio.sleep(0.01)
+            return None
+
+        pubsub.subscribe.side_effect = subscribe
+        pubsub.get_message.side_effect = get_message
+        broker._pubsub = pubsub
+        mgr = ConnectionManager(broker)
+        broker._deliver = mgr._deliver_remote
+        broker._wake = asyncio.Event()
+        broker._reader = asyncio.create_task(broker._read_loop())
+
+        # The failed subscribe doesn't fail the connect; the reader retries it
+        await mgr.connect(room_id, user_id, socket)
+        for _ in range(100):
+            if socket.sent:
+                break
+            await asyncio.sleep(0.01)
+        assert broker._pending == set()
+        assert pubsub.subscribe.await_count == 2
+        await mgr.stop()
+
+    asyncio.run(scenario())
+    assert socket.sent == [remote]
+
+
+def test_redis_pending_channel_dropped_on_disconnect() -> None:
+    room_id, user_id = uuid.uuid4(), uuid.uuid4()
+
+    async def scenario() -> None:
+        broker = RedisBroker("redis://unused")
+        broker._pubsub = AsyncMock()
+        broker._pubsub.subscribe.side_effect = ConnectionError("redis down")
+        mgr = ConnectionManager(broker)
+        await mgr.connect(room_id, user_id, _FakeSocket())
+        assert broker._pending == {f"chat:room:{room_id}"}
+        await mgr.disconnect(room_id, user_id)
+        assert broker._pending == set()
+        assert mgr.active_connections == {}
+
+    asyncio.run(scenario())
+
+
+def _queue(conn: _Connection) -> list[str]:
+    return [json.loads(text)["n"] for text, _, _ in conn.queue]
+
+
+def test_send_queue_drop_oldest() -> None:
+    conn = _Connection(uuid.uuid4(), uuid.uuid4(), _FakeSocket())
+    for n in ("a", "b", "c"):
+        assert conn.enqueue(json.dumps({"n": n}), None, 2, ChatSendQueuePolicy.DROP_OLDEST)
+    assert _queue(conn) == ["b", "c"]
+    assert conn.dropped == 1
+
+
+def test_send_queue_disconnect_when_full() -> None:
+    conn = _Connection(uuid.uuid4(), uuid.uuid4(), _FakeSocket())
+    assert conn.enqueue(json.dumps({"n": "a"}), None, 1, ChatSendQueuePolicy.DISCONNECT)
+    assert not conn.enqueue(json.dumps({"n": "b"}), None, 1, ChatSendQueuePolicy.DISCONNECT)
+
+
+def test_send_queue_coalesces_typing() -> None:
+    conn = _Connection(uuid.uuid4(), uuid.uuid4(), _FakeSocket())
+    policy = ChatSendQueuePolicy.COALESCE
+    conn.enqueue(json.dumps({"n": "typing-1"}), "typing:u", 3, policy)
+    conn.enqueue(json.dumps({"n": "msg-1"}), None, 3, policy)
+    conn.enqueue(json.dumps({"n": "typing-2"}), "typing:u", 3, policy)
+    assert _queue(conn) == ["typing-2", "msg-1"]
+    assert conn.coalesced == 1
+
+    # When full, queued typing frames are shed before messages
+    conn.enqueue(json.dumps({"n": "msg-2"}), None, 3, policy)
+    conn.enqueue(json.dumps({"n": "msg-3"}), None, 3, policy)
+    assert _queue(conn) == ["msg-1", "msg-2", "msg-3"]
+    assert conn.dropped == 1
+
+
+def test_slow_client_close_tracked_and_cancelled_on_stop(monkeypatch: pytest.MonkeyPatch) -> None:
+    room_id, user_id = uuid.uuid4(), uuid.uuid4()
+
+    class _StuckSocket(_FakeSocket):
+        async def send_text(self, text: str) -> None:
+            await asyncio.Event().wait()
+
+        async def close(self, code: int, reason: str) -> None:
+            await asyncio.Event().wait()
+
+    async def scenario() -> None:
+        mgr = ConnectionManager(InMemoryBroker())
+        monkeypatch.setattr(mgr, "queue_size", 1)
+        monkeypatch.setattr(mgr, "policy", ChatSendQueuePolicy.DISCONNECT)
+        await mgr.connect(room_id, user_id, _StuckSocket())
+        for n in range(3):
+            await mgr.broadcast_to_room(room_id, {"type": "message", "n": n})
+            await asyncio.sleep(0)
+        assert mgr.slow_disconnects == 1
+        assert mgr.active_connections == {}
+        (closing,) = mgr._closing
+        await mgr.stop()
+        assert closing.cancelled()
+        assert mgr._closing == set()
+
+    asyncio.run(scenario())
+
+
+def test_ws_typing_relayed_to_others(client: TestClient, chat_room: dict) -> None:
+    room_id = chat_room["room_id"]
+    seller_token = chat_room["seller_token"]
+    buyer_token = chat_room["buyer_token"]
+
+    with client.websocket_connect(f"/v1/chats/{room_id}?token={seller_token}") as ws_seller:
+        with client.websocket_connect(f"/v1/chats/{room_id}?token={buyer_token}") as ws_buyer:
+            ws_buyer.send_text(json.dumps({"type": "typing"}))
+            ws_buyer.send_text(json.dumps({"body": "Typed"}))
+
+            assert ws_seller.receive_json() == {
+                "type": "typing",
+                "room_id": room_id,
+                "user_id": chat_room["buyer_id"],
+            }
+            assert ws_seller.receive_json()["body"] == "Typed"
+            # The typer doesn't get its own indicator back
+            assert ws_buyer.receive_json()["body"] == "Typed"
+
+        metrics = client.get("/metrics").json()["chat"]
+        assert metrics["connections"] == 1
+        assert metrics["per_connection"][0]["sent"] == 2
+
+
+def test_broker_falls_back_to_memory_without_redis() -> None:
+    mgr = ConnectionManager(RedisBroker("redis://127.0.0.1:1/0"))
+    asyncio.run(mgr.start())
+    assert isinstance(mgr.broker, InMemoryBroker)
+
+
+def test_ws_message_persisted_in_one_statement(client: TestClient, chat_room: dict) -> None:
+    room_id = chat_room["room_id"]
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    token = chat_room["buyer_token"]
+    with client.websocket_connect(f"/v1/chats/{room_id}?token={token}") as ws:
+        # The connect-time read mark runs after accept; a first round trip waits it out
+        ws.send_text(json.dumps({"body": "Warm-up"}))
+        ws.receive_json()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+        try:
+            ws.send_text(json.dumps({"body": "One trip"}))
+            ws.receive_json()
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert len(statements) == 1
+    assert "INSERT INTO chat_messages" in statements[0]
+
+    # Room preview updated; the sender's own message doesn't count as unread
+    resp = client.get(
+        "/v1/chat-rooms", headers={"Authorization": f"Bearer {chat_room['buyer_token']}"}
+    )
+    room = next(r for r in resp.json()["rooms"] if r["id"] == room_id)
+    assert room["last_message_body"] == "One trip"
+    assert room["last_message_at"] is not None
+    assert room["unread_count"] == 0
+
+    resp = client.get(
+        "/v1/chat-rooms", headers={"Authorization": f"Bearer {chat_room['seller_token']}"}
+    )
+    room = next(r for r in resp.json()["rooms"] if r["id"] == room_id)
+    assert room["unread_count"] == 2
+
+
+def test_ws_resume_replays_backlog_first(client: TestClient, chat_room: dict) -> None:
+    room_id = chat_room["room_id"]
+    buyer_headers = {"Authorization": f"Bearer {chat_room['buyer_token']}"}
+    url = f"/v1/chat-rooms/{room_id}/messages"
+    for body in ("one", "two", "three"):
+        client.post(url, headers=buyer_headers, json={"body": body})
+
+    token = chat_room["seller_token"]
+    with client.websocket_connect(f"/v1/chats/{room_id}?token={token}&after_seq=1") as ws:
+        backlog = ws.receive_json()
+        assert backlog["type"] == "backlog"
+        assert [m["seq"] for m in backlog["messages"]] == [2, 3]
+        assert [m["body"] for m in backlog["messages"]] == ["two", "three"]
+        assert backlog["has_more"] is False
+
+        # Then live delivery as usual
+        ws.send_text(json.dumps({"body": "four"}))
+        live = ws.receive_json()
+        assert live["type"] == "message"
+        assert live["seq"] == 4
+
+
+def test_ws_message_sent_while_marking_read_is_delivered(
+    client: TestClient, chat_room: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from app.repositories.chat_repo import AsyncChatRepo
+    from app.services.connection_manager import manager
+
+    room_id = chat_room["room_id"]
+    original = AsyncChatRepo.mark_read
+
+    async def racing_mark_read(
+        self: AsyncChatRepo, room: uuid.UUID, user_id: uuid.UUID
+    ) -> tuple[int, int] | None:
+        # Another participant's message lands just before the read mark moves
+        await manager.broadcast_to_room(room, {"type": "message", "body": "meanwhile"})
+        return await original(self, room, user_id)
+
+    monkeypatch.setattr(AsyncChatRepo, "mark_read", racing_mark_read)
+    token = chat_room["seller_token"]
+    with client.websocket_connect(f"/v1/chats/{room_id}?token={token}") as ws:
+        assert ws.receive_json() == {"type": "message", "body": "meanwhile"}
+
+
+def test_held_connection_sends_first_frame_before_queued() -> None:
+    room_id, user_id = uuid.uuid4(), uuid.uuid4()
+    ws = _FakeSocket()
+
+    async def scenario() -> None:
+        mgr = ConnectionManager(InMemoryBroker())
+        await mgr.connect(room_id, user_id, ws, hold=True)
+        await mgr.broadcast_to_room(room_id, {"type": "message", "seq": 5})
+        await asyncio.sleep(0)
+        assert ws.sent == []
+        mgr.release(room_id, user_id, ws, {"type": "backlog", "messages": []})
+        await asyncio.sleep(0)
+        await mgr.stop()
+
+    asyncio.run(scenario())
+    assert [frame["type"] for frame in ws.sent] == ["backlog", "message"]
+
+
+def test_release_drops_live_frames_already_in_backlog() -> None:
+    room_id, user_id = uuid.uuid4(), uuid.uuid4()
+    ws = _FakeSocket()
+
+    async def scenario() -> None:
+        mgr = ConnectionManager(InMemoryBroker())
+        await mgr.connect(room_id, user_id, ws, hold=True)
+        # Committed after connect, so both queued live and read into the backlog
+        await mgr.broadcast_to_room(room_id, {"type": "message", "seq": 5})
+        await mgr.broadcast_to_room(room_id, {"type": "message", "seq": 6})
+        backlog = {"type": "backlog", "messages": [{"seq": 4}, {"seq": 5}]}
+        mgr.release(room_id, user_id, ws, backlog)
+        await asyncio.sleep(0)
+        await mgr.stop()
+
+    asyncio.run(scenario())
+    assert [(frame["type"], frame.get("seq")) for frame in ws.sent] == [
+        ("backlog", None),
+        ("message", 6),
+    ]
+
+
+def test_user_socket_multiplexes_rooms(client: TestClient, chat_room: dict) -> None:
+    room_id = chat_room["room_id"]
+    seller_token = chat_room["seller_token"]
+    buyer_token = chat_room["buyer_token"]
+
+    with client.websocket_connect(f"/v1/chats?token={seller_token}") as inbox:
+        with client.websocket_connect(f"/v1/chats/{room_id}?token={buyer_token}") as ws_buyer:
+            # Opening the room marked the buyer read: a receipt for the seller
+            receipt = inbox.receive_json()
+            assert receipt["type"] == "read"
+            assert receipt["user_id"] == chat_room["buyer_id"]
+
+            ws_buyer.send_text(json.dumps({"body": "Still available?"}))
+            assert ws_buyer.receive_json()["type"] == "message"
+            message = inbox.receive_json()
+            assert message["type"] == "message"
+            assert message["room_id"] == room_id
+            unread = inbox.receive_json()
+            assert unread == {
+                "type": "unread",
+                "room_id": room_id,
+                "unread_count": 1,
+                "total_unread": 1,
+            }
+
+            # Replies go out over the same socket, addressed by room_id
+            inbox.send_text(json.dumps({"room_id": room_id, "body": "Yes"}))
+            reply = ws_buyer.receive_json()
+            assert reply["body"] == "Yes"
+            assert reply["sender_id"] == chat_room["seller_id"]
+            assert inbox.receive_json()["type"] == "message"
+            assert inbox.receive_json() == {
+                "type": "unread",
+                "room_id": room_id,
+                "unread_count": 0,
+                "total_unread": 0,
+            }
+
+            # Rooms the user isn't in are ignored
+            inbox.send_text(json.dumps({"room_id": str(uuid.uuid4()), "body": "x"}))
+            inbox.send_text(json.dumps({"room_id": room_id, "type": "read"}))
+            assert inbox.receive_json()["type"] == "unread"
+
+
+def test_rest_send_and_read_reach_user_sockets(client: TestClient, chat_room: dict) -> None:
+    room_id = chat_room["room_id"]
+    buyer_headers = {"Authorization": f"Bearer {chat_room['buyer_token']}"}
+
+    with client.websocket_connect(f"/v1/chats?token={chat_room['seller_token']}") as inbox:
+        resp = client.post(
+            f"/v1/chat-rooms/{room_id}/messages", headers=buyer_headers, json={"body": "Hi"}
+        )
+        assert resp.status_code == 201
+        assert inbox.receive_json()["type"] == "message"
+        assert inbox.receive_json() == {
+            "type": "unread",
+            "room_id": room_id,
+            "unread_count": 1,
+            "total_unread": 1,
+        }
+
+        resp = client.post(f"/v1/chat-rooms/{room_id}/read", headers=buyer_headers)
+        assert resp.status_code == 200
+        assert inbox.receive_json() == {
+            "type": "read",
+            "room_id": room_id,
+            "user_id": chat_room["buyer_id"],
+            "seq": 1,
+        }
+
+
+def test_rest_send_survives_fan_out_failure(
+    client: TestClient, chat_room: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from app.services.connection_manager import manager
+
+    async def broken_broadcast(*args: object, **kwargs: object) -> None:
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(manager, "broadcast_to_room", broken_broadcast)
+    resp = client.post(
+        f"/v1/chat-rooms/{chat_room['room_id']}/messages",
+        headers={"Authorization": f"Bearer {chat_room['buyer_token']}"},
+        json={"body": "Stored anyway"},
+    )
+    assert resp.status_code == 201
+    assert resp.json()["seq"] == 1